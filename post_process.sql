@@ -11,51 +11,82 @@ BEGIN;
 DROP TABLE IF EXISTS KNN;
 /* DROP TABLE IF EXISTS v_geography_simplified; */
 
-SELECT count(*) AS geography_count FROM geography;
-
-DROP TABLE IF EXISTS geography_geom;
-CREATE TABLE geography_geom (
-    entity INTEGER PRIMARY KEY,
-    geojson_simple,
-    geojson_full,
-    type
+SELECT sum(entity_count) AS geography_count FROM dataset_stats WHERE typology = 'geography';
+
+DROP VIEW IF EXISTS geography_geom;
+DROP VIEW IF EXISTS idx_geography_geom_geom;
+DROP VIEW IF EXISTS idx_geography_geom_geom_point;
+DELETE FROM views_geometry_columns WHERE view_name = 'geography_geom';
+DROP TABLE IF EXISTS geography_feature;
+/* each geometry is stored once, as a SpatiaLite blob, with the properties left
+   in geography, and geography_geom makes the GeoJSON features from them.
+   The rowid, which keys the spatial indexes, follows the Hilbert curve order of
+   the features, see finalise --cluster, so nearby features share pages */
+CREATE TABLE geography_feature (
+    entity INTEGER NOT NULL UNIQUE,
+    type,
+    geom_simple BLOB
 );
-SELECT AddGeometryColumn('geography_geom', 'geom', 4326, 'MULTIPOLYGON', 2);
-SELECT AddGeometryColumn('geography_geom', 'geom_point', 4326, 'POINT', 2);
+SELECT AddGeometryColumn('geography_feature', 'geom', 4326, 'MULTIPOLYGON', 2);
+SELECT AddGeometryColumn('geography_feature', 'geom_point', 4326, 'POINT', 2);
 
-INSERT INTO geography_geom (entity, geojson_simple, geojson_full, type, geom)
+INSERT INTO geography_feature (entity, type, geom, geom_simple)
 SELECT
     g.entity AS entity,
-    json_object('type', 'Feature', 'entity', g.entity, 'properties', json_object('name', g.name, 'type', g.type, 'organisation', o.organisation, 'entity', g.entity, 'entry-date', g.entry_date, 'start-date', g.start_date, 'end-date', g.end_date), 'geometry', json(AsGeoJSON(Simplify(GeomFromText(g.geometry, 4326), 0.0005)))) AS geojson_simple,
-    json_object('type', 'Feature', 'entity', g.entity, 'properties', json_patch( json_object('name', g.name, 'type', g.type, 'organisation', o.organisation, 'entity', g.entity, 'entry-date', g.entry_date, 'start-date', g.start_date, 'end-date', g.end_date), json_group_object(IFNULL(metric.field, ""), metric.value) ), 'geometry', json(AsGeoJSON(GeomFromText(g.geometry, 4326)))) AS geojson_full,
     g.type AS type,
-    GeomFromText(g.geometry, 4326) AS geom
+    GeomFromText(g.geometry, 4326) AS geom,
+    Simplify(GeomFromText(g.geometry, 4326), 0.0005) AS geom_simple
 FROM
     geography AS g
-LEFT JOIN geography_metric ON geography_metric.geography_id = g.entity
-LEFT JOIN metric ON geography_metric.metric_id = metric.id
-LEFT JOIN organisation_geography ON organisation_geography.geography_id = g.entity
-LEFT JOIN organisation AS o ON organisation_geography.organisation_id = o.entity
 WHERE json_valid(AsGeoJSON(GeomFromText(g.geometry))) = 1
-GROUP BY g.entity;
+ORDER BY g.hilbert, g.entity;
 
-INSERT INTO geography_geom (rowid, geojson_simple, geojson_full, type, geom_point)
+INSERT INTO geography_feature (entity, type, geom_point)
 SELECT
     g.entity AS entity,
-    json_object('type', 'Feature', 'entity', g.entity, 'properties', json_object('name', g.name, 'type', g.type, 'organisation', o.organisation, 'entity', g.entity, 'entry-date', g.entry_date, 'start-date', g.start_date, 'end-date', g.end_date), 'geometry', json(AsGeoJSON(Simplify(GeomFromText(g.point, 4326), 0.0005)))) AS geojson_simple,
-    json_object('type', 'Feature', 'entity', g.entity, 'properties', json_patch( json_object('name', g.name, 'type', g.type, 'organisation', o.organisation, 'entity', g.entity, 'entry-date', g.entry_date, 'start-date', g.start_date, 'end-date', g.end_date), json_group_object(IFNULL(metric.field, ""), metric.value) ), 'geometry', json(AsGeoJSON(GeomFromText(g.point, 4326)))) AS geojson_full,
     g.type AS type,
     GeomFromText(g.point, 4326) AS geom_point
 FROM
     geography AS g
-LEFT JOIN geography_metric ON geography_metric.geography_id = g.entity
-LEFT JOIN metric ON geography_metric.metric_id = metric.id
-LEFT JOIN organisation_geography ON organisation_geography.geography_id = g.entity
-LEFT JOIN organisation AS o ON organisation_geography.organisation_id = o.entity
 WHERE json_valid(AsGeoJSON(GeomFromText(g.point))) = 1
-GROUP BY g.entity;
+ORDER BY g.hilbert, g.entity;
+
+SELECT CreateSpatialIndex("geography_feature", "geom");
+SELECT CreateSpatialIndex("geography_feature", "geom_point");
+CREATE INDEX geography_feature_type ON geography_feature (type);
+
+/* the columns geography_geom had as a table, with the rowid the spatial indexes
+   are keyed by. Readers without SpatiaLite register AsGeoJSON, see
+   view_builder/spatialite.py */
+CREATE VIEW geography_geom AS
+SELECT
+    f.rowid AS rowid,
+    f.entity AS entity,
+    json_object('type', 'Feature', 'entity', f.entity, 'properties', json(g.properties), 'geometry', json(AsGeoJSON(coalesce(f.geom_simple, f.geom_point), coalesce(ds.coordinate_precision, 15)))) AS geojson_simple,
+    json_object('type', 'Feature', 'entity', f.entity, 'properties', json(g.properties), 'geometry', json(AsGeoJSON(coalesce(f.geom, f.geom_point), coalesce(ds.coordinate_precision, 15)))) AS geojson_full,
+    f.type AS type,
+    f.geom AS geom,
+    f.geom_point AS geom_point
+FROM
+    geography_feature AS f
+    JOIN geography AS g ON g.entity = f.entity
+    LEFT JOIN dataset_stats AS ds ON ds.dataset = f.type;
+
+/* registered as a spatial view of geography_feature's geometries, so
+   SpatialIndex queries with f_table_name = 'geography_geom' still work */
+INSERT INTO views_geometry_columns
+    (view_name, view_geometry, view_rowid, f_table_name, f_geometry_column, read_only)
+VALUES
+    ('geography_geom', 'geom', 'rowid', 'geography_feature', 'geom', 1),
+    ('geography_geom', 'geom_point', 'rowid', 'geography_feature', 'geom_point', 1);
+
+/* the spatial indexes under the names they had when geography_geom was a table,
+   their pkid is the rowid geography_geom carries */
+CREATE VIEW idx_geography_geom_geom AS
+SELECT pkid, xmin, xmax, ymin, ymax FROM idx_geography_feature_geom;
+CREATE VIEW idx_geography_geom_geom_point AS
+SELECT pkid, xmin, xmax, ymin, ymax FROM idx_geography_feature_geom_point;
 
-SELECT CreateSpatialIndex("geography_geom", "geom");
 SELECT count(*) AS geography_count FROM geography_geom;
 
 COMMIT;
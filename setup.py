@@ -7,6 +7,8 @@ setup(
     install_requires=[
         "Click",
         "tqdm",
+        "shapely",
+        "pyarrow",
     ],
     entry_points="""
         [console_scripts]
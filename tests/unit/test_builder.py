@@ -1,6 +1,11 @@
+import sqlite3
+
 import pytest
 import view_builder.builder
+from sqlalchemy import create_engine
 from view_builder.builder import ViewBuilder
+from view_builder.model.dataset import DevelopmentPolicyModel
+from view_builder.model.table import Base
 from unittest.mock import call
 
 
@@ -9,6 +14,7 @@ def mock_session(mocker):
     mock_session = mocker.patch.object(view_builder.builder, "Session", autospec=True)
     # To ensure mock session replaces Session in 'with' block usage
     mock_session.return_value.__enter__.return_value = mock_session
+    mock_session.info = {}
     return mock_session
 
 
@@ -18,3 +24,93 @@ def test_view_builder(mock_session):
     test_builder = ViewBuilder(engine=None, item_mapper=lambda x, y, z: z)
     test_builder.build_model("test_dataset", test_items)
     mock_session.add.assert_has_calls([call(test_items[0][0]), call(test_items[1][0])])
+    (stats,), (state,) = [c.args for c in mock_session.merge.call_args_list]
+    assert stats.dataset == "test_dataset"
+    assert stats.broken_relationship_count == 0
+    assert state.dataset == "test_dataset"
+    assert state.complete
+
+
+@pytest.mark.usefixtures("mock_session")
+def test_view_builder_pipelined(mock_session):
+    test_items = [[{"obj%d" % i: "value%d" % i}] for i in range(10)]
+    test_builder = ViewBuilder(engine=None, item_mapper=lambda x, y, z: z)
+    stats = test_builder.build_model_pipelined("test_dataset", test_items, queue_size=2)
+
+    mock_session.add.assert_has_calls([call(item[0]) for item in test_items])
+    mock_session.commit.assert_called_once()
+    assert [stage.items for stage in stats.values()] == [10, 10, 10]
+    assert all(stage.max_queue_depth <= 2 for stage in stats.values())
+
+
+@pytest.mark.usefixtures("mock_session")
+def test_view_builder_pipelined_mapping_error(mock_session):
+    def item_mapper(dataset_name, session, item):
+        raise ValueError("Data missing entity field")
+
+    test_builder = ViewBuilder(engine=None, item_mapper=item_mapper)
+    with pytest.raises(ValueError, match="^Data missing entity field$"):
+        test_builder.build_model_pipelined(
+            "test_dataset", [[{}] for _ in range(100)], queue_size=2
+        )
+
+    mock_session.commit.assert_not_called()
+
+
+@pytest.mark.usefixtures("mock_session")
+def test_view_builder_flush_size(mock_session):
+    test_items = [[{"obj%d" % i: "value%d" % i}] for i in range(10)]
+    test_builder = ViewBuilder(engine=None, item_mapper=lambda x, y, z: z)
+    test_builder.build_model("test_dataset", test_items, flush_size=3)
+
+    assert mock_session.flush.call_count == 3
+
+
+def test_view_builder_resume(tmp_path):
+    path = str(tmp_path / "view_model.sqlite3")
+    builder = ViewBuilder(
+        engine=create_engine("sqlite+pysqlite:///{}".format(path)),
+        item_mapper=lambda name, session, item: DevelopmentPolicyModel(
+            session, item
+        ).to_records(defer_relationships=True),
+    )
+    builder.init_model(Base.metadata)
+    policies = [
+        {
+            "development-policy": "P%d" % entity,
+            "name": "a policy",
+            "entry-date": "2020-10-04",
+            "entity": entity,
+        }
+        for entity in range(1, 6)
+    ]
+
+    def failing_reader():
+        yield from (dict(policy) for policy in policies[:3])
+        raise IOError("input went away")
+
+    with pytest.raises(IOError):
+        builder.build_model("development-policy", failing_reader(), checkpoint_size=2)
+
+    state = builder.build_state("development-policy")
+    assert (state.last_entity, state.entity_count, state.complete) == (2, 2, False)
+
+    builder.build_model(
+        "development-policy",
+        [dict(policy) for policy in policies if policy["entity"] > state.last_entity],
+        resume=True,
+    )
+
+    state = builder.build_state("development-policy")
+    assert (state.last_entity, state.entity_count, state.complete) == (5, 5, True)
+    conn = sqlite3.connect(path)
+    assert conn.execute("SELECT entity FROM policy ORDER BY entity").fetchall() == [
+        (1,),
+        (2,),
+        (3,),
+        (4,),
+        (5,),
+    ]
+    assert conn.execute(
+        "SELECT entity_count FROM dataset_stats WHERE dataset = 'development-policy'"
+    ).fetchall() == [(5,)]
@@ -0,0 +1,131 @@
+import io
+import shutil
+import sqlite3
+
+import pytest
+from sqlalchemy import create_engine
+
+from view_builder.changeset import (
+    ChangesetError,
+    apply_changeset,
+    diff_view_models,
+    write_changeset,
+)
+from view_builder.model.table import Base
+
+
+def create_view_model(path):
+    engine = create_engine("sqlite+pysqlite:///{}".format(path))
+    Base.metadata.create_all(engine)
+    engine.dispose()
+    conn = sqlite3.connect(path)
+    conn.executescript("""
+        INSERT INTO entity (entity, dataset) VALUES
+            (1, 'green-belt'), (2, 'green-belt'), (3, 'green-belt');
+        INSERT INTO geography (entity, geography, name, type) VALUES
+            (1, 'GB1', 'one', 'green-belt'),
+            (2, 'GB2', 'two', 'green-belt'),
+            (3, 'GB3', 'three', 'green-belt');
+        INSERT INTO metric (id, field, value) VALUES (1, 'area', '10');
+        INSERT INTO geography_metric (metric_id, geography_id) VALUES (1, 1);
+        CREATE TABLE blob (name TEXT NOT NULL UNIQUE, data BLOB);
+        INSERT INTO blob (name, data) VALUES ('a', x'00ff');
+        CREATE TABLE unkeyed (name TEXT UNIQUE, data BLOB);
+        """)
+    conn.commit()
+    return conn
+
+
+@pytest.fixture
+def view_models(tmp_path):
+    old = str(tmp_path / "old.sqlite3")
+    new = str(tmp_path / "new.sqlite3")
+    create_view_model(old).close()
+    conn = create_view_model(new)
+    conn.executescript("""
+        DELETE FROM geography_metric;
+        DELETE FROM metric;
+        DELETE FROM geography WHERE entity = 3;
+        DELETE FROM entity WHERE entity = 3;
+        UPDATE geography SET name = 'TWO' WHERE entity = 2;
+        INSERT INTO entity (entity, dataset) VALUES (4, 'green-belt');
+        INSERT INTO geography (entity, geography, name, type)
+            VALUES (4, 'GB4', 'four', 'green-belt');
+        INSERT INTO blob (name, data) VALUES ('b', x'0102');
+        UPDATE blob SET data = x'ff00' WHERE name = 'a';
+        """)
+    conn.commit()
+    return old, new
+
+
+def test_diff_view_models(view_models):
+    old, new = view_models
+    changes = list(diff_view_models(old, new))
+
+    assert [
+        (change["table"], change["op"])
+        for change in changes
+        if change["table"] in ("entity", "geography", "metric", "geography_metric")
+    ] == [
+        ("geography_metric", "delete"),
+        ("geography", "delete"),
+        ("metric", "delete"),
+        ("entity", "delete"),
+        ("entity", "insert"),
+        ("geography", "insert"),
+        ("geography", "update"),
+    ]
+    (update,) = [change for change in changes if change["op"] == "update"]
+    assert update == {
+        "table": "geography",
+        "op": "update",
+        "key": {"entity": 2},
+        "values": {"name": "TWO"},
+    }
+
+
+def test_apply_changeset(view_models, tmp_path):
+    old, new = view_models
+    replica = str(tmp_path / "replica.sqlite3")
+    shutil.copy(old, replica)
+
+    changeset = io.StringIO()
+    written = write_changeset(
+        diff_view_models(
+            old, new, [table.name for table in Base.metadata.sorted_tables] + ["blob"]
+        ),
+        changeset,
+    )
+    assert written[("blob", "insert")] == written[("blob", "update")] == 1
+    changeset.seek(0)
+    assert apply_changeset(replica, changeset) == written
+
+    assert list(diff_view_models(replica, new, ["geography", "blob"])) == []
+    assert sqlite3.connect(replica).execute(
+        "SELECT name, data FROM blob ORDER BY name"
+    ).fetchall() == [("a", b"\xff\x00"), ("b", b"\x01\x02")]
+
+    # the replica no longer matches the view model the changeset came from
+    changeset.seek(0)
+    with pytest.raises(ChangesetError):
+        apply_changeset(replica, changeset)
+    assert list(diff_view_models(replica, new, ["geography", "blob"])) == []
+
+
+def test_diff_view_models_missing_table(view_models):
+    old, new = view_models
+    with pytest.raises(ChangesetError, match="missing isn't in both"):
+        list(diff_view_models(old, new, ["missing"]))
+
+
+def test_diff_view_models_unkeyed_table(view_models):
+    old, new = view_models
+    # unkeyed's UNIQUE column allows NULLs, so can't match rows
+    with pytest.raises(ChangesetError, match="unkeyed has no primary key"):
+        list(diff_view_models(old, new, ["unkeyed"]))
+
+
+def test_diff_view_models_post_processed_table(view_models):
+    old, new = view_models
+    with pytest.raises(ChangesetError, match="re-run it"):
+        list(diff_view_models(old, new, ["geography_feature"]))
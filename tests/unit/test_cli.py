@@ -0,0 +1,56 @@
+import re
+import subprocess
+import sys
+
+from click.testing import CliRunner
+
+from view_builder.cli import cli
+
+# imported by commands when they're run, never by the CLI itself
+HEAVY_MODULES = [
+    "datasette_builder",
+    "digital_land",
+    "pyarrow",
+    "shapely",
+    "sqlalchemy",
+    "tqdm",
+    "view_builder.model.dataset",
+]
+
+# generous, so as not to be flaky, but well short of importing SQLAlchemy
+IMPORT_TIME_BUDGET = 0.5
+
+
+def run_python(*args):
+    return subprocess.run(
+        [sys.executable, *args], capture_output=True, text=True, check=True
+    )
+
+
+def test_cli_imports_lazily():
+    result = run_python(
+        "-c",
+        "import sys, view_builder.cli; "
+        "print(' '.join(m for m in {!r} if m in sys.modules))".format(HEAVY_MODULES),
+    )
+    assert result.stdout.split() == []
+
+
+def test_cli_import_time():
+    result = run_python("-X", "importtime", "-c", "import view_builder.cli")
+    # import time: self [us] | cumulative | imported package
+    (cumulative,) = [
+        int(match.group(1))
+        for match in re.finditer(
+            r"\|\s*(\d+) \| view_builder\.cli$", result.stderr, re.M
+        )
+    ]
+    assert cumulative / 1e6 < IMPORT_TIME_BUDGET
+
+
+def test_cli_help():
+    result = CliRunner().invoke(cli, ["--help"])
+
+    assert result.exit_code == 0
+    assert "build-shards" in result.output
+    assert "containment" in result.output
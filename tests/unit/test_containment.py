@@ -0,0 +1,97 @@
+import sqlite3
+
+import pytest
+from sqlalchemy import create_engine
+from sqlalchemy.orm import Session
+
+from view_builder.containment import build_containment
+from view_builder.model.table import Base, Entity, Geography
+
+
+@pytest.fixture
+def view_model(tmp_path):
+    path = str(tmp_path / "view_model.sqlite3")
+    engine = create_engine("sqlite+pysqlite:///{}".format(path))
+    Base.metadata.create_all(engine)
+    geographies = [
+        (
+            1,
+            "local-authority-district",
+            "POLYGON ((0 0, 0 10, 10 10, 10 0, 0 0))",
+            None,
+        ),
+        (
+            2,
+            "local-authority-district",
+            "POLYGON ((10 0, 10 10, 20 10, 20 0, 10 0))",
+            None,
+        ),
+        # within the first district
+        (3, "conservation-area", "POLYGON ((1 1, 1 2, 2 2, 2 1, 1 1))", None),
+        # across both districts
+        (4, "conservation-area", "POLYGON ((9 1, 9 2, 11 2, 11 1, 9 1))", None),
+        # within the second district, and outside both
+        (5, "listed-building", None, "POINT (15 5)"),
+        (6, "listed-building", None, "POINT (25 5)"),
+    ]
+    with Session(engine) as session:
+        session.add_all(
+            Geography(
+                entity_rel=Entity(entity=entity),
+                type=type,
+                geometry=geometry,
+                point=point,
+            )
+            for (entity, type, geometry, point) in geographies
+        )
+        session.commit()
+    engine.dispose()
+    return path
+
+
+@pytest.mark.parametrize("workers", [1, 2])
+def test_build_containment(view_model, workers):
+    assert build_containment(view_model, workers=workers) == 4
+
+    conn = sqlite3.connect(view_model)
+    assert conn.execute(
+        "SELECT container_id, geography_id, relation FROM geography_containment "
+        "ORDER BY container_id, geography_id"
+    ).fetchall() == [
+        (1, 3, "within"),
+        (1, 4, "intersects"),
+        (2, 4, "intersects"),
+        (2, 5, "within"),
+    ]
+
+
+def test_build_containment_types(view_model):
+    assert build_containment(view_model, types=["listed-building"], workers=1) == 1
+    assert build_containment(view_model, types=["listed-building"], workers=1) == 1
+    assert build_containment(view_model, types=["conservation-area"], workers=1) == 3
+    # recomputing some types leaves the pairs of the others
+    assert (
+        build_containment(view_model, ["parish"], types=["listed-building"], workers=1)
+        == 0
+    )
+
+    conn = sqlite3.connect(view_model)
+    assert conn.execute(
+        "SELECT container_id, geography_id FROM geography_containment "
+        "ORDER BY container_id, geography_id"
+    ).fetchall() == [(1, 3), (1, 4), (2, 4), (2, 5)]
+
+
+def test_build_containment_invalid_container(view_model):
+    conn = sqlite3.connect(view_model)
+    # an unclosed ring, which still has bounds
+    conn.execute(
+        "UPDATE geography SET geometry = 'POLYGON ((0 0, 0 10, 10 10, 10 0))' "
+        "WHERE entity = 1"
+    )
+    conn.commit()
+
+    assert build_containment(view_model, workers=2) == 2
+    assert conn.execute(
+        "SELECT DISTINCT container_id FROM geography_containment"
+    ).fetchall() == [(2,)]
@@ -7,6 +7,7 @@ from view_builder.model.dataset import (
     DevelopmentPlanDocumentModel,
     DocumentModel,
     BrownfieldLandModel,
+    GreenBeltModel,
 )
 from view_builder.model.table import (
     Entity,
@@ -27,6 +28,7 @@ from view_builder.model.table import (
     DocumentCategory,
 )
 import datetime
+import json
 import pytest
 
 
@@ -190,7 +192,10 @@ def test_geography_dataset_model(mocker):
 
     assert isinstance(first_orm_obj, Geography)
     assert first_orm_obj.geography == test_data["geography"]
-    assert first_orm_obj.geometry == test_data["geometry"]
+    # rounded to the model's coordinate precision
+    assert first_orm_obj.geometry == (
+        "MULTIPOLYGON (((-1.111111 2.222222, 3.333333 4.444444)))"
+    )
     assert first_orm_obj.entity == test_data["entity"]
 
     second_orm_obj = orm_obj_list[1]
@@ -198,6 +203,16 @@ def test_geography_dataset_model(mocker):
     assert second_orm_obj.geography == first_orm_obj
     assert second_orm_obj.organisation == test_organisation
 
+    assert json.loads(first_orm_obj.properties) == {
+        "name": "BBB",
+        "type": None,
+        "organisation": "government-organisation:CCC",
+        "entity": 1,
+        "entry-date": "2020-10-04",
+        "start-date": "2020-10-05",
+        "end-date": None,
+    }
+
 
 @pytest.mark.usefixtures("mock_get_organisation")
 @pytest.mark.usefixtures("mock_get_geography")
@@ -517,3 +532,55 @@ def test_brownfield_land_model(mocker, mock_get_organisation):
         if isinstance(orm_obj, GeographyMetric):
             assert orm_obj.metric.value in test_metrics
             test_metrics.remove(orm_obj.metric.value)
+
+    properties = json.loads(first_orm_obj.properties)
+    assert properties["organisation"] == dummy_organisation.organisation
+    assert properties["type"] == "brownfield-land"
+    for metric in BrownfieldLandModel.metric_fields:
+        assert properties[metric] == test_data[metric]
+
+
+def test_development_policy_model_deferred_relationships():
+    test_data = {
+        "development-policy": "AAA",
+        "name": "BBB",
+        "development-policy-categories": "A;B",
+        "geographies": "A000000",
+        "entry-date": "2020-10-04",
+        "organisation": "government-organisation:CCC",
+        "entity": 1,
+    }
+
+    orm_obj_list = DevelopmentPolicyModel(None, test_data).to_orm(
+        defer_relationships=True
+    )
+
+    assert isinstance(orm_obj_list[0], Policy)
+    assert [
+        (x.from_entity, x.relation_type, x.reference_type, x.reference)
+        for x in orm_obj_list[1:]
+    ] == [
+        (1, "policy_category", "development-policy-category", "A"),
+        (1, "policy_category", "development-policy-category", "B"),
+        (1, "policy_organisation", None, "government-organisation:CCC"),
+        (1, "policy_geography", None, "local-authority-district:A000000"),
+    ]
+
+
+def test_geography_dataset_model_coordinate_precision():
+    test_data = {
+        "geography": "green-belt:AAA",
+        "geometry": (
+            "MULTIPOLYGON (((0.000001 0.000001, 1.000001 0, 1.000004 0.000004, "
+            "1 1, 0 0.000001)))"
+        ),
+        "point": "POINT (0.123456789 51.987654321)",
+        "entry-date": "2020-10-04",
+        "entity": 1,
+    }
+
+    (geography,) = GreenBeltModel(None, test_data).to_orm()
+
+    # repeated vertices are left out once rounded
+    assert geography.geometry == "MULTIPOLYGON (((0 0, 1 0, 1 1, 0 0)))"
+    assert geography.point == "POINT (0.12346 51.98765)"
@@ -0,0 +1,68 @@
+from datetime import date
+
+from view_builder.dataset_stats import DatasetStatsCollector
+from view_builder.model.table import (
+    Entity,
+    Geography,
+    OrganisationGeography,
+    RelationshipStaging,
+)
+
+
+def geography(entity, entry_date, geometry=None, point=None, end_date=None):
+    return Geography(
+        entity_rel=Entity(entity=entity, typology="geography"),
+        entry_date=entry_date,
+        end_date=end_date,
+        geometry=geometry,
+        point=point,
+    )
+
+
+def test_dataset_stats_collector():
+    collector = DatasetStatsCollector("conservation-area", coordinate_precision=6)
+    collector.add(
+        [
+            geography(
+                1,
+                date(2021, 3, 1),
+                geometry="POLYGON ((-1 51, -1 52, 0 52, -1 51))",
+                point="POINT (-0.5 51.5)",
+            ),
+            OrganisationGeography(),
+        ]
+    )
+    collector.add(
+        [
+            geography(
+                2, date(2020, 1, 1), point="POINT (1 50)", end_date=date(2022, 1, 1)
+            )
+        ]
+    )
+
+    stats = collector.to_orm(build_duration=1.5, broken_relationship_count=2)
+
+    assert stats.dataset == "conservation-area"
+    assert stats.typology == "geography"
+    assert stats.entity_count == 2
+    assert stats.broken_relationship_count == 2
+    assert (stats.minx, stats.miny, stats.maxx, stats.maxy) == (-1, 50, 1, 52)
+    assert stats.vertex_count == 5
+    assert stats.coordinate_precision == 6
+    assert (stats.min_entry_date, stats.max_entry_date) == (
+        date(2020, 1, 1),
+        date(2021, 3, 1),
+    )
+    assert (stats.min_start_date, stats.max_start_date) == (None, None)
+    assert stats.max_end_date == date(2022, 1, 1)
+    assert stats.build_duration == 1.5
+
+
+def test_dataset_stats_collector_deferred():
+    collector = DatasetStatsCollector("conservation-area")
+    collector.add([geography(1, date(2021, 3, 1)), RelationshipStaging()])
+
+    stats = collector.to_orm()
+
+    assert stats.broken_relationship_count is None
+    assert stats.minx is None
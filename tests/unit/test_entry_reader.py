@@ -0,0 +1,24 @@
+import sqlite3
+
+import pytest
+
+pytest.importorskip("digital_land")
+
+from view_builder.entry_reader import open_entry_repository  # noqa: E402
+
+
+def test_open_entry_repository(tmp_path):
+    path = str(tmp_path / "input.sqlite3")
+    conn = sqlite3.connect(path)
+    conn.execute("CREATE TABLE entry (entity INTEGER, name TEXT)")
+    conn.execute("INSERT INTO entry VALUES (1, 'AAA')")
+    conn.commit()
+    conn.close()
+
+    repo = open_entry_repository(path)
+
+    assert repo.conn.execute("PRAGMA query_only").fetchone() == (1,)
+    row = repo.conn.execute("SELECT entity, name FROM entry").fetchone()
+    assert row["name"] == "AAA"
+    with pytest.raises(sqlite3.OperationalError):
+        repo.conn.execute("INSERT INTO entry VALUES (2, 'BBB')")
@@ -0,0 +1,206 @@
+import io
+import json
+import sqlite3
+from datetime import date
+
+import pytest
+from sqlalchemy import create_engine
+from sqlalchemy.orm import Session
+
+from view_builder.export import (
+    SPATIAL_INDEXES,
+    ExportError,
+    export_features,
+    export_flatgeobuf,
+    export_view_model,
+)
+from view_builder.model.table import (
+    Base,
+    Entity,
+    Geography,
+    Organisation,
+    OrganisationGeography,
+)
+
+
+def feature(entity):
+    return json.dumps({"type": "Feature", "entity": entity})
+
+
+@pytest.fixture
+def view_model(tmp_path):
+    path = str(tmp_path / "view_model.sqlite3")
+    engine = create_engine("sqlite+pysqlite:///{}".format(path))
+    Base.metadata.create_all(engine)
+    with Session(engine) as session:
+        organisation = Organisation(
+            entity_rel=Entity(entity=10), organisation="local-authority-eng:AAA"
+        )
+        geographies = [
+            Geography(
+                entity_rel=Entity(entity=1),
+                type="conservation-area",
+                entry_date=date(2021, 1, 1),
+            ),
+            Geography(
+                entity_rel=Entity(entity=2),
+                type="conservation-area",
+                entry_date=date(2022, 1, 1),
+            ),
+            Geography(
+                entity_rel=Entity(entity=3), type="brownfield-land", entry_date=None
+            ),
+        ]
+        session.add(
+            OrganisationGeography(organisation=organisation, geography=geographies[1])
+        )
+        session.add_all(geographies)
+        session.commit()
+    engine.dispose()
+
+    # the columns of the post-process's geography_geom view, without SpatiaLite
+    conn = sqlite3.connect(path)
+    conn.execute(
+        "CREATE TABLE geography_geom "
+        "(entity INTEGER NOT NULL UNIQUE, geojson_simple, geojson_full, type)"
+    )
+    for index in SPATIAL_INDEXES:
+        conn.execute(
+            "CREATE VIRTUAL TABLE {} USING rtree(pkid, xmin, xmax, ymin, ymax)".format(
+                index
+            )
+        )
+    # stored, and so exported, in clustered rather than entity order
+    conn.executemany(
+        "INSERT INTO geography_geom (rowid, entity, geojson_simple, geojson_full, type) "
+        "VALUES (?, ?, ?, ?, ?)",
+        [
+            (1, 3, feature(3), feature(3), "brownfield-land"),
+            (2, 1, feature(1), feature(1), "conservation-area"),
+            (3, 2, feature(2), feature(2), "conservation-area"),
+        ],
+    )
+    conn.execute(
+        "INSERT INTO idx_geography_geom_geom VALUES (2, -1.0, -0.5, 51.0, 51.5)"
+    )
+    conn.execute("INSERT INTO idx_geography_geom_geom VALUES (3, 0.5, 1.0, 52.0, 52.5)")
+    conn.execute(
+        "INSERT INTO idx_geography_geom_geom_point VALUES (1, -0.7, -0.7, 51.2, 51.2)"
+    )
+    conn.commit()
+    yield conn
+    conn.close()
+
+
+def entities(conn, **filters):
+    return [json.loads(f)["entity"] for f in export_features(conn, **filters)]
+
+
+def test_export_features(view_model):
+    assert entities(view_model) == [3, 1, 2]
+    assert entities(view_model, types=["conservation-area"]) == [1, 2]
+    assert entities(view_model, bbox=(-1.0, 51.0, 0.0, 51.3)) == [3, 1]
+    assert entities(view_model, organisation="local-authority-eng:AAA") == [2]
+    assert entities(view_model, entry_date_from=date(2021, 6, 1)) == [2]
+    assert entities(
+        view_model, types=["conservation-area"], entry_date_to=date(2021, 6, 1)
+    ) == [1]
+
+
+@pytest.mark.parametrize("format", ["ndjson", "geojson"])
+def test_export_view_model(view_model, format):
+    (path,) = [
+        row[2] for row in view_model.execute("PRAGMA database_list") if row[1] == "main"
+    ]
+    f = io.StringIO()
+
+    count = export_view_model(path, f, format, types=["conservation-area"])
+
+    assert count == 2
+    if format == "ndjson":
+        lines = f.getvalue().splitlines()
+        assert [json.loads(line)["entity"] for line in lines] == [1, 2]
+    else:
+        collection = json.loads(f.getvalue())
+        assert collection["type"] == "FeatureCollection"
+        assert [f["entity"] for f in collection["features"]] == [1, 2]
+
+
+def test_export_view_model_precision(view_model):
+    (path,) = [
+        row[2] for row in view_model.execute("PRAGMA database_list") if row[1] == "main"
+    ]
+    view_model.execute(
+        "UPDATE geography_geom SET geojson_full = ? WHERE entity = 1",
+        (
+            json.dumps(
+                {
+                    "type": "Feature",
+                    "entity": 1,
+                    "geometry": {"type": "Point", "coordinates": [-0.1234567, 51.5]},
+                }
+            ),
+        ),
+    )
+    view_model.commit()
+    f = io.StringIO()
+
+    assert export_view_model(path, f, precision=3, types=["conservation-area"]) == 2
+
+    first, second = [json.loads(line) for line in f.getvalue().splitlines()]
+    assert first["geometry"]["coordinates"] == [-0.123, 51.5]
+    assert "geometry" not in second
+
+
+def test_export_flatgeobuf(view_model, tmp_path, mocker):
+    (path,) = [
+        row[2] for row in view_model.execute("PRAGMA database_list") if row[1] == "main"
+    ]
+    commands = []
+
+    def ogr2ogr(command, check):
+        # what ogr2ogr would convert, rather than GDAL's output
+        with open(command[-1].split(":", 1)[1]) as f:
+            commands.append((command, f.read()))
+        return mocker.Mock(returncode=0)
+
+    mocker.patch("view_builder.export.shutil.which", return_value="/usr/bin/ogr2ogr")
+    run = mocker.patch("view_builder.export.subprocess.run", side_effect=ogr2ogr)
+
+    counts = export_flatgeobuf(path, str(tmp_path / "fgb"))
+
+    assert counts == {"brownfield-land": 1, "conservation-area": 2}
+    assert run.call_count == 2
+    command, features = commands[1]
+    assert command[:3] == ["ogr2ogr", "-f", "FlatGeobuf"]
+    assert "SPATIAL_INDEX=YES" in command
+    assert command[-2] == str(tmp_path / "fgb" / "conservation-area.fgb")
+    assert [json.loads(line)["entity"] for line in features.splitlines()] == [1, 2]
+    # the temporary files are removed
+    assert list((tmp_path / "fgb").iterdir()) == []
+
+    assert export_flatgeobuf(
+        path,
+        str(tmp_path / "fgb"),
+        types=["conservation-area"],
+        entry_date_from=date(2022, 1, 1),
+    ) == {"conservation-area": 1}
+
+    # a type no longer matching any features loses its earlier file
+    (tmp_path / "fgb" / "conservation-area.fgb").write_bytes(b"fgb")
+    assert (
+        export_flatgeobuf(
+            path,
+            str(tmp_path / "fgb"),
+            types=["conservation-area"],
+            entry_date_from=date(2030, 1, 1),
+        )
+        == {}
+    )
+    assert list((tmp_path / "fgb").iterdir()) == []
+
+
+def test_export_flatgeobuf_without_gdal(view_model, tmp_path, mocker):
+    mocker.patch("view_builder.export.shutil.which", return_value=None)
+    with pytest.raises(ExportError, match="GDAL"):
+        export_flatgeobuf(":memory:", str(tmp_path))
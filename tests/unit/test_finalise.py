@@ -0,0 +1,164 @@
+import json
+import sqlite3
+
+import pytest
+from sqlalchemy import create_engine
+from sqlalchemy.orm import Session
+
+from view_builder.finalise import cluster_geography, resolve_relationships
+from view_builder.search import create_search_indexes
+from view_builder.model.dataset import RelationshipError
+from view_builder.model.table import (
+    Base,
+    Category,
+    DatasetStats,
+    Entity,
+    Geography,
+    Policy,
+    RelationshipStaging,
+)
+
+
+@pytest.fixture
+def view_model(tmp_path):
+    path = str(tmp_path / "view_model.sqlite3")
+    engine = create_engine("sqlite+pysqlite:///{}".format(path))
+    Base.metadata.create_all(engine)
+    with Session(engine) as session:
+        session.add_all(
+            [
+                Category(
+                    entity_rel=Entity(entity=1),
+                    category="A",
+                    type="development-policy-category",
+                ),
+                Geography(
+                    entity_rel=Entity(entity=2),
+                    geography="local-authority-district:A000000",
+                ),
+                Policy(
+                    entity_rel=Entity(entity=3, dataset="development-policy"),
+                    policy="pol-a",
+                ),
+                DatasetStats(dataset="development-policy"),
+                RelationshipStaging(
+                    from_entity=3,
+                    relation_type="policy_category",
+                    reference_type="development-policy-category",
+                    reference="A",
+                ),
+                RelationshipStaging(
+                    from_entity=3,
+                    relation_type="policy_category",
+                    reference_type="development-policy-category",
+                    reference="B",
+                ),
+                RelationshipStaging(
+                    from_entity=3,
+                    relation_type="policy_geography",
+                    reference="local-authority-district:A000000",
+                ),
+            ]
+        )
+        session.commit()
+    return path
+
+
+def test_resolve_relationships(view_model):
+    conn = sqlite3.connect(view_model)
+    broken = resolve_relationships(conn, allow_broken=True)
+
+    assert broken == 1
+    assert conn.execute(
+        "SELECT policy_id, category_id FROM policy_category"
+    ).fetchall() == [(3, 1)]
+    assert conn.execute(
+        "SELECT policy_id, geography_id FROM policy_geography"
+    ).fetchall() == [(3, 2)]
+    assert conn.execute(
+        "SELECT relation_type, reference_type, reference, entity_count FROM broken_relationship"
+    ).fetchall() == [("policy_category", "development-policy-category", "B", 1)]
+    assert conn.execute(
+        "SELECT dataset, broken_relationship_count FROM dataset_stats"
+    ).fetchall() == [("development-policy", 1)]
+
+
+def test_resolve_relationships_is_repeatable(view_model):
+    conn = sqlite3.connect(view_model)
+    resolve_relationships(conn, allow_broken=True)
+    resolve_relationships(conn, allow_broken=True)
+
+    assert conn.execute("SELECT count(*) FROM policy_category").fetchone() == (1,)
+    assert conn.execute("SELECT count(*) FROM broken_relationship").fetchone() == (1,)
+
+
+def test_resolve_relationships_not_allowed_broken(view_model):
+    conn = sqlite3.connect(view_model)
+    with pytest.raises(RelationshipError):
+        resolve_relationships(conn)
+
+
+def test_cluster_geography(view_model):
+    conn = sqlite3.connect(view_model)
+    conn.execute(
+        "INSERT INTO geography (entity, geometry, point) VALUES "
+        "(4, 'POLYGON ((-1 51, -1 52, 0 52, -1 51))', 'POINT (-0.6 51.6)'),"
+        "(5, NULL, 'POINT (-0.5 51.5)'),"
+        "(6, '', 'POINT (1.5 53.5)')"
+    )
+
+    assert cluster_geography(conn) == 3
+
+    keys = dict(conn.execute("SELECT entity, hilbert FROM geography"))
+    assert keys[2] is None
+    assert keys[4] == keys[5]
+    assert keys[4] != keys[6]
+
+
+def test_cluster_geography_leaves_search_index(view_model):
+    conn = sqlite3.connect(view_model)
+    conn.execute(
+        "INSERT INTO geography (entity, name, point) VALUES "
+        "(4, 'Four', 'POINT (-0.5 51.5)'), (5, 'Five', 'POINT (1.5 53.5)')"
+    )
+    create_search_indexes(conn)
+    conn.commit()
+    (geographies,) = conn.execute("SELECT count(*) FROM geography").fetchone()
+    changes = conn.total_changes
+
+    cluster_geography(conn)
+
+    # total_changes counts the rows trigger programs change too
+    assert conn.total_changes - changes == geographies
+    assert conn.execute(
+        "SELECT rowid FROM geography_fts WHERE geography_fts MATCH 'four'"
+    ).fetchall() == [(4,)]
+
+
+def test_resolve_relationships_clears_broken_organisations(view_model):
+    conn = sqlite3.connect(view_model)
+    conn.executescript("""
+        INSERT INTO entity (entity) VALUES (10);
+        INSERT INTO organisation (entity, organisation)
+            VALUES (10, 'local-authority-eng:AAA');
+        INSERT INTO geography (entity, properties) VALUES
+            (4, '{"name": "Four", "organisation": "local-authority-eng:AAA"}'),
+            (5, '{"name": "Five", "organisation": "local-authority-eng:BBB"}');
+        INSERT INTO relationship_staging (from_entity, relation_type, reference)
+        VALUES
+            (4, 'organisation_geography', 'local-authority-eng:AAA'),
+            (5, 'organisation_geography', 'local-authority-eng:BBB');
+        """)
+
+    assert resolve_relationships(conn, allow_broken=True) == 2
+
+    assert conn.execute(
+        "SELECT organisation_id, geography_id FROM organisation_geography"
+    ).fetchall() == [(10, 4)]
+    assert conn.execute(
+        "SELECT entity, json_extract(properties, '$.organisation') FROM geography "
+        "WHERE entity IN (4, 5) ORDER BY entity"
+    ).fetchall() == [(4, "local-authority-eng:AAA"), (5, None)]
+    assert json.loads(
+        conn.execute("SELECT properties FROM geography WHERE entity = 5").fetchone()[0]
+    ) == {"name": "Five", "organisation": None}
@@ -0,0 +1,26 @@
+from view_builder.hilbert import hilbert_index, hilbert_key
+
+
+def test_hilbert_index():
+    # the order 1 curve visits the cells (0, 0), (0, 1), (1, 1), (1, 0)
+    assert [hilbert_index(x, y, 1) for (x, y) in [(0, 0), (0, 1), (1, 1), (1, 0)]] == [
+        0,
+        1,
+        2,
+        3,
+    ]
+    # every cell is visited once, each a step from the last
+    cells = {hilbert_index(x, y, 3): (x, y) for x in range(8) for y in range(8)}
+    assert sorted(cells) == list(range(64))
+    for d in range(63):
+        (x1, y1), (x2, y2) = cells[d], cells[d + 1]
+        assert abs(x1 - x2) + abs(y1 - y2) == 1
+
+
+def test_hilbert_key():
+    near = hilbert_key("POINT (-0.1 51.5)")
+    nearby = hilbert_key("POINT (-0.1001 51.5001)")
+    far = hilbert_key("POINT (-3.0 55.0)")
+
+    assert abs(near - nearby) < abs(near - far)
+    assert hilbert_key("") is None
@@ -0,0 +1,43 @@
+import sqlite3
+
+import pytest
+from sqlalchemy import create_engine
+
+from view_builder.index_audit import audit_indexes
+from view_builder.model.table import Base
+
+
+@pytest.fixture
+def view_model(tmp_path):
+    path = str(tmp_path / "view_model.sqlite3")
+    engine = create_engine("sqlite+pysqlite:///{}".format(path))
+    Base.metadata.create_all(engine)
+    engine.dispose()
+    return path
+
+
+def test_audit_indexes(view_model):
+    conn = sqlite3.connect(view_model)
+    conn.execute("CREATE INDEX geography_type_entity ON geography (type, entity)")
+    conn.commit()
+    conn.close()
+
+    report = {row["index"]: row for row in audit_indexes(view_model)}
+
+    assert report["ix_geography_type"]["redundant"]
+    assert not report["geography_type_entity"]["redundant"]
+    assert not report["ix_document_geography_geography_id"]["redundant"]
+    assert report["ix_document_geography_geography_id"]["columns"] == [
+        "geography_id",
+        "document_id",
+    ]
+    assert "geography-documents" in (
+        report["ix_document_geography_geography_id"]["queries"]
+    )
+
+
+def test_audit_indexes_no_primary_key_indexes(view_model):
+    report = audit_indexes(view_model)
+
+    assert not [row for row in report if row["index"].startswith("ix_entity_entity")]
+    assert not [row for row in report if row["redundant"]]
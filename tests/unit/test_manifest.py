@@ -0,0 +1,153 @@
+import json
+import sqlite3
+
+import pytest
+from shapely.geometry import Point
+from sqlalchemy import create_engine
+from sqlalchemy.orm import Session
+
+from view_builder.builder import ViewBuilder
+from view_builder.manifest import (
+    dependent_datasets,
+    file_checksum,
+    is_unchanged,
+    model_version,
+    record_manifest,
+    remove_dataset,
+    row_counts,
+)
+from view_builder.model.dataset import DevelopmentPolicyModel
+from view_builder.model.table import (
+    Base,
+    Entity,
+    Geography,
+    GeographyMetric,
+    Metric,
+)
+from view_builder.subdivide import build_parts, parts_intersecting
+
+POLICY = {
+    "development-policy": "AAA",
+    "name": "BBB",
+    "geographies": "E1",
+    "entry-date": "2020-10-04",
+    "entity": 10,
+}
+
+
+@pytest.fixture
+def view_model(tmp_path):
+    path = str(tmp_path / "view_model.sqlite3")
+    engine = create_engine("sqlite+pysqlite:///{}".format(path))
+    Base.metadata.create_all(engine)
+    with Session(engine) as session:
+        for entity in [1, 2]:
+            geography = Geography(
+                entity_rel=Entity(
+                    entity=entity,
+                    typology="geography",
+                    dataset="local-authority-district",
+                ),
+                geography="local-authority-district:E{}".format(entity),
+            )
+            session.add(geography)
+            session.add(
+                GeographyMetric(
+                    geography=geography, metric=Metric(field="area", value="1")
+                )
+            )
+        session.commit()
+
+    builder = ViewBuilder(
+        engine=engine,
+        item_mapper=lambda name, session, item: DevelopmentPolicyModel(
+            session, item
+        ).to_orm(),
+    )
+    builder.build_model("development-policy", [dict(POLICY)])
+    builder.build_model("local-authority-district", [])
+    return path
+
+
+def test_file_checksum(tmp_path):
+    path = tmp_path / "input.sqlite3"
+    path.write_bytes(b"abc")
+
+    assert file_checksum(str(path)) == (
+        "ba7816bf8f01cfea414140de5dae2223b00361a396177a9cb410ff61f20015ad"
+    )
+
+
+def test_record_manifest(view_model):
+    conn = sqlite3.connect(view_model)
+
+    assert not is_unchanged(conn, "development-policy", "abc")
+    assert record_manifest(conn, "development-policy", "policy.sqlite3", "abc") == {
+        "dataset_stats": 1,
+        "entity": 1,
+        "policy": 1,
+        "policy_geography": 1,
+    }
+    assert is_unchanged(conn, "development-policy", "abc")
+    assert not is_unchanged(conn, "development-policy", "def")
+
+    conn.execute("UPDATE build_manifest SET model_version = 'old'")
+    assert not is_unchanged(conn, "development-policy", "abc")
+
+    (manifest,) = conn.execute(
+        "SELECT checksum, entity_count, row_counts FROM build_manifest"
+    ).fetchall()
+    assert manifest[:2] == ("abc", 1)
+    assert json.loads(manifest[2])["policy_geography"] == 1
+    assert model_version().startswith("1-")
+
+
+def test_remove_dataset(view_model):
+    conn = sqlite3.connect(view_model)
+    record_manifest(conn, "development-policy", "policy.sqlite3", "abc")
+
+    assert dependent_datasets(conn, "local-authority-district") == [
+        "development-policy"
+    ]
+    assert remove_dataset(conn, "local-authority-district") == ["development-policy"]
+
+    assert row_counts(conn, "local-authority-district") == {}
+    assert conn.execute("SELECT count(*) FROM metric").fetchone() == (0,)
+    assert conn.execute("SELECT count(*) FROM build_manifest").fetchone() == (0,)
+    # the policy's relationships are left for it to be rebuilt
+    assert row_counts(conn, "development-policy") == {
+        "dataset_stats": 1,
+        "entity": 1,
+        "policy": 1,
+        "policy_geography": 1,
+    }
+
+    assert remove_dataset(conn, "development-policy") == []
+    assert conn.execute("SELECT count(*) FROM entity").fetchone() == (0,)
+    assert conn.execute("SELECT count(*) FROM policy_geography").fetchone() == (0,)
+
+
+def test_remove_dataset_parts(view_model):
+    conn = sqlite3.connect(view_model)
+    circle = Point(0, 0).buffer(10, quad_segs=256).wkt
+    conn.execute("UPDATE geography SET geometry = ?", (circle,))
+    conn.commit()
+    geographies, parts = build_parts(view_model, 200, workers=1)
+    assert geographies == 2
+
+    remove_dataset(conn, "local-authority-district")
+    assert conn.execute("SELECT count(*) FROM geography_part_rtree").fetchone() == (0,)
+    assert parts_intersecting(conn, -10, -10, 10, 10) == []
+
+    # the dataset rebuilt, its geographies get parts again
+    conn.execute(
+        "INSERT INTO entity (entity, typology, dataset) "
+        "VALUES (1, 'geography', 'local-authority-district')"
+    )
+    conn.execute("INSERT INTO geography (entity, geometry) VALUES (1, ?)", (circle,))
+    conn.commit()
+    assert build_parts(view_model, 200, workers=1) == (1, parts // 2)
+    assert conn.execute("SELECT count(*) FROM geography_part_rtree").fetchone() == (
+        parts // 2,
+    )
+    assert {entity for entity, _ in parts_intersecting(conn, -1, -1, 1, 1)} == {1}
@@ -0,0 +1,44 @@
+import pytest
+
+from view_builder.memory import MemoryGovernor, parse_memory_size, rss_bytes
+
+
+@pytest.mark.parametrize(
+    "value, expected",
+    [
+        ("1024", 1024),
+        ("512M", 512 * 1024**2),
+        ("4G", 4 * 1024**3),
+        ("1.5gib", 1.5 * 1024**3),
+    ],
+)
+def test_parse_memory_size(value, expected):
+    assert parse_memory_size(value) == expected
+
+
+def test_parse_memory_size_invalid():
+    with pytest.raises(ValueError):
+        parse_memory_size("lots")
+
+
+def test_rss_bytes():
+    rss = rss_bytes()
+    assert rss is None or rss > 0
+
+
+def test_memory_governor():
+    readings = iter([900, 950, 950, 940, 400, 300])
+    governor = MemoryGovernor(
+        1000, batch_size=100, min_batch_size=30, rss=lambda: next(readings)
+    )
+
+    # above the high water mark and growing
+    assert governor.adjust() == 50
+    assert governor.adjust() == 30
+    # high but no longer growing
+    assert governor.adjust() == 30
+    assert governor.adjust() == 30
+    # plenty of headroom
+    assert governor.adjust() == 60
+    assert governor.adjust() == 120
+    assert governor.peak_rss == 950
@@ -0,0 +1,36 @@
+import sqlite3
+
+from sqlalchemy import create_engine
+
+from view_builder.model.table import Base
+from view_builder.optimise import optimise_view_model
+
+
+def test_optimise_view_model(tmp_path):
+    path = str(tmp_path / "view_model.sqlite3")
+    Base.metadata.create_all(create_engine("sqlite+pysqlite:///{}".format(path)))
+    conn = sqlite3.connect(path)
+    conn.executemany(
+        "INSERT INTO geography (entity, geography, type, name) VALUES (?, ?, ?, ?)",
+        [
+            (i, "ref:{}".format(i), "type-{}".format(i % 3), "x" * 100)
+            for i in range(500)
+        ],
+    )
+    conn.execute("DELETE FROM geography WHERE entity % 2 = 0")
+    conn.commit()
+    conn.close()
+
+    report = optimise_view_model(path, page_size=1024)
+
+    assert report["page_size"] == 1024
+    assert report["size_after"] < report["size_before"]
+    assert report["queries"]["geography-by-entity"]["after"] is not None
+    # geography_geom is only created by the post-process
+    assert report["queries"]["geography-geom-by-type"] == {
+        "before": None,
+        "after": None,
+    }
+
+    conn = sqlite3.connect(path)
+    assert conn.execute("SELECT count(*) FROM sqlite_stat1").fetchone()[0] > 0
@@ -0,0 +1,178 @@
+import json
+import sqlite3
+from datetime import date
+
+import pyarrow as pa
+import pyarrow.dataset as ds
+import pyarrow.parquet as pq
+import pytest
+from sqlalchemy import create_engine
+
+from view_builder.model.table import Base
+from view_builder.parquet import (
+    GEOGRAPHY_COLUMNS,
+    export_parquet,
+    geography_schema,
+    property_fields,
+    property_type,
+)
+
+
+@pytest.fixture
+def view_model(tmp_path):
+    path = str(tmp_path / "view_model.sqlite3")
+    engine = create_engine("sqlite+pysqlite:///{}".format(path))
+    Base.metadata.create_all(engine)
+    engine.dispose()
+    conn = sqlite3.connect(path)
+    conn.executemany(
+        "INSERT INTO geography "
+        "(entity, geography, name, type, geometry, point, properties, entry_date) "
+        "VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+        [
+            (
+                entity,
+                "GB{}".format(entity),
+                "green belt {}".format(entity),
+                "green-belt",
+                "POLYGON (({0} 50, {0} 51, {1} 51, {0} 50))".format(entity, entity + 1),
+                None,
+                json.dumps(
+                    {
+                        "name": "green belt {}".format(entity),
+                        "entry-date": "2021-01-01",
+                        "organisation": "local-authority-eng:AAA",
+                        "area": entity * 1.5,
+                    }
+                ),
+                "2021-01-01",
+            )
+            for entity in range(1, 6)
+        ]
+        + [
+            (
+                10,
+                "T1",
+                None,
+                "tree",
+                # an empty geometry, for which the point is exported
+                "",
+                "POINT (-0.5 51.5)",
+                json.dumps({"height": 10}),
+                None,
+            ),
+            (11, "T2", None, "tree", None, None, None, None),
+        ],
+    )
+    conn.executescript("""
+        INSERT INTO organisation (entity, organisation, name)
+            VALUES (100, 'local-authority-eng:AAA', 'Aaa');
+        INSERT INTO organisation_geography (organisation_id, geography_id)
+            VALUES (100, 1), (100, 2), (100, 10);
+        INSERT INTO metric (id, field, value) VALUES (1, 'area', '1.5');
+        INSERT INTO geography_metric (metric_id, geography_id) VALUES (1, 1);
+        """)
+    conn.commit()
+    conn.close()
+    return path
+
+
+def test_property_type():
+    assert property_type(["integer", "null"]) == pa.int64()
+    assert property_type(["integer", "real"]) == pa.float64()
+    assert property_type(["true", "false"]) == pa.bool_()
+    assert property_type(["integer", "text"]) == pa.string()
+    assert property_type(["null"]) == pa.string()
+
+
+def test_property_fields_collisions(view_model):
+    conn = sqlite3.connect(view_model)
+    conn.execute(
+        "UPDATE geography SET properties = ? WHERE entity = 10",
+        (
+            json.dumps(
+                {
+                    "flood-zone": "2",
+                    "flood_zone": 3,
+                    "flood_zone_2": 1,
+                    "end-date": "2022-01-01",
+                }
+            ),
+        ),
+    )
+
+    fields = property_fields(conn, "tree")
+    assert [(key, field.name) for key, field in fields] == [
+        ("flood-zone", "flood_zone_3"),
+        ("flood_zone", "flood_zone"),
+        ("flood_zone_2", "flood_zone_2"),
+    ]
+    # still a valid schema, without duplicate names
+    assert len(set(geography_schema(fields).names)) == len(GEOGRAPHY_COLUMNS) + 5
+
+
+def test_export_parquet(view_model, tmp_path):
+    output = tmp_path / "parquet"
+
+    counts = export_parquet(view_model, str(output), row_group_size=2)
+
+    assert counts == {
+        "geography": 7,
+        "organisation_geography": 3,
+        "geography_category": 0,
+        "geography_metric": 1,
+        "geography_containment": 0,
+        "document_geography": 0,
+        "policy_geography": 0,
+        "organisation": 1,
+        "category": 0,
+        "metric": 1,
+    }
+
+    green_belt = output / "geography" / "type=green-belt" / "part-0.parquet"
+    metadata = pq.read_metadata(green_belt)
+    assert metadata.num_row_groups == 3
+    geo = json.loads(metadata.metadata[b"geo"])
+    assert geo["primary_column"] == "geometry"
+    assert geo["columns"]["geometry"]["geometry_types"] == ["Polygon"]
+    assert geo["columns"]["geometry"]["bbox"] == [1, 50, 6, 51]
+
+    table = pq.read_table(green_belt)
+    assert table.schema.field("entry_date").type == pa.date32()
+    assert table.schema.field("area").type == pa.float64()
+    assert "entry-date" not in table.schema.names
+    row = table.slice(0, 1).to_pylist()[0]
+    assert row["entity"] == 1
+    assert row["entry_date"] == date(2021, 1, 1)
+    assert row["organisation"] == "local-authority-eng:AAA"
+    assert row["bbox"] == {"xmin": 1, "ymin": 50, "xmax": 2, "ymax": 51}
+    assert row["geometry"][:5] == b"\x01\x03\x00\x00\x00"
+
+    trees = pq.read_table(output / "geography" / "type=tree").to_pylist()
+    assert [(tree["entity"], tree["height"]) for tree in trees] == [
+        (10, 10),
+        (11, None),
+    ]
+    assert trees[0]["bbox"]["xmin"] == -0.5
+    assert trees[0]["geometry"][:5] == b"\x01\x01\x00\x00\x00"
+    assert trees[1]["geometry"] is None and trees[1]["bbox"] is None
+
+
+def test_export_parquet_partitions(view_model, tmp_path):
+    output = tmp_path / "parquet"
+    export_parquet(view_model, str(output))
+
+    relations = ds.dataset(
+        output / "organisation_geography", partitioning="hive"
+    ).to_table()
+    assert sorted(
+        zip(
+            relations.column("type").to_pylist(),
+            relations.column("geography_id").to_pylist(),
+        )
+    ) == [("green-belt", 1), ("green-belt", 2), ("tree", 10)]
+
+    # exporting again replaces rather than adds to the last export
+    export_parquet(view_model, str(output), types=["tree"])
+    assert [path.name for path in (output / "geography").iterdir()] == ["type=tree"]
+    assert pq.read_table(output / "organisation").num_rows == 1
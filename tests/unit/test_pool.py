@@ -0,0 +1,47 @@
+import sqlite3
+
+import pytest
+
+from view_builder.pool import chunks, map_in_workers, worker_connection
+
+
+def test_chunks():
+    assert list(chunks(range(5), 2)) == [[0, 1], [2, 3], [4]]
+    assert list(chunks([], 2)) == []
+
+
+def count_rows(table):
+    (count,) = (
+        worker_connection().execute("SELECT count(*) FROM {}".format(table)).fetchone()
+    )
+    return table, count
+
+
+@pytest.mark.parametrize("workers", [1, 2])
+def test_map_in_workers(tmp_path, workers):
+    path = str(tmp_path / "view_model.sqlite3")
+    conn = sqlite3.connect(path)
+    conn.executescript("""
+        CREATE TABLE one (id);
+        CREATE TABLE two (id);
+        INSERT INTO two VALUES (1), (2);
+        """)
+    conn.close()
+
+    assert list(map_in_workers(count_rows, path, ["one", "two"], workers)) == [
+        ("one", 0),
+        ("two", 2),
+    ]
+    assert worker_connection() is None
+
+
+def test_map_in_workers_read_only(tmp_path):
+    path = str(tmp_path / "view_model.sqlite3")
+    sqlite3.connect(path).execute("CREATE TABLE one (id)")
+
+    def insert(value):
+        worker_connection().execute("INSERT INTO one VALUES (?)", (value,))
+
+    with pytest.raises(sqlite3.OperationalError):
+        list(map_in_workers(insert, path, [1], workers=1))
+    assert worker_connection() is None
@@ -0,0 +1,44 @@
+from view_builder.precision import round_geometry, round_positions
+
+RING = [[0, 0], [0.0000001, 0], [0, 1], [1, 1], [1, 0], [0, 0]]
+
+
+def test_round_positions():
+    assert round_positions(RING, 5) == [
+        [0, 0],
+        [0, 0],
+        [0, 1],
+        [1, 1],
+        [1, 0],
+        [0, 0],
+    ]
+    assert round_positions(RING, 5, drop_repeated=True) == [
+        [0, 0],
+        [0, 1],
+        [1, 1],
+        [1, 0],
+        [0, 0],
+    ]
+    # a ring that would collapse keeps its rounded positions
+    assert round_positions(
+        [[0, 0], [0.0000001, 0], [0, 0.0000001], [0, 0]], 5, drop_repeated=True
+    ) == [[0, 0], [0, 0], [0, 0], [0, 0]]
+
+
+def test_round_geometry():
+    assert round_geometry(
+        {"type": "Point", "coordinates": [-0.123456789, 51.5000001]}, 6
+    ) == {"type": "Point", "coordinates": [-0.123457, 51.5]}
+
+    def collection():
+        return {
+            "type": "GeometryCollection",
+            "geometries": [{"type": "MultiPolygon", "coordinates": [[RING]]}],
+        }
+
+    assert round_geometry(collection(), 5, drop_repeated=True)["geometries"][0][
+        "coordinates"
+    ] == [[[[0, 0], [0, 1], [1, 1], [1, 0], [0, 0]]]]
+    assert (
+        len(round_geometry(collection(), 5)["geometries"][0]["coordinates"][0][0]) == 6
+    )
@@ -0,0 +1,81 @@
+import datetime
+
+from view_builder.model.projection import Projection, compile_projection
+from view_builder.model.table import Document, Entity
+
+
+class DummyModel:
+    dataset_name = "dummy-dataset"
+    typology = "document"
+
+
+def test_compile_projection_columns_and_constants():
+    project = compile_projection(
+        {
+            "entity": Projection(
+                Entity,
+                constants={"dataset": "{dataset_name}", "typology": "{typology}"},
+            ),
+            "document": Projection(
+                Document,
+                sources={
+                    "document": ["document", "{dataset_name}"],
+                    "document_url": ["document_url", "document-url"],
+                },
+            ),
+        },
+        context=DummyModel,
+    )
+
+    attributes = project(
+        {
+            "entity": 1,
+            "dummy-dataset": "AAA",
+            "document-url": "www.example.com",
+            "name": "BBB",
+            "extra_field": "ZZZ",
+        }
+    )
+
+    assert attributes["entity"] == {
+        "entity": 1,
+        "dataset": "dummy-dataset",
+        "typology": "document",
+    }
+    assert attributes["document"] == {
+        "entity": 1,
+        "document": "AAA",
+        "name": "BBB",
+        "document_url": "www.example.com",
+    }
+
+
+def test_compile_projection_prefers_first_source():
+    project = compile_projection(
+        {
+            "document": Projection(
+                Document, sources={"document_url": ["document_url", "document-url"]}
+            )
+        }
+    )
+
+    attributes = project({"document_url": "first", "document-url": "second"})
+
+    assert attributes["document"] == {"document_url": "first"}
+
+
+def test_compile_projection_dates_and_lists():
+    project = compile_projection(
+        {},
+        date_fields=["entry-date", "end-date"],
+        list_fields={"policies": "development-policies", "categories": "categories"},
+    )
+    data = {"entry-date": "2020-10-04", "development-policies": "pol-a;pol-b"}
+
+    attributes = project(data)
+
+    assert data == {
+        "entry_date": datetime.date(2020, 10, 4),
+        "development-policies": "pol-a;pol-b",
+    }
+    assert attributes == {"policies": ["pol-a", "pol-b"], "categories": []}
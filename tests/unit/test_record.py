@@ -0,0 +1,105 @@
+import pickle
+import sqlite3
+
+from sqlalchemy import create_engine
+
+from view_builder.builder import ViewBuilder
+from view_builder.model.dataset import BrownfieldLandModel, DevelopmentPolicyModel
+from view_builder.model.record import RECORDS, Record
+from view_builder.model.table import (
+    Base,
+    Entity,
+    Geography,
+    Policy,
+    RelationshipStaging,
+)
+
+POLICY = {
+    "development-policy": "AAA",
+    "name": "BBB",
+    "development-policy-categories": "A;B",
+    "entry-date": "2020-10-04",
+    "entity": 1,
+}
+
+BROWNFIELD_LAND = {
+    "site": "a site",
+    "point": "POINT (-1.1 52.2)",
+    "hectares": "7",
+    "site-address": "an address",
+    "entry-date": "2020-10-04",
+    "entity": 2,
+}
+
+
+def test_record():
+    record = RECORDS[Geography](entity=1, name="BBB")
+
+    assert isinstance(record, Record)
+    assert record.geometry is None
+    assert pickle.loads(pickle.dumps(record)) == record
+
+    geography = record.to_orm()
+    assert isinstance(geography, Geography)
+    assert (geography.entity, geography.name) == (1, "BBB")
+
+
+def test_to_records():
+    records = DevelopmentPolicyModel(None, dict(POLICY)).to_records(
+        defer_relationships=True
+    )
+
+    assert [record.orm_class for record in records] == [
+        Policy,
+        Entity,
+        RelationshipStaging,
+        RelationshipStaging,
+    ]
+    assert records[0].policy == "AAA"
+    assert records[1].typology == "policy"
+    assert records[3].reference == "B"
+
+    policy = DevelopmentPolicyModel(None, dict(POLICY)).to_orm(
+        defer_relationships=True
+    )[0]
+    assert records[0] == RECORDS[Policy](
+        **{
+            column: getattr(policy, column)
+            for column in Policy.__table__.columns.keys()
+        }
+    )
+
+
+def test_build_records(tmp_path):
+    path = str(tmp_path / "view_model.sqlite3")
+    builder = ViewBuilder(
+        engine=create_engine("sqlite+pysqlite:///{}".format(path)),
+        item_mapper=lambda name, session, item: BrownfieldLandModel(
+            session, item
+        ).to_records(defer_relationships=True),
+    )
+    builder.init_model(Base.metadata)
+    builder.build_model(
+        "brownfield-land",
+        [dict(BROWNFIELD_LAND), dict(BROWNFIELD_LAND, entity=3, hectares="8")],
+        flush_size=1,
+    )
+
+    conn = sqlite3.connect(path)
+    assert conn.execute(
+        "SELECT gm.geography_id, m.field, m.value "
+        "FROM geography_metric AS gm JOIN metric AS m ON m.id = gm.metric_id "
+        "ORDER BY gm.geography_id, m.field"
+    ).fetchall() == [
+        (2, "hectares", "7"),
+        (2, "site-address", "an address"),
+        (3, "hectares", "8"),
+        (3, "site-address", "an address"),
+    ]
+    assert conn.execute(
+        "SELECT dataset, typology, entity_count FROM dataset_stats"
+    ).fetchall() == [("brownfield-land", "geography", 2)]
+    assert conn.execute("SELECT entity, dataset FROM entity").fetchall() == [
+        (2, "brownfield-land"),
+        (3, "brownfield-land"),
+    ]
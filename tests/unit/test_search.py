@@ -0,0 +1,76 @@
+import sqlite3
+
+import pytest
+from sqlalchemy import create_engine
+from sqlalchemy.orm import Session
+
+from view_builder.model.table import Base, Entity, Geography, Policy
+from view_builder.search import create_search_indexes, search
+
+
+@pytest.fixture
+def conn(tmp_path):
+    path = str(tmp_path / "view_model.sqlite3")
+    engine = create_engine("sqlite+pysqlite:///{}".format(path))
+    Base.metadata.create_all(engine)
+    with Session(engine) as session:
+        session.add_all(
+            [
+                Geography(
+                    entity_rel=Entity(entity=1),
+                    geography="conservation-area:CA01",
+                    name="Green Lane",
+                ),
+                Geography(
+                    entity_rel=Entity(entity=2),
+                    geography="conservation-area:CA02",
+                    name="High Street",
+                    notes="Includes the village green",
+                ),
+                Policy(
+                    entity_rel=Entity(entity=3),
+                    policy="pol-a",
+                    name="Housing",
+                    description="Protecting the green belt",
+                ),
+            ]
+        )
+        session.commit()
+    engine.dispose()
+
+    conn = sqlite3.connect(path)
+    create_search_indexes(conn)
+    yield conn
+    conn.close()
+
+
+def test_search(conn):
+    assert sorted(search(conn, "green")) == [
+        ("geography", 1, "Green Lane"),
+        ("geography", 2, "High Street"),
+        ("policy", 3, "Housing"),
+    ]
+    assert search(conn, "street") == [("geography", 2, "High Street")]
+    assert search(conn, "housing", tables=["geography"]) == []
+
+
+def test_search_index_kept_in_sync(conn):
+    conn.execute("UPDATE geography SET name = 'Mill Lane' WHERE entity = 1")
+    conn.execute("DELETE FROM geography WHERE entity = 2")
+    conn.execute(
+        "INSERT INTO geography (entity, geography, name) "
+        "VALUES (4, 'conservation-area:CA04', 'Mill Pond')"
+    )
+
+    assert sorted(search(conn, "mill")) == [
+        ("geography", 1, "Mill Lane"),
+        ("geography", 4, "Mill Pond"),
+    ]
+    assert search(conn, "street") == []
+    conn.execute("INSERT INTO geography_fts (geography_fts) VALUES ('integrity-check')")
+
+
+def test_create_search_indexes_is_repeatable(conn):
+    create_search_indexes(conn)
+
+    assert search(conn, "street") == [("geography", 2, "High Street")]
@@ -0,0 +1,179 @@
+import sqlite3
+
+import pytest
+from sqlalchemy import create_engine
+from sqlalchemy.orm import Session
+
+from view_builder.builder import ViewBuilder
+from view_builder.model.dataset import BrownfieldLandModel, DevelopmentPolicyModel
+from view_builder.model.table import Base, BuildState, Category, Entity, Organisation
+from view_builder.shard import (
+    MIN_SHARD_MEMORY,
+    MergeError,
+    create_shard,
+    merge_shards,
+    shard_workers,
+)
+
+BROWNFIELD_LAND = {
+    "site": "a site",
+    "point": "POINT (-1.1 52.2)",
+    "hectares": "7",
+    "organisation": "local-authority-eng:AAA",
+    "ownership-status": "owned by a public authority",
+    "entry-date": "2020-10-04",
+}
+
+POLICY = {
+    "development-policy": "AAA",
+    "name": "BBB",
+    "development-policy-categories": "A",
+    "entry-date": "2020-10-04",
+}
+
+
+@pytest.fixture
+def base(tmp_path):
+    path = str(tmp_path / "view_model.sqlite3")
+    engine = create_engine("sqlite+pysqlite:///{}".format(path))
+    Base.metadata.create_all(engine)
+    with Session(engine) as session:
+        session.add_all(
+            [
+                Organisation(
+                    entity_rel=Entity(
+                        entity=1, typology="organisation", dataset="organisation"
+                    ),
+                    organisation="local-authority-eng:AAA",
+                ),
+                Category(
+                    entity_rel=Entity(
+                        entity=2, typology="category", dataset="ownership-status"
+                    ),
+                    category="owned-by-a-public-authority",
+                    type="ownership-status",
+                ),
+            ]
+        )
+        session.commit()
+    return path
+
+
+def build_shard(base, path, dataset_name, model, items, defer=False):
+    create_shard(base, path)
+    builder = ViewBuilder(
+        engine=create_engine("sqlite+pysqlite:///{}".format(path)),
+        item_mapper=lambda name, session, item: model(session, item).to_orm(
+            defer_relationships=defer
+        ),
+    )
+    builder.build_model(dataset_name, items)
+    return builder
+
+
+def test_merge_shards(base, tmp_path):
+    brownfield_land = str(tmp_path / "brownfield-land.sqlite3")
+    development_policy = str(tmp_path / "development-policy.sqlite3")
+    build_shard(
+        base,
+        brownfield_land,
+        "brownfield-land",
+        BrownfieldLandModel,
+        [dict(BROWNFIELD_LAND, entity=10), dict(BROWNFIELD_LAND, entity=11)],
+    )
+    build_shard(
+        base,
+        development_policy,
+        "development-policy",
+        DevelopmentPolicyModel,
+        [dict(POLICY, entity=20)],
+        defer=True,
+    )
+
+    # the seeded organisation and category resolve within the shard
+    conn = sqlite3.connect(brownfield_land)
+    assert conn.execute(
+        "SELECT organisation_id, geography_id FROM organisation_geography"
+    ).fetchall() == [
+        (1, 10),
+        (1, 11),
+    ]
+    assert conn.execute(
+        "SELECT category_id, geography_id FROM geography_category"
+    ).fetchall() == [
+        (2, 10),
+        (2, 11),
+    ]
+
+    # metric ids clash between shards, so are renumbered
+    conn = sqlite3.connect(base)
+    conn.execute("INSERT INTO metric (id, field, value) VALUES (1, 'x', 'y')")
+    conn.commit()
+
+    assert merge_shards(base, [brownfield_land, development_policy]) == {
+        brownfield_land: ["brownfield-land"],
+        development_policy: ["development-policy"],
+    }
+
+    assert conn.execute(
+        "SELECT entity, dataset FROM entity ORDER BY entity"
+    ).fetchall() == [
+        (1, "organisation"),
+        (2, "ownership-status"),
+        (10, "brownfield-land"),
+        (11, "brownfield-land"),
+        (20, "development-policy"),
+    ]
+    assert conn.execute(
+        "SELECT gm.geography_id, m.field, m.value "
+        "FROM geography_metric AS gm JOIN metric AS m ON m.id = gm.metric_id "
+        "ORDER BY gm.geography_id"
+    ).fetchall() == [(10, "hectares", "7"), (11, "hectares", "7")]
+    assert conn.execute("SELECT count(*) FROM organisation_geography").fetchone() == (
+        2,
+    )
+    assert conn.execute(
+        "SELECT from_entity, reference FROM relationship_staging"
+    ).fetchall() == [(20, "A")]
+    assert conn.execute(
+        "SELECT dataset, entity_count FROM dataset_stats ORDER BY dataset"
+    ).fetchall() == [("brownfield-land", 2), ("development-policy", 1)]
+
+    with pytest.raises(MergeError, match="already in the view model"):
+        merge_shards(base, [brownfield_land])
+
+
+def test_merge_shards_checks(base, tmp_path):
+    path = str(tmp_path / "brownfield-land.sqlite3")
+    builder = build_shard(
+        base,
+        path,
+        "brownfield-land",
+        BrownfieldLandModel,
+        [dict(BROWNFIELD_LAND, entity=10)],
+    )
+    with Session(builder._engine) as session:
+        session.merge(BuildState(dataset="brownfield-land", complete=False))
+        session.commit()
+
+    with pytest.raises(MergeError, match="incomplete builds of brownfield-land"):
+        merge_shards(base, [path])
+
+    with Session(builder._engine) as session:
+        session.merge(BuildState(dataset="brownfield-land", complete=True))
+        session.commit()
+    conn = sqlite3.connect(base)
+    conn.execute("INSERT INTO entity (entity, dataset) VALUES (10, 'other')")
+    conn.commit()
+
+    with pytest.raises(MergeError, match="1 entities already in the view model"):
+        merge_shards(base, [path])
+    assert conn.execute("SELECT count(*) FROM geography").fetchone() == (0,)
+
+
+def test_shard_workers():
+    assert shard_workers(4) == (4, None)
+    assert shard_workers(4, 8 * MIN_SHARD_MEMORY) == (4, 2 * MIN_SHARD_MEMORY)
+    # fewer workers rather than builds with less than the minimum each
+    assert shard_workers(8, 3 * MIN_SHARD_MEMORY) == (3, MIN_SHARD_MEMORY)
+    assert shard_workers(8, MIN_SHARD_MEMORY // 2) == (1, MIN_SHARD_MEMORY // 2)
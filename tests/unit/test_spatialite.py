@@ -0,0 +1,164 @@
+import json
+import re
+import sqlite3
+import struct
+from pathlib import Path
+
+import pytest
+from sqlalchemy import create_engine
+
+from view_builder.export import export_features
+from view_builder.model.table import Base
+from view_builder.spatialite import as_geojson
+from view_builder.sqlite import connect_read_only
+
+POST_PROCESS = Path(__file__).parents[2] / "post_process.sql"
+
+
+def blob(class_type, body, endian="<"):
+    # SpatiaLite's BLOB format, the MBR isn't read so is left empty
+    return (
+        b"\x00"
+        + (b"\x01" if endian == "<" else b"\x00")
+        + struct.pack(endian + "i4d", 4326, 0, 0, 0, 0)
+        + b"\x7c"
+        + struct.pack(endian + "i", class_type)
+        + body
+        + b"\xfe"
+    )
+
+
+def positions(*values, endian="<"):
+    return struct.pack("{}{:d}d".format(endian, len(values)), *values)
+
+
+def polygon(*rings):
+    body = struct.pack("<i", len(rings))
+    for ring in rings:
+        body += struct.pack("<i", len(ring) // 2) + positions(*ring)
+    return body
+
+
+SQUARE = polygon([0, 0, 0, 1, 1, 1, 1, 0, 0, 0])
+POINT = blob(1, positions(-0.1234567, 51.5))
+MULTIPOLYGON = blob(
+    6,
+    struct.pack("<i", 2)
+    + b"\x69"
+    + struct.pack("<i", 3)
+    + SQUARE
+    + b"\x69"
+    + struct.pack("<i", 3)
+    + polygon([2, 2, 2, 3, 3, 3, 2, 2]),
+)
+
+
+def test_as_geojson():
+    assert json.loads(as_geojson(POINT)) == {
+        "type": "Point",
+        "coordinates": [-0.1234567, 51.5],
+    }
+    assert json.loads(as_geojson(POINT, 3))["coordinates"] == [-0.123, 51.5]
+    assert json.loads(as_geojson(MULTIPOLYGON)) == {
+        "type": "MultiPolygon",
+        "coordinates": [
+            [[[0, 0], [0, 1], [1, 1], [1, 0], [0, 0]]],
+            [[[2, 2], [2, 3], [3, 3], [2, 2]]],
+        ],
+    }
+
+
+def test_as_geojson_dimensions():
+    assert json.loads(as_geojson(blob(1, positions(1, 2, endian=">"), ">"))) == {
+        "type": "Point",
+        "coordinates": [1, 2],
+    }
+    # GeoJSON has Z but no M
+    xyzm = json.loads(as_geojson(blob(3001, positions(1, 2, 3, 4))))
+    assert xyzm["coordinates"] == [1, 2, 3]
+    xym = json.loads(as_geojson(blob(2001, positions(1, 2, 4))))
+    assert xym["coordinates"] == [1, 2]
+
+
+def test_as_geojson_invalid():
+    assert as_geojson(None) is None
+    assert as_geojson("POINT (1 2)") is None
+    assert as_geojson(POINT[:-3]) is None
+    # compressed geometries aren't supported
+    assert as_geojson(blob(1000003, SQUARE)) is None
+
+
+@pytest.fixture
+def view_model(tmp_path):
+    # geography_feature as the post-process makes it, without SpatiaLite
+    path = str(tmp_path / "view_model.sqlite3")
+    Base.metadata.create_all(create_engine("sqlite+pysqlite:///{}".format(path)))
+    conn = sqlite3.connect(path)
+    conn.executescript("""
+        CREATE TABLE geography_feature (
+            entity INTEGER NOT NULL UNIQUE, type, geom_simple BLOB, geom, geom_point
+        );
+        INSERT INTO geography (entity, type, properties) VALUES
+            (1, 'green-belt', '{"name": "one"}'),
+            (2, 'tree', '{"name": "two"}');
+        INSERT INTO dataset_stats (dataset, coordinate_precision)
+            VALUES ('tree', 3);
+        CREATE VIRTUAL TABLE idx_geography_feature_geom
+            USING rtree(pkid, xmin, xmax, ymin, ymax);
+        CREATE VIRTUAL TABLE idx_geography_feature_geom_point
+            USING rtree(pkid, xmin, xmax, ymin, ymax);
+        INSERT INTO idx_geography_feature_geom VALUES (1, 0, 3, 0, 3);
+        INSERT INTO idx_geography_feature_geom_point VALUES (2, -0.2, -0.1, 51.5, 51.5);
+        """)
+    conn.executemany(
+        "INSERT INTO geography_feature VALUES (?, ?, ?, ?, ?)",
+        [
+            (1, "green-belt", blob(3, SQUARE), MULTIPOLYGON, None),
+            (2, "tree", None, None, POINT),
+        ],
+    )
+    views = re.findall(r"CREATE VIEW \w+ AS.*?;", POST_PROCESS.read_text(), re.DOTALL)
+    assert len(views) == 3
+    for view in views:
+        conn.execute(view)
+    conn.commit()
+    conn.close()
+    return path
+
+
+def test_geography_geom_view(view_model):
+    conn = connect_read_only(view_model)
+    features = conn.execute(
+        "SELECT rowid, entity, geojson_simple, geojson_full, type "
+        "FROM geography_geom ORDER BY rowid"
+    ).fetchall()
+
+    assert [(rowid, entity, type) for rowid, entity, _, _, type in features] == [
+        (1, 1, "green-belt"),
+        (2, 2, "tree"),
+    ]
+    simple, full = json.loads(features[0][2]), json.loads(features[0][3])
+    assert simple["properties"] == full["properties"] == {"name": "one"}
+    assert simple["geometry"]["type"] == "Polygon"
+    assert full["geometry"]["type"] == "MultiPolygon"
+    assert json.loads(features[1][3]) == {
+        "type": "Feature",
+        "entity": 2,
+        "properties": {"name": "two"},
+        "geometry": {"type": "Point", "coordinates": [-0.123, 51.5]},
+    }
+    assert features[1][2] == features[1][3]
+
+    # the spatial indexes under the names they had before geography_geom was a view
+    assert [
+        json.loads(feature)["entity"]
+        for feature in export_features(conn, bbox=(-1.0, 51.0, 0.0, 52.0))
+    ] == [2]
+
+
+def test_get_geography_datasets(view_model):
+    tiles = pytest.importorskip("view_builder.tiles", exc_type=ImportError)
+    assert sorted(tiles.get_geography_datasets(view_model)) == [
+        ("green-belt",),
+        ("tree",),
+    ]
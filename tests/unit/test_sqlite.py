@@ -0,0 +1,27 @@
+import sqlite3
+
+import pytest
+
+from view_builder.sqlite import connect_read_only
+
+
+@pytest.fixture
+def database(tmp_path):
+    path = str(tmp_path / "input db.sqlite3")
+    conn = sqlite3.connect(path)
+    conn.execute("CREATE TABLE entry (entity INTEGER, name TEXT)")
+    conn.execute("INSERT INTO entry VALUES (1, 'AAA')")
+    conn.commit()
+    conn.close()
+    return path
+
+
+@pytest.mark.parametrize("immutable", [True, False])
+def test_connect_read_only(database, immutable):
+    conn = connect_read_only(database, immutable=immutable, mmap_size=1024**2)
+
+    assert conn.execute("SELECT name FROM entry").fetchall() == [("AAA",)]
+    assert conn.execute("PRAGMA query_only").fetchone() == (1,)
+    assert conn.execute("PRAGMA cache_size").fetchone() == (-256 * 1024,)
+    with pytest.raises(sqlite3.OperationalError):
+        conn.execute("INSERT INTO entry VALUES (2, 'BBB')")
@@ -0,0 +1,77 @@
+import sqlite3
+
+import pytest
+import shapely
+from shapely import wkt
+from shapely.geometry import Point
+from sqlalchemy import create_engine
+
+from view_builder.model.table import Base
+from view_builder.subdivide import build_parts, parts_intersecting, subdivide
+
+# a circle of 1024 vertices
+CIRCLE = Point(0, 0).buffer(10, quad_segs=256)
+
+
+def test_subdivide():
+    parts = subdivide(CIRCLE, max_vertices=200)
+
+    assert len(parts) > 4
+    assert all(shapely.get_num_coordinates(part) <= 200 for part in parts)
+    assert sum(part.area for part in parts) == pytest.approx(CIRCLE.area)
+    assert shapely.union_all(parts).symmetric_difference(CIRCLE).area < 1e-6
+
+
+def test_subdivide_small():
+    assert subdivide(CIRCLE, max_vertices=2000) == [CIRCLE]
+
+
+@pytest.fixture
+def view_model(tmp_path):
+    path = str(tmp_path / "view_model.sqlite3")
+    engine = create_engine("sqlite+pysqlite:///{}".format(path))
+    Base.metadata.create_all(engine)
+    conn = sqlite3.connect(path)
+    conn.executemany(
+        "INSERT INTO geography (entity, type, geometry) VALUES (?, ?, ?)",
+        [
+            (1, "green-belt", CIRCLE.wkt),
+            (2, "green-belt", Point(0, 0).buffer(1).wkt),
+            (3, "conservation-area", CIRCLE.wkt),
+        ],
+    )
+    conn.commit()
+    return path
+
+
+def test_build_parts(view_model):
+    assert build_parts(view_model, 200, ["green-belt"], workers=1)[0] == 1
+    geographies, parts = build_parts(view_model, 200, workers=1)
+    assert geographies == 2
+
+    conn = sqlite3.connect(view_model)
+    assert conn.execute(
+        "SELECT geography_id, count(*) FROM geography_part GROUP BY geography_id"
+    ).fetchall() == [(1, parts // 2), (3, parts // 2)]
+    assert conn.execute("SELECT count(*) FROM geography_part_rtree").fetchone() == (
+        parts,
+    )
+
+    # subdividing one type again leaves the other's parts
+    assert build_parts(view_model, 200, ["conservation-area"], workers=1) == (
+        1,
+        parts // 2,
+    )
+    assert conn.execute(
+        "SELECT geography_id, count(*) FROM geography_part GROUP BY geography_id"
+    ).fetchall() == [(1, parts // 2), (3, parts // 2)]
+    assert conn.execute(
+        "SELECT count(*) FROM geography_part_rtree AS r "
+        "JOIN geography_part AS p ON p.id = r.id"
+    ).fetchone() == (parts,)
+
+    # only the parts at the edge of the circle, not the whole of it
+    edge = parts_intersecting(conn, 9.9, -0.1, 10.1, 0.1)
+    assert {geography for geography, _ in edge} == {1, 3}
+    assert len(edge) < parts
+    assert any(wkt.loads(part).intersects(Point(9.95, 0)) for _, part in edge)
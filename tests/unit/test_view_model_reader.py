@@ -0,0 +1,120 @@
+import json
+import sqlite3
+
+import pytest
+from sqlalchemy import create_engine
+from sqlalchemy.orm import Session
+
+from view_builder.model.table import (
+    Base,
+    Category,
+    Entity,
+    Geography,
+    GeographyCategory,
+    Organisation,
+    OrganisationGeography,
+)
+from view_builder.view_model_reader import ENTRY_SIZE, LRUCache, ViewModelReader
+
+FEATURE = {"type": "Feature", "entity": 3, "properties": {"name": "Green Lane"}}
+
+
+@pytest.fixture
+def view_model(tmp_path):
+    path = str(tmp_path / "view_model.sqlite3")
+    engine = create_engine("sqlite+pysqlite:///{}".format(path))
+    Base.metadata.create_all(engine)
+    with Session(engine) as session:
+        organisation = Organisation(
+            entity_rel=Entity(entity=1), organisation="local-authority-eng:AAA"
+        )
+        category = Category(entity_rel=Entity(entity=2), category="A", type="t")
+        geography = Geography(
+            entity_rel=Entity(entity=3),
+            geography="conservation-area:CA01",
+            name="Green Lane",
+            type="conservation-area",
+        )
+        session.add_all(
+            [
+                OrganisationGeography(organisation=organisation, geography=geography),
+                GeographyCategory(category=category, geography=geography),
+            ]
+        )
+        session.commit()
+    engine.dispose()
+
+    conn = sqlite3.connect(path)
+    conn.execute(
+        "CREATE TABLE geography_geom "
+        "(entity INTEGER NOT NULL UNIQUE, geojson_simple, geojson_full, type)"
+    )
+    conn.execute(
+        "INSERT INTO geography_geom VALUES (3, ?, ?, 'conservation-area')",
+        (json.dumps(FEATURE), json.dumps(FEATURE)),
+    )
+    conn.commit()
+    conn.close()
+    return path
+
+
+def test_feature(view_model):
+    with ViewModelReader(view_model, pool_size=2) as reader:
+        assert reader.feature(3) == FEATURE
+        assert reader.feature(3) == FEATURE
+        assert reader.feature(4) is None
+
+        assert reader.stats.hits == 1
+        assert reader.stats.misses == 2
+
+
+def test_geography(view_model):
+    with ViewModelReader(view_model) as reader:
+        record = reader.geography(3)
+
+        assert record["geography"] == "conservation-area:CA01"
+        assert record["organisations"] == [
+            {"entity": 1, "organisation": "local-authority-eng:AAA", "name": None}
+        ]
+        assert record["categories"] == [
+            {"entity": 2, "category": "A", "type": "t", "name": None}
+        ]
+        assert reader.geography(3) is record
+        assert reader.geography(4) is None
+
+
+def test_lru_cache_evicts_by_size():
+    cache = LRUCache(max_size=10)
+    cache.put("a", 1, 4)
+    cache.put("b", 2, 4)
+    assert cache.get("a") == (True, 1)
+
+    cache.put("c", 3, 4)
+
+    assert cache.get("b") == (False, None)
+    assert cache.get("a") == (True, 1)
+    assert cache.get("c") == (True, 3)
+    assert cache.size == 8
+    assert cache.stats.evictions == 1
+
+    cache.put("d", 4, 11)
+    assert cache.get("d") == (False, None)
+
+
+def test_missing_entities_are_bounded(view_model):
+    with ViewModelReader(view_model, cache_size=10 * ENTRY_SIZE) as reader:
+        for entity in range(1000, 2000):
+            assert reader.feature(entity) is None
+
+        assert len(reader.cache) == 10
+        assert reader.cache.size <= reader.cache.max_size
+        assert reader.stats.evictions == 990
+
+
+def test_lru_cache_min_entry_size():
+    cache = LRUCache(max_size=10, min_entry_size=5)
+    for key in range(5):
+        cache.put(key, None, 0)
+
+    assert len(cache) == 2
+    assert cache.size == 10
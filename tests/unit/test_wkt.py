@@ -0,0 +1,35 @@
+from view_builder.wkt import round_wkt, wkt_bounds, wkt_coordinates
+
+
+def test_wkt_coordinates():
+    assert wkt_coordinates("LINESTRING (-0.5 51.5, 1e-3 52)") == (
+        [-0.5, 0.001],
+        [51.5, 52.0],
+    )
+    assert wkt_coordinates(None) == ([], [])
+
+
+def test_wkt_bounds():
+    assert wkt_bounds("POINT (-0.5 51.5)") == (-0.5, 51.5, -0.5, 51.5)
+    assert wkt_bounds(
+        "MULTIPOLYGON (((-1 51, -1 52.5, 0.25 52.5, -1 51)), ((2 50, 3 50, 2 50)))"
+    ) == (-1.0, 50.0, 3.0, 52.5)
+    assert wkt_bounds("POINT EMPTY") is None
+    assert wkt_bounds(None) is None
+
+
+def test_round_wkt():
+    assert round_wkt("POINT (-0.123456789 51.5000001)", 6) == "POINT (-0.123457 51.5)"
+    assert (
+        round_wkt(
+            "POLYGON ((0 0, 0.0000001 0, 0 1, 1 1, 1 0, 0 0), (0 0, 0 0.5, 0.5 0, 0 0))",
+            5,
+        )
+        == "POLYGON ((0 0, 0 1, 1 1, 1 0, 0 0), (0 0, 0 0.5, 0.5 0, 0 0))"
+    )
+    # a ring that would collapse keeps its rounded vertices
+    assert round_wkt("POLYGON ((0 0, 0.0000001 0, 0 0.0000001, 0 0))", 5) == (
+        "POLYGON ((0 0, 0 0, 0 0, 0 0))"
+    )
+    assert round_wkt("POINT (-0.0000001 0)", 5) == "POINT (0 0)"
+    assert round_wkt(None, 5) is None
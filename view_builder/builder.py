@@ -1,8 +1,126 @@
 import logging
+import queue
+import threading
+import time
 
+from sqlalchemy import func, select
 from sqlalchemy.orm import Session
 from tqdm import tqdm
 
+from view_builder.dataset_stats import BROKEN_RELATIONSHIPS, DatasetStatsCollector
+from view_builder.model.record import Record
+from view_builder.model.table import Base, BuildState, DatasetStats
+
+logger = logging.getLogger("builder")
+
+# marks the end of a pipeline stage's output
+_DONE = object()
+
+
+class StageStats:
+    def __init__(self, name):
+        self.name = name
+        self.items = 0
+        self.busy = 0.0
+        self.waiting = 0.0
+        self.max_queue_depth = 0
+        self._queue_depth_total = 0
+
+    def record_queue_depth(self, depth):
+        self.max_queue_depth = max(self.max_queue_depth, depth)
+        self._queue_depth_total += depth
+
+    @property
+    def throughput(self):
+        return self.items / self.busy if self.busy else 0.0
+
+    @property
+    def mean_queue_depth(self):
+        return self._queue_depth_total / self.items if self.items else 0.0
+
+    def __str__(self):
+        return (
+            "{}: {} items, {:.0f}/s busy, {:.1f}s busy, {:.1f}s waiting, "
+            "queue depth mean {:.0f} max {}".format(
+                self.name,
+                self.items,
+                self.throughput,
+                self.busy,
+                self.waiting,
+                self.mean_queue_depth,
+                self.max_queue_depth,
+            )
+        )
+
+
+class _Stopped(Exception):
+    pass
+
+
+class RecordWriter:
+    """
+    Writes records with a bulk insert per table rather than through the unit
+    of work. Records with no key that other records refer to are given the
+    next id, and a missing key in a join record is that of the last record
+    written to the table it refers to, e.g. a geography_metric's metric.
+    """
+
+    def __init__(self, session):
+        self.session = session
+        self.pending = {}
+        self.next_ids = {}
+        self.last_ids = {}
+
+    def next_id(self, table, column):
+        if table.name not in self.next_ids:
+            (max_id,) = self.session.execute(
+                select(func.max(column)).select_from(table)
+            ).one()
+            self.next_ids[table.name] = (max_id or 0) + 1
+        next_id = self.next_ids[table.name]
+        self.next_ids[table.name] += 1
+        return next_id
+
+    def add(self, record):
+        table = record.orm_class.__table__
+        values = record._asdict()
+        key = list(table.primary_key.columns)
+
+        for column in key:
+            if values[column.name] is None and column.foreign_keys:
+                (foreign_key,) = column.foreign_keys
+                values[column.name] = self.last_ids.get(foreign_key.column.table.name)
+
+        if len(key) == 1:
+            (column,) = key
+            if values[column.name] is None and table.name in REFERENCED_TABLES:
+                values[column.name] = self.next_id(table, column)
+            self.last_ids[table.name] = values[column.name]
+
+        self.pending.setdefault(table.name, []).append(values)
+
+    def flush(self):
+        for table in Base.metadata.sorted_tables:
+            rows = self.pending.pop(table.name, None)
+            if rows:
+                self.session.execute(table.insert(), rows)
+
+
+# the tables other tables have foreign keys to
+REFERENCED_TABLES = {
+    foreign_key.column.table.name
+    for table in Base.metadata.sorted_tables
+    for foreign_key in table.foreign_keys
+}
+
+
+def written_entity(orm_objects, last_entity):
+    # the entity's own row comes first
+    entity = getattr(orm_objects[0], "entity", None) if orm_objects else None
+    if entity is None:
+        return last_entity
+    return entity if last_entity is None else max(entity, last_entity)
+
 
 class ViewBuilder:
     def __init__(self, engine, item_mapper, log=False):
@@ -15,13 +133,269 @@ class ViewBuilder:
     def init_model(self, metadata):
         metadata.create_all(self._engine)
 
-    def build_model(self, dataset_name, reader, total=None):
+    @staticmethod
+    def add_dataset_stats(session, collector, start):
+        session.merge(
+            collector.to_orm(
+                time.perf_counter() - start,
+                session.info.get(BROKEN_RELATIONSHIPS, 0),
+            )
+        )
+
+    def build_state(self, dataset_name):
+        with Session(self._engine) as session:
+            state = session.get(BuildState, dataset_name)
+            if state:
+                session.expunge(state)
+            return state
+
+    @staticmethod
+    def resume(session, collector):
+        """
+        Pick up the statistics of an interrupted build of the dataset, if any
+        """
+        state = session.get(BuildState, collector.dataset)
+        if state and not state.complete:
+            stats = session.get(DatasetStats, collector.dataset)
+            if stats:
+                collector.resume(stats)
+            return state.last_entity
+        return None
+
+    def checkpoint(
+        self, session, writer, collector, start, last_entity, complete=False
+    ):
+        """
+        Commit everything written so far, with the dataset's statistics and the
+        last entity written, from which a failed build can be resumed
+        """
+        writer.flush()
+        self.add_dataset_stats(session, collector, start)
+        session.merge(
+            BuildState(
+                dataset=collector.dataset,
+                last_entity=last_entity,
+                entity_count=collector.entity_count,
+                complete=complete,
+            )
+        )
+        session.commit()
+
+    @staticmethod
+    def add(session, writer, orm_objects):
+        for obj in orm_objects:
+            if isinstance(obj, Record):
+                writer.add(obj)
+            else:
+                session.add(obj)
+
+    @staticmethod
+    def flusher(session, writer, flush_size=None, governor=None):
+        """
+        Returns a function to call after adding each item, which flushes the
+        session every flush_size items, or as often as the memory governor
+        allows, so pending objects don't accumulate for the whole dataset
+        """
+        if governor:
+            flush_size = governor.batch_size
+        if not flush_size:
+            return lambda: None
+
+        pending = 0
+
+        def added():
+            nonlocal pending, flush_size
+            pending += 1
+            if pending >= flush_size:
+                writer.flush()
+                session.flush()
+                pending = 0
+                if governor:
+                    flush_size = governor.adjust()
+
+        return added
+
+    def build_model(
+        self,
+        dataset_name,
+        reader,
+        total=None,
+        flush_size=None,
+        governor=None,
+        checkpoint_size=None,
+        resume=False,
+        coordinate_precision=None,
+    ):
+        """
+        Build the model for a dataset, committing every checkpoint_size items.
+
+        The reader must yield items in entity order. When resuming, it should
+        start after the last entity of the interrupted build, see build_state.
+        """
+        start = time.perf_counter()
+        collector = DatasetStatsCollector(dataset_name, coordinate_precision)
         with Session(self._engine) as session:
+            last_entity = self.resume(session, collector) if resume else None
+            writer = RecordWriter(session)
+            added = self.flusher(session, writer, flush_size, governor)
             with tqdm(total=total, miniters=500) as pbar:
-                for item in reader:
+                for count, item in enumerate(reader, 1):
                     orm_objects = self._item_mapper(dataset_name, session, item)
-                    for obj in orm_objects:
-                        session.add(obj)
+                    self.add(session, writer, orm_objects)
+                    collector.add(orm_objects)
+                    last_entity = written_entity(orm_objects, last_entity)
+                    added()
+                    if checkpoint_size and count % checkpoint_size == 0:
+                        self.checkpoint(session, writer, collector, start, last_entity)
                     pbar.update(1)
 
-            session.commit()
+            self.checkpoint(
+                session, writer, collector, start, last_entity, complete=True
+            )
+
+    def build_model_pipelined(
+        self,
+        dataset_name,
+        reader,
+        total=None,
+        queue_size=1000,
+        flush_size=1000,
+        governor=None,
+        checkpoint_size=None,
+        resume=False,
+        coordinate_precision=None,
+    ):
+        """
+        Build the model with reading, mapping and writing overlapped: the reader
+        and the item mapper each run in their own thread, connected to the
+        writer by bounded queues, so the slowest stage sets the pace.
+
+        The item mapper is called without a session, so relationships must be
+        deferred. Returns the StageStats for the read, map and write stages.
+        """
+        build_start = time.perf_counter()
+        collector = DatasetStatsCollector(dataset_name, coordinate_precision)
+        stats = {name: StageStats(name) for name in ["read", "map", "write"]}
+        read_queue = queue.Queue(queue_size)
+        map_queue = queue.Queue(queue_size)
+        stop = threading.Event()
+        errors = []
+
+        def put(q, item, stage=None):
+            # gives up if the writer has stopped consuming
+            start = time.perf_counter()
+            while True:
+                try:
+                    q.put(item, timeout=0.1)
+                    break
+                except queue.Full:
+                    if stop.is_set():
+                        raise _Stopped()
+            if stage:
+                stage.waiting += time.perf_counter() - start
+                stage.record_queue_depth(q.qsize())
+
+        def get(q, stage):
+            start = time.perf_counter()
+            item = q.get()
+            stage.waiting += time.perf_counter() - start
+            return item
+
+        def run_stage(target, output):
+            # always pass on _DONE so downstream stages finish, the writer
+            # re-raises any error once it has drained its queue
+            try:
+                target()
+            except _Stopped:
+                return
+            except Exception as e:
+                errors.append(e)
+            try:
+                put(output, _DONE)
+            except _Stopped:
+                pass
+
+        def read():
+            stage = stats["read"]
+            items = iter(reader)
+            while True:
+                start = time.perf_counter()
+                item = next(items, _DONE)
+                stage.busy += time.perf_counter() - start
+                if item is _DONE:
+                    return
+                stage.items += 1
+                put(read_queue, item, stage)
+
+        def map_items():
+            stage = stats["map"]
+            while True:
+                item = get(read_queue, stage)
+                if item is _DONE:
+                    return
+                start = time.perf_counter()
+                orm_objects = self._item_mapper(dataset_name, None, item)
+                stage.busy += time.perf_counter() - start
+                stage.items += 1
+                put(map_queue, orm_objects, stage)
+
+        threads = [
+            threading.Thread(target=run_stage, args=(read, read_queue), daemon=True),
+            threading.Thread(
+                target=run_stage, args=(map_items, map_queue), daemon=True
+            ),
+        ]
+        for thread in threads:
+            thread.start()
+
+        try:
+            stage = stats["write"]
+            with Session(self._engine) as session:
+                last_entity = self.resume(session, collector) if resume else None
+                writer = RecordWriter(session)
+                added = self.flusher(session, writer, flush_size, governor)
+                with tqdm(total=total, miniters=500) as pbar:
+                    while True:
+                        orm_objects = get(map_queue, stage)
+                        if orm_objects is _DONE:
+                            break
+                        start = time.perf_counter()
+                        self.add(session, writer, orm_objects)
+                        collector.add(orm_objects)
+                        last_entity = written_entity(orm_objects, last_entity)
+                        stage.items += 1
+                        # flush as we go so output I/O overlaps the other stages
+                        added()
+                        if checkpoint_size and stage.items % checkpoint_size == 0:
+                            self.checkpoint(
+                                session, writer, collector, build_start, last_entity
+                            )
+                        if stage.items % 1000 == 0:
+                            pbar.set_postfix(
+                                read_queue=read_queue.qsize(),
+                                map_queue=map_queue.qsize(),
+                            )
+                        stage.busy += time.perf_counter() - start
+                        pbar.update(1)
+
+                if errors:
+                    raise errors[0]
+
+                start = time.perf_counter()
+                self.checkpoint(
+                    session,
+                    writer,
+                    collector,
+                    build_start,
+                    last_entity,
+                    complete=True,
+                )
+                stage.busy += time.perf_counter() - start
+        finally:
+            stop.set()
+            for thread in threads:
+                thread.join()
+
+        for stage in stats.values():
+            logger.info(str(stage))
+        return stats
@@ -0,0 +1,249 @@
+import base64
+import json
+import logging
+import os
+import sqlite3
+from collections import Counter
+from urllib.request import pathname2url
+
+from view_builder.model.table import Base
+from view_builder.sqlite import connect_read_only
+
+logger = logging.getLogger("changeset")
+
+# made from the builder's tables by the post-process, with SpatiaLite triggers
+# keeping their spatial indexes in step, so it's re-run on the replica instead
+POST_PROCESSED_TABLES = ["geography_feature"]
+
+
+class ChangesetError(Exception):
+    pass
+
+
+def encode(value):
+    # JSON has no bytes, e.g. for a BLOB column
+    if isinstance(value, bytes):
+        return {"base64": base64.b64encode(value).decode("ascii")}
+    return value
+
+
+def decode(value):
+    if isinstance(value, dict):
+        return base64.b64decode(value["base64"])
+    return value
+
+
+def table_names(conn, schema):
+    return {
+        name
+        for (name,) in conn.execute(
+            f"SELECT name FROM {schema}.sqlite_master WHERE type = 'table'"
+        )
+    }
+
+
+def unique_column(conn, schema, table, info):
+    """
+    The NOT NULL column of a table with a single column UNIQUE index, or None
+    """
+    not_null = {row[1] for row in info if row[3]}
+    for _, index, unique, _, partial in conn.execute(
+        f"PRAGMA {schema}.index_list({table})"
+    ):
+        if not unique or partial:
+            continue
+        columns = [
+            row[2] for row in conn.execute(f"PRAGMA {schema}.index_info({index})")
+        ]
+        if len(columns) == 1 and columns[0] in not_null:
+            return columns[0]
+    return None
+
+
+def table_columns(conn, schema, table):
+    """
+    A table's columns, and its key: its primary key, or failing that a NOT NULL
+    column with a UNIQUE index. The rowid isn't a key as VACUUM and finalise
+    --cluster renumber it.
+    """
+    info = conn.execute(f"PRAGMA {schema}.table_info({table})").fetchall()
+    columns = [row[1] for row in info]
+    key = [row[1] for row in sorted(info, key=lambda row: row[5]) if row[5]]
+    if not key:
+        column = unique_column(conn, schema, table, info)
+        if column is None:
+            raise ChangesetError(
+                "{} has no primary key or unique column to match rows by".format(table)
+            )
+        key = [column]
+    return columns, key
+
+
+def key_match(key):
+    return " AND ".join(f"o.{column} = n.{column}" for column in key)
+
+
+def deleted_rows(conn, table):
+    """
+    Yield a delete for each row of the old view model, attached to conn as old,
+    not in the new one, matched by key
+    """
+    _, key = table_columns(conn, "old", table)
+    sql = f"""
+        SELECT {", ".join(f"o.{column}" for column in key)} FROM old.{table} AS o
+        WHERE NOT EXISTS (SELECT 1 FROM main.{table} AS n WHERE {key_match(key)})
+        """
+    for row in conn.execute(sql):
+        yield {"table": table, "op": "delete", "key": dict(zip(key, map(encode, row)))}
+
+
+def changed_rows(conn, table):
+    """
+    Yield an insert for each row of the new view model not in the old one, and
+    an update, carrying only the columns that changed, for each row that differs
+    """
+    columns, key = table_columns(conn, "main", table)
+    select = ", ".join(f"n.{column}" for column in columns)
+    sql = f"""
+        SELECT {select} FROM main.{table} AS n
+        WHERE NOT EXISTS (SELECT 1 FROM old.{table} AS o WHERE {key_match(key)})
+        """
+    for row in conn.execute(sql):
+        yield {
+            "table": table,
+            "op": "insert",
+            "values": dict(zip(columns, map(encode, row))),
+        }
+
+    values = [column for column in columns if column not in key]
+    if not values:
+        return
+    sql = f"""
+        SELECT {select}, {", ".join(f"o.{column}" for column in values)}
+        FROM main.{table} AS n
+        JOIN old.{table} AS o ON {key_match(key)}
+        WHERE {" OR ".join(f"n.{column} IS NOT o.{column}" for column in values)}
+        """
+    for row in conn.execute(sql):
+        new = dict(zip(columns, row))
+        old = dict(zip(values, row[len(columns) :]))
+        changed = {
+            column: encode(new[column])
+            for column in values
+            if new[column] != old[column] or type(new[column]) is not type(old[column])
+        }
+        if changed:
+            yield {
+                "table": table,
+                "op": "update",
+                "key": {column: encode(new[column]) for column in key},
+                "values": changed,
+            }
+
+
+def diff_view_models(old_path, new_path, tables=None):
+    """
+    Yield the row changes that turn the view model at old_path into the one at
+    new_path, for the view model's tables, or the given tables.
+
+    Rows are matched by key, see table_columns, with both files attached to
+    one connection so SQLite compares them using the key indexes. Deletes come first, children
+    before parents, then the inserts and updates, parents before children.
+    """
+    conn = connect_read_only(new_path)
+    try:
+        conn.execute(
+            "ATTACH DATABASE ? AS old",
+            ("file:{}?immutable=1".format(pathname2url(os.path.abspath(old_path))),),
+        )
+        if not tables:
+            tables = [table.name for table in Base.metadata.sorted_tables]
+        main_tables, old_tables = table_names(conn, "main"), table_names(conn, "old")
+        for table in tables:
+            if table in POST_PROCESSED_TABLES or table.startswith("idx_"):
+                raise ChangesetError(
+                    "{} is made by the post-process, re-run it on the view model "
+                    "the changeset is applied to".format(table)
+                )
+            if table not in main_tables or table not in old_tables:
+                raise ChangesetError("{} isn't in both view models".format(table))
+            if table_columns(conn, "main", table) != table_columns(conn, "old", table):
+                raise ChangesetError("{} has changed columns".format(table))
+
+        for table in reversed(tables):
+            yield from deleted_rows(conn, table)
+        for table in tables:
+            yield from changed_rows(conn, table)
+    finally:
+        conn.close()
+
+
+def write_changeset(changes, f):
+    """
+    Write changes as newline delimited JSON, returns the number of each
+    (table, op)
+    """
+    counts = Counter()
+    for change in changes:
+        f.write(json.dumps(change, separators=(",", ":")))
+        f.write("\n")
+        counts[(change["table"], change["op"])] += 1
+    return counts
+
+
+def apply_change(conn, change):
+    table = change["table"]
+    if change["op"] == "insert":
+        values = change["values"]
+        sql = "INSERT INTO {} ({}) VALUES ({})".format(
+            table, ", ".join(values), ", ".join("?" for _ in values)
+        )
+        conn.execute(sql, [decode(value) for value in values.values()])
+        return
+
+    key = change["key"]
+    where = " AND ".join(f"{column} = ?" for column in key)
+    params = [decode(value) for value in key.values()]
+    if change["op"] == "update":
+        values = change["values"]
+        sql = "UPDATE {} SET {} WHERE {}".format(
+            table, ", ".join(f"{column} = ?" for column in values), where
+        )
+        params = [decode(value) for value in values.values()] + params
+    elif change["op"] == "delete":
+        sql = "DELETE FROM {} WHERE {}".format(table, where)
+    else:
+        raise ChangesetError("unknown change {!r}".format(change["op"]))
+
+    if conn.execute(sql, params).rowcount != 1:
+        raise ChangesetError(
+            "no {} row {} to {}, the view model isn't the one diffed from".format(
+                table, key, change["op"]
+            )
+        )
+
+
+def apply_changeset(path, f):
+    """
+    Apply a changeset written by write_changeset to the view model at path, in
+    a single transaction, returns the number of each (table, op) applied
+    """
+    counts = Counter()
+    conn = sqlite3.connect(path)
+    try:
+        with conn:
+            for line in f:
+                if not line.strip():
+                    continue
+                change = json.loads(line)
+                try:
+                    apply_change(conn, change)
+                except sqlite3.IntegrityError as e:
+                    raise ChangesetError(
+                        "can't {} {} row: {}".format(change["op"], change["table"], e)
+                    )
+                counts[(change["table"], change["op"])] += 1
+    finally:
+        conn.close()
+    logger.info("applied %d changes to %s", sum(counts.values()), path)
+    return counts
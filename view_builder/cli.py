@@ -1,16 +1,22 @@
+import json
+import os
+from functools import partial
+
 import click
-from digital_land.model.entity import Entity
-from digital_land.repository.entry_repository import EntryRepository
-from view_builder.builder import ViewBuilder
-from view_builder.index import index_view_model
-from view_builder.model.dataset import factory as dataset_model_factory
 
-from view_builder.model.table import Base
-from sqlalchemy import create_engine
-from view_builder.organisation_loader import (
-    load_organisations as load_organisations_from_file,
+# Only modules needing nothing beyond the standard library are imported here.
+# The Makefile runs the CLI once per dataset, so each command imports its heavy
+# dependencies, e.g. SQLAlchemy, digital_land and shapely, when it's run.
+from view_builder.export import (
+    FORMATS,
+    ExportError,
+    export_flatgeobuf,
+    export_view_model,
 )
-from .tiles import build_tiles_for_datasets
+from view_builder.index import index_view_model
+from view_builder.index_audit import audit_indexes
+from view_builder.memory import parse_memory_size
+from view_builder.optimise import DEFAULT_PAGE_SIZE, optimise_view_model
 
 
 @click.group()
@@ -18,9 +24,22 @@ def cli():
     pass
 
 
+def memory_size(value):
+    if value is None:
+        return None
+    try:
+        return parse_memory_size(value)
+    except ValueError as e:
+        raise click.BadParameter(str(e))
+
+
 @click.command("create", short_help="create the view model tables")
 @click.argument("output_path", type=click.Path(exists=False))
 def create(output_path):
+    from sqlalchemy import create_engine
+    from view_builder.builder import ViewBuilder
+    from view_builder.model.table import Base
+
     engine = create_engine("sqlite+pysqlite:///{}".format(output_path))
     builder = ViewBuilder(
         engine=engine,
@@ -32,35 +51,316 @@ def create(output_path):
 cli.add_command(create)
 
 
+def build_dataset(
+    dataset_name,
+    input_path,
+    output_path,
+    debug=False,
+    allow_broken_relationships=False,
+    defer_relationships=False,
+    pipeline=False,
+    queue_size=1000,
+    records=False,
+    max_memory=None,
+    checkpoint_size=10000,
+    resume=False,
+    incremental=False,
+):
+    import sqlite3
+
+    from sqlalchemy import create_engine
+    from view_builder.builder import ViewBuilder
+    from view_builder.entry_reader import list_entities, read_entities
+    from view_builder.manifest import (
+        file_checksum,
+        is_unchanged,
+        record_manifest,
+        remove_dataset,
+    )
+    from view_builder.memory import MemoryGovernor
+    from view_builder.model.dataset import factory as dataset_model_factory
+    from view_builder.model.table import Base
+
+    # built in entity order, so a checkpoint's last entity says what's written
+    entities = sorted(list_entities(input_path), key=int)
+    engine = create_engine("sqlite+pysqlite:///{}".format(output_path))
+    builder = ViewBuilder(
+        engine=engine,
+        item_mapper=lambda name, session, item: getattr(
+            dataset_model_factory.get_dataset_model(name, session, item),
+            "to_records" if records else "to_orm",
+        )(allow_broken_relationships, defer_relationships),
+        log=debug,
+    )
+    builder.init_model(Base.metadata)
+    checksum = file_checksum(input_path)
+    state = builder.build_state(dataset_name)
+    if incremental:
+        conn = sqlite3.connect(output_path)
+        try:
+            if is_unchanged(conn, dataset_name, checksum):
+                click.echo("{} is unchanged".format(dataset_name))
+                return
+            # an interrupted build of the input can carry on where it stopped
+            if not (resume and state and not state.complete):
+                dependents = remove_dataset(conn, dataset_name)
+                state = None
+                if dependents:
+                    click.echo(
+                        "{} changed, to rebuild {}".format(
+                            dataset_name, ", ".join(dependents)
+                        )
+                    )
+        finally:
+            conn.close()
+    if resume:
+        if state and state.complete:
+            click.echo("{} is already built".format(dataset_name))
+            return
+        if state and state.last_entity is not None:
+            entities = [e for e in entities if int(e) > state.last_entity]
+            click.echo(
+                "resuming {} after entity {}, {} entities to build".format(
+                    dataset_name, state.last_entity, len(entities)
+                )
+            )
+    reader = read_entities(input_path, entities)
+    coordinate_precision = getattr(
+        dataset_model_factory.get_dataset_model_class(dataset_name),
+        "coordinate_precision",
+        None,
+    )
+    governor = MemoryGovernor(max_memory) if max_memory else None
+    if pipeline:
+        stats = builder.build_model_pipelined(
+            dataset_name,
+            reader,
+            len(entities),
+            queue_size=queue_size,
+            governor=governor,
+            checkpoint_size=checkpoint_size,
+            resume=resume,
+            coordinate_precision=coordinate_precision,
+        )
+        for stage in stats.values():
+            click.echo(str(stage))
+    else:
+        builder.build_model(
+            dataset_name,
+            reader,
+            len(entities),
+            governor=governor,
+            checkpoint_size=checkpoint_size,
+            resume=resume,
+            coordinate_precision=coordinate_precision,
+        )
+    if governor:
+        click.echo(
+            "peak RSS {}MB, final batch size {}".format(
+                governor.peak_rss // 1024**2, governor.batch_size
+            )
+        )
+
+    conn = sqlite3.connect(output_path)
+    try:
+        record_manifest(conn, dataset_name, input_path, checksum)
+    finally:
+        conn.close()
+
+
 @click.command("build", short_help="build the view model for a single dataset")
 @click.option("-d", "--debug/--no-debug", default=False)
 @click.option(
     "-a", "--allow-broken-relationships/--no-broken-relationships", default=False
 )
+@click.option(
+    "--defer-relationships/--resolve-relationships",
+    default=False,
+    help="stage relationships for the finalise command to resolve in bulk",
+)
+@click.option(
+    "--pipeline/--no-pipeline",
+    default=False,
+    help="read, map and write in parallel stages, needs --defer-relationships",
+)
+@click.option("--queue-size", type=click.INT, default=1000)
+@click.option(
+    "--records/--orm",
+    default=False,
+    help="map entries onto lightweight records written by bulk insert",
+)
+@click.option(
+    "--max-memory",
+    callback=lambda ctx, param, value: memory_size(value),
+    help="adapt the write batch size to keep memory use within this, e.g. 4G",
+)
+@click.option(
+    "--checkpoint-size",
+    type=click.INT,
+    default=10000,
+    help="commit the build, and record how far it got, every this many entities",
+)
+@click.option(
+    "--resume/--no-resume",
+    default=False,
+    help="carry on an interrupted build from the last entity it wrote",
+)
+@click.option(
+    "--incremental/--full",
+    default=False,
+    help="skip the dataset if its input is unchanged, else replace it",
+)
 @click.argument("dataset_name", type=click.STRING)
 @click.argument("input_path", type=click.Path(exists=True))
 @click.argument("output_path", type=click.Path(exists=False))
-def build(debug, allow_broken_relationships, dataset_name, input_path, output_path):
-    entry_repo = EntryRepository(input_path)
-    entities = entry_repo.list_entities()
-    reader = (
-        Entity(entry_repo.find_by_entity(entity)).snapshot() for entity in entities
-    )
-    engine = create_engine("sqlite+pysqlite:///{}".format(output_path))
-    builder = ViewBuilder(
-        engine=engine,
-        item_mapper=lambda name, session, item: dataset_model_factory.get_dataset_model(
-            name, session, item
-        ).to_orm(allow_broken_relationships),
-        log=debug,
+def build(
+    debug,
+    allow_broken_relationships,
+    defer_relationships,
+    pipeline,
+    queue_size,
+    records,
+    max_memory,
+    checkpoint_size,
+    resume,
+    incremental,
+    dataset_name,
+    input_path,
+    output_path,
+):
+    if pipeline and not defer_relationships:
+        raise click.UsageError("--pipeline requires --defer-relationships")
+
+    build_dataset(
+        dataset_name,
+        input_path,
+        output_path,
+        debug=debug,
+        allow_broken_relationships=allow_broken_relationships,
+        defer_relationships=defer_relationships,
+        pipeline=pipeline,
+        queue_size=queue_size,
+        records=records,
+        max_memory=max_memory,
+        checkpoint_size=checkpoint_size,
+        resume=resume,
+        incremental=incremental,
     )
-    builder.init_model(Base.metadata)
-    builder.build_model(dataset_name, reader, len(entities))
 
 
 cli.add_command(build)
 
 
+@click.command(
+    "build-shards",
+    short_help="build datasets in parallel, each into its own shard to merge",
+)
+@click.option(
+    "-a", "--allow-broken-relationships/--no-broken-relationships", default=False
+)
+@click.option(
+    "--defer-relationships/--resolve-relationships",
+    default=False,
+    help="stage relationships for the finalise command to resolve in bulk",
+)
+@click.option(
+    "--records/--orm",
+    default=False,
+    help="map entries onto lightweight records written by bulk insert",
+)
+@click.option("--checkpoint-size", type=click.INT, default=10000)
+@click.option("--workers", type=click.INT, default=None)
+@click.option(
+    "--max-memory",
+    callback=lambda ctx, param, value: memory_size(value),
+    help="keep the shard builds' memory use, between them, within this, e.g. 8G",
+)
+@click.argument("base_path", type=click.Path(exists=True))
+@click.argument("shard_dir", type=click.Path(file_okay=False))
+@click.argument("input_paths", nargs=-1, type=click.Path(exists=True))
+def build_shards_command(
+    allow_broken_relationships,
+    defer_relationships,
+    records,
+    checkpoint_size,
+    workers,
+    max_memory,
+    base_path,
+    shard_dir,
+    input_paths,
+):
+    """
+    Build each input dataset into its own shard, named after the dataset, in
+    SHARD_DIR. Shards are seeded with the organisations and categories in the
+    view model at BASE_PATH, so relationships to those resolve as they're built.
+    """
+    from view_builder.shard import build_shards, shard_workers
+
+    workers, shard_memory = shard_workers(workers, max_memory)
+    build = partial(
+        build_dataset,
+        allow_broken_relationships=allow_broken_relationships,
+        defer_relationships=defer_relationships,
+        records=records,
+        max_memory=shard_memory,
+        checkpoint_size=checkpoint_size,
+    )
+    inputs = [
+        (os.path.splitext(os.path.basename(path))[0], path) for path in input_paths
+    ]
+    for dataset_name, path in build_shards(
+        base_path, shard_dir, inputs, build, workers
+    ):
+        click.echo("built {} into {}".format(dataset_name, path))
+
+
+cli.add_command(build_shards_command)
+
+
+@click.command("merge", short_help="merge dataset shards into the view model")
+@click.argument("output_path", type=click.Path(exists=True))
+@click.argument("shard_paths", nargs=-1, type=click.Path(exists=True))
+def merge(output_path, shard_paths):
+    from view_builder.shard import MergeError, merge_shards
+
+    try:
+        merged = merge_shards(output_path, shard_paths)
+    except MergeError as e:
+        raise click.ClickException(str(e))
+    for path, datasets in merged.items():
+        click.echo("merged {} from {}".format(", ".join(datasets), path))
+
+
+cli.add_command(merge)
+
+
+@click.command(
+    "finalise",
+    short_help="resolve deferred relationships and build search indexes",
+)
+@click.option(
+    "-a", "--allow-broken-relationships/--no-broken-relationships", default=False
+)
+@click.option(
+    "--search/--no-search",
+    default=True,
+    help="build full-text search indexes over names and descriptions",
+)
+@click.option(
+    "--cluster/--no-cluster",
+    default=False,
+    help="order geography features along a Hilbert curve in the post-process",
+)
+@click.argument("input_path", type=click.Path(exists=True))
+def finalise(allow_broken_relationships, search, cluster, input_path):
+    from view_builder.finalise import finalise_view_model
+
+    finalise_view_model(input_path, allow_broken_relationships, search, cluster)
+
+
+cli.add_command(finalise)
+
+
 @click.command("index", short_help="add indexes to view model DB")
 @click.argument("input_path", type=click.Path(exists=True))
 def index(input_path):
@@ -70,10 +370,257 @@ def index(input_path):
 cli.add_command(index)
 
 
+@click.command("index-audit", short_help="report view model DB index sizes and usage")
+@click.option("--json/--no-json", "as_json", default=False)
+@click.argument("input_path", type=click.Path(exists=True))
+def index_audit(as_json, input_path):
+    report = audit_indexes(input_path)
+    if as_json:
+        click.echo(json.dumps(report, indent=2))
+        return
+
+    for index in report:
+        click.echo(
+            "{index} ON {table} ({columns}) {size} bytes, used by {queries}{redundant}".format(
+                index=index["index"],
+                table=index["table"],
+                columns=", ".join(index["columns"]),
+                size=index["size"] if index["size"] is not None else "?",
+                queries=", ".join(index["queries"]) or "no sample queries",
+                redundant=" REDUNDANT" if index["redundant"] else "",
+            )
+        )
+
+
+cli.add_command(index_audit)
+
+
+@click.command("optimise", short_help="compact and analyse view model DB for reading")
+@click.option("--page-size", type=click.INT, default=DEFAULT_PAGE_SIZE)
+@click.option(
+    "--report",
+    "report_path",
+    type=click.Path(),
+    help="write the size and query timing report to a JSON file",
+)
+@click.argument("input_path", type=click.Path(exists=True))
+def optimise(page_size, report_path, input_path):
+    report = optimise_view_model(input_path, page_size)
+    click.echo(json.dumps(report, indent=2))
+    if report_path:
+        with open(report_path, "w") as f:
+            json.dump(report, f, indent=2)
+
+
+cli.add_command(optimise)
+
+
+@click.command(
+    "containment", short_help="find the geographies within each district or parish"
+)
+@click.option(
+    "--container-type",
+    "container_types",
+    multiple=True,
+    help="default local-authority-district and parish",
+)
+@click.option(
+    "--type", "types", multiple=True, help="only these types, default all others"
+)
+@click.option("--workers", type=click.INT, default=None)
+@click.argument("input_path", type=click.Path(exists=True))
+def containment(container_types, types, workers, input_path):
+    from view_builder.containment import CONTAINER_TYPES, build_containment
+
+    count = build_containment(
+        input_path, list(container_types) or CONTAINER_TYPES, list(types), workers
+    )
+    click.echo("{} geographies within or intersecting containers".format(count))
+
+
+cli.add_command(containment)
+
+
+@click.command(
+    "subdivide", short_help="split the largest geographies into indexed parts"
+)
+@click.option(
+    "--max-vertices",
+    type=click.INT,
+    default=2000,
+    show_default=True,
+    help="split geographies with more vertices than this into parts of at most this",
+)
+@click.option("--type", "types", multiple=True, help="only these types, default all")
+@click.option("--workers", type=click.INT, default=None)
+@click.argument("input_path", type=click.Path(exists=True))
+def subdivide(max_vertices, types, workers, input_path):
+    from view_builder.subdivide import build_parts
+
+    geographies, parts = build_parts(input_path, max_vertices, list(types), workers)
+    click.echo("{} geographies split into {} parts".format(geographies, parts))
+
+
+cli.add_command(subdivide)
+
+
+@click.command(
+    "export", short_help="export view model features as GeoJSON or FlatGeobuf"
+)
+@click.option("--type", "types", multiple=True, help="dataset type, can be repeated")
+@click.option(
+    "--bbox",
+    type=click.FLOAT,
+    nargs=4,
+    default=None,
+    help="only features whose bounds intersect MINX MINY MAXX MAXY",
+)
+@click.option("--organisation", help="only features of this organisation")
+@click.option(
+    "--entry-date-from",
+    type=click.DateTime(formats=["%Y-%m-%d"]),
+    help="only features entered on or after this date",
+)
+@click.option(
+    "--entry-date-to",
+    type=click.DateTime(formats=["%Y-%m-%d"]),
+    help="only features entered on or before this date",
+)
+@click.option("--simplified/--full", default=False)
+@click.option("--format", type=click.Choice(FORMATS), default="ndjson")
+@click.option(
+    "--precision",
+    type=click.IntRange(0, 15),
+    default=None,
+    help="decimal places to round coordinates to",
+)
+@click.argument("input_path", type=click.Path(exists=True))
+@click.argument("output", type=click.Path(allow_dash=True), default="-")
+def export(
+    types,
+    bbox,
+    organisation,
+    entry_date_from,
+    entry_date_to,
+    simplified,
+    format,
+    precision,
+    input_path,
+    output,
+):
+    """
+    Export features to OUTPUT, standard output by default, or for FlatGeobuf to
+    a file for each type in the OUTPUT directory
+    """
+    filters = dict(
+        types=types,
+        bbox=bbox,
+        organisation=organisation,
+        entry_date_from=entry_date_from.date() if entry_date_from else None,
+        entry_date_to=entry_date_to.date() if entry_date_to else None,
+        simplified=simplified,
+    )
+    if format == "flatgeobuf":
+        if output == "-":
+            raise click.BadParameter("FlatGeobuf is written to a directory")
+        try:
+            counts = export_flatgeobuf(
+                input_path, output, precision=precision, **filters
+            )
+        except ExportError as e:
+            raise click.ClickException(str(e))
+        for type, count in counts.items():
+            click.echo("{} {}".format(type, count), err=True)
+        return
+
+    with click.open_file(output, "w") as f:
+        export_view_model(input_path, f, format, precision, **filters)
+
+
+cli.add_command(export)
+
+
+@click.command(
+    "export-parquet", short_help="export geographies and relationships as Parquet"
+)
+@click.option("--type", "types", multiple=True, help="dataset type, can be repeated")
+@click.option(
+    "--row-group-size",
+    type=click.IntRange(min=1),
+    default=10000,
+    help="rows read and written at a time",
+)
+@click.argument("input_path", type=click.Path(exists=True))
+@click.argument("output_dir", type=click.Path())
+def export_parquet_command(types, row_group_size, input_path, output_dir):
+    """
+    Export the geographies, as GeoParquet, their relationships and the
+    organisations, categories and metrics they relate to as a directory of
+    Parquet files for each table in OUTPUT_DIR
+    """
+    from view_builder.parquet import export_parquet
+
+    counts = export_parquet(input_path, output_dir, list(types), row_group_size)
+    for table, count in counts.items():
+        click.echo("{} {}".format(table, count), err=True)
+
+
+cli.add_command(export_parquet_command)
+
+
+def echo_change_counts(counts):
+    for (table, op), count in sorted(counts.items()):
+        click.echo("{} {} {}".format(table, op, count), err=True)
+
+
+@click.command("diff", short_help="write the row changes between two view models")
+@click.option("--table", "tables", multiple=True, help="table to compare, default all")
+@click.argument("old_path", type=click.Path(exists=True))
+@click.argument("new_path", type=click.Path(exists=True))
+@click.argument("output", type=click.File("w"), default="-")
+def diff(tables, old_path, new_path, output):
+    from view_builder.changeset import (
+        ChangesetError,
+        diff_view_models,
+        write_changeset,
+    )
+
+    try:
+        counts = write_changeset(
+            diff_view_models(old_path, new_path, list(tables)), output
+        )
+    except ChangesetError as e:
+        raise click.ClickException(str(e))
+    echo_change_counts(counts)
+
+
+cli.add_command(diff)
+
+
+@click.command("apply", short_help="apply the changes written by diff to a view model")
+@click.argument("input_path", type=click.Path(exists=True))
+@click.argument("changeset", type=click.File("r"), default="-")
+def apply(input_path, changeset):
+    from view_builder.changeset import ChangesetError, apply_changeset
+
+    try:
+        counts = apply_changeset(input_path, changeset)
+    except ChangesetError as e:
+        raise click.ClickException(str(e))
+    echo_change_counts(counts)
+
+
+cli.add_command(apply)
+
+
 # Temporary command to load organisations from organisation.csv
 @click.command("load_organisations", short_help="load organisations into view model")
 @click.argument("output_path", type=click.Path(exists=False))
 def load_organisations(output_path):
+    from view_builder.organisation_loader import (
+        load_organisations as load_organisations_from_file,
+    )
+
     load_organisations_from_file(output_path)
 
 
@@ -84,6 +631,8 @@ cli.add_command(load_organisations)
 @click.argument("view_model_path", type=click.Path(exists=True))
 @click.argument("output_path", type=click.Path())
 def build_tiles(view_model_path, output_path):
+    from view_builder.tiles import build_tiles_for_datasets
+
     build_tiles_for_datasets(view_model_path, output_path)
 
 
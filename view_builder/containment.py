@@ -0,0 +1,197 @@
+import logging
+import sqlite3
+
+from shapely import wkt
+from shapely.errors import GEOSException
+from shapely.prepared import prep
+
+from view_builder.pool import chunks, map_in_workers, worker_connection
+from view_builder.wkt import wkt_bounds
+
+logger = logging.getLogger("containment")
+
+CONTAINER_TYPES = ["local-authority-district", "parish"]
+
+CHUNK_SIZE = 500
+
+# a geography's geometry, or its point if it has none
+GEOMETRY_SQL = """
+    SELECT entity, coalesce(nullif(geometry, ''), point)
+    FROM geography
+    WHERE {column} {operator} ({placeholders})
+"""
+
+
+def geometries(conn, column, values, operator="IN"):
+    """
+    The (entity, wkt) of the matching geographies, as a cursor, so they're
+    read as they're iterated rather than all at once
+    """
+    sql = GEOMETRY_SQL.format(
+        column=column,
+        operator=operator,
+        placeholders=", ".join("?" for _ in values),
+    )
+    return conn.execute(sql, list(values))
+
+
+def geometry_bounds(rows):
+    for entity, geometry in rows:
+        box = wkt_bounds(geometry)
+        if box:
+            minx, miny, maxx, maxy = box
+            yield entity, minx, maxx, miny, maxy
+
+
+def load_bounds(conn, table, types=None, exclude_types=()):
+    """
+    Fill a temporary table with the WKT bounds of the geographies of the given
+    types, or of all but the excluded types
+    """
+    if types:
+        rows = geometries(conn, "type", types)
+    else:
+        rows = geometries(conn, "type", exclude_types, "NOT IN")
+    count = 0
+    for chunk in chunks(geometry_bounds(rows), CHUNK_SIZE):
+        conn.executemany("INSERT INTO {} VALUES (?, ?, ?, ?, ?)".format(table), chunk)
+        count += len(chunk)
+    return count
+
+
+def candidate_pairs(conn, container_types, types=None):
+    """
+    The (container, geography) pairs whose bounds intersect, found with an
+    R*Tree over the containers' bounds, grouped by container
+    """
+    conn.execute(
+        "CREATE TEMP TABLE geography_bounds "
+        "(entity INTEGER PRIMARY KEY, minx, maxx, miny, maxy)"
+    )
+    conn.execute(
+        "CREATE VIRTUAL TABLE temp.container_bounds "
+        "USING rtree(entity, minx, maxx, miny, maxy)"
+    )
+    try:
+        load_bounds(conn, "container_bounds", types=container_types)
+        load_bounds(
+            conn, "geography_bounds", types=types, exclude_types=container_types
+        )
+        rows = conn.execute("""
+            SELECT c.entity, g.entity
+            FROM geography_bounds AS g
+            JOIN container_bounds AS c
+                ON c.minx <= g.maxx AND c.maxx >= g.minx
+                AND c.miny <= g.maxy AND c.maxy >= g.miny
+            ORDER BY c.entity
+            """)
+        pairs = {}
+        for container, geography in rows:
+            pairs.setdefault(container, []).append(geography)
+        return pairs
+    finally:
+        conn.execute("DROP TABLE temp.geography_bounds")
+        conn.execute("DROP TABLE temp.container_bounds")
+
+
+def relate_to_container(task):
+    """
+    The exact relation of each candidate geography to its container, as
+    (container, geography, relation) tuples, where the relation is "within" or
+    "intersects", leaving out candidates whose bounds only overlap
+    """
+    container, entities = task
+    conn = worker_connection()
+    ((_, container_wkt),) = geometries(conn, "entity", [container])
+    try:
+        container_geometry = prep(wkt.loads(container_wkt))
+    except GEOSException as e:
+        logger.warning("skipping container %d: %s", container, e)
+        return []
+
+    relations = []
+    for entity, geometry_wkt in geometries(conn, "entity", entities):
+        try:
+            geometry = wkt.loads(geometry_wkt)
+            if container_geometry.contains(geometry):
+                relations.append((container, entity, "within"))
+            elif container_geometry.intersects(geometry):
+                relations.append((container, entity, "intersects"))
+        except GEOSException as e:
+            logger.warning("skipping geography %d in %d: %s", entity, container, e)
+    return relations
+
+
+def containment_tasks(pairs, chunk_size=CHUNK_SIZE):
+    for container, entities in pairs.items():
+        for chunk in chunks(entities, chunk_size):
+            yield container, chunk
+
+
+def relate_to_containers(path, pairs, workers=None):
+    """
+    Yields the relations found for each chunk of candidates, tested in a pool
+    of worker processes, or in this one if there's a single worker
+    """
+    return map_in_workers(relate_to_container, path, containment_tasks(pairs), workers)
+
+
+def recomputed_pairs(container_types, types=None):
+    """
+    The WHERE clause and parameters matching the geography_containment rows
+    build_containment recomputes: those between the containers of
+    container_types and the geographies of types, or of every other type
+    """
+    if types:
+        geography_types, operator = types, "IN"
+    else:
+        geography_types, operator = container_types, "NOT IN"
+    where = """
+        container_id IN (SELECT entity FROM geography WHERE type IN ({}))
+        AND geography_id IN (SELECT entity FROM geography WHERE type {} ({}))
+        """.format(
+        ", ".join("?" for _ in container_types),
+        operator,
+        ", ".join("?" for _ in geography_types),
+    )
+    return where, list(container_types) + list(geography_types)
+
+
+def build_containment(path, container_types=CONTAINER_TYPES, types=None, workers=None):
+    """
+    Materialise which geographies lie within or intersect the container
+    geographies, e.g. local authority districts, in geography_containment.
+
+    Candidates are found by comparing bounds with an R*Tree, then tested
+    exactly across a pool of worker processes. Returns the number of pairs.
+    """
+    conn = sqlite3.connect(path)
+    try:
+        pairs = candidate_pairs(conn, container_types, types)
+        logger.info(
+            "%d candidate pairs in %d containers",
+            sum(len(entities) for entities in pairs.values()),
+            len(pairs),
+        )
+
+        conn.execute(
+            "CREATE TEMP TABLE containment (container_id, geography_id, relation)"
+        )
+        count = 0
+        for relations in relate_to_containers(path, pairs, workers):
+            conn.executemany("INSERT INTO containment VALUES (?, ?, ?)", relations)
+            count += len(relations)
+
+        # only the pairs recomputed, leaving those of other types
+        where, params = recomputed_pairs(container_types, types)
+        conn.execute("DELETE FROM geography_containment WHERE " + where, params)
+        conn.execute("""
+            INSERT INTO geography_containment (container_id, geography_id, relation)
+            SELECT container_id, geography_id, relation FROM containment
+            """)
+        conn.execute("DROP TABLE temp.containment")
+        conn.commit()
+        logger.info("%d geographies within or intersecting containers", count)
+        return count
+    finally:
+        conn.close()
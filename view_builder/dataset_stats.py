@@ -0,0 +1,129 @@
+from view_builder.model.record import Record
+from view_builder.model.table import (
+    Category,
+    DatasetStats,
+    Document,
+    Entity,
+    Geography,
+    Organisation,
+    Policy,
+    RelationshipStaging,
+)
+from view_builder.wkt import wkt_coordinates
+
+# the tables holding one row per entity of a dataset
+ENTITY_CLASSES = (Category, Document, Geography, Organisation, Policy)
+
+DATE_FIELDS = ["entry_date", "start_date", "end_date"]
+
+# where a find_relation in a session counts the broken relationships it allows
+BROKEN_RELATIONSHIPS = "broken_relationships"
+
+
+def count_broken_relationship(session):
+    if session is not None:
+        session.info[BROKEN_RELATIONSHIPS] = (
+            session.info.get(BROKEN_RELATIONSHIPS, 0) + 1
+        )
+
+
+class DatasetStatsCollector:
+    """
+    Accumulates a dataset's statistics from the ORM objects as they're written,
+    so they're ready to read from dataset_stats without scanning its tables
+    """
+
+    def __init__(self, dataset, coordinate_precision=None):
+        self.dataset = dataset
+        self.coordinate_precision = coordinate_precision
+        self.typology = None
+        self.entity_count = 0
+        self.vertex_count = 0
+        self.bounds = None
+        self.dates = {field: (None, None) for field in DATE_FIELDS}
+        self.deferred = False
+        self.prior_build_duration = 0.0
+        self.prior_broken_relationship_count = 0
+
+    def resume(self, stats):
+        """
+        Carry on from the statistics checkpointed by an interrupted build
+        """
+        self.typology = stats.typology
+        self.entity_count = stats.entity_count or 0
+        self.vertex_count = stats.vertex_count or 0
+        if stats.minx is not None:
+            self.bounds = (stats.minx, stats.miny, stats.maxx, stats.maxy)
+        for field in DATE_FIELDS:
+            self.dates[field] = (
+                getattr(stats, "min_" + field),
+                getattr(stats, "max_" + field),
+            )
+        self.deferred = stats.broken_relationship_count is None
+        self.prior_build_duration = stats.build_duration or 0.0
+        self.prior_broken_relationship_count = stats.broken_relationship_count or 0
+
+    def add(self, orm_objects):
+        for obj in orm_objects:
+            orm_class = obj.orm_class if isinstance(obj, Record) else type(obj)
+            if orm_class is RelationshipStaging:
+                self.deferred = True
+            elif orm_class is Entity:
+                # written as a record, as an ORM object it's the entity_rel
+                self.typology = obj.typology
+            elif issubclass(orm_class, ENTITY_CLASSES):
+                self.add_entity(obj, orm_class)
+
+    def add_entity(self, obj, orm_class):
+        self.entity_count += 1
+        entity = getattr(obj, "entity_rel", None)
+        if self.typology is None and entity is not None:
+            self.typology = entity.typology
+
+        for field in DATE_FIELDS:
+            value = getattr(obj, field)
+            if value is not None:
+                low, high = self.dates[field]
+                self.dates[field] = (
+                    value if low is None else min(low, value),
+                    value if high is None else max(high, value),
+                )
+
+        if orm_class is Geography:
+            xs, ys = wkt_coordinates(obj.geometry or obj.point)
+            if xs and ys:
+                self.vertex_count += min(len(xs), len(ys))
+                bounds = (min(xs), min(ys), max(xs), max(ys))
+                if self.bounds:
+                    bounds = (
+                        min(self.bounds[0], bounds[0]),
+                        min(self.bounds[1], bounds[1]),
+                        max(self.bounds[2], bounds[2]),
+                        max(self.bounds[3], bounds[3]),
+                    )
+                self.bounds = bounds
+
+    def to_orm(self, build_duration=None, broken_relationship_count=0):
+        stats = DatasetStats(
+            dataset=self.dataset,
+            typology=self.typology,
+            entity_count=self.entity_count,
+            broken_relationship_count=(
+                None
+                if self.deferred
+                else self.prior_broken_relationship_count + broken_relationship_count
+            ),
+            vertex_count=self.vertex_count,
+            coordinate_precision=self.coordinate_precision,
+            build_duration=(
+                None
+                if build_duration is None
+                else self.prior_build_duration + build_duration
+            ),
+        )
+        if self.bounds:
+            stats.minx, stats.miny, stats.maxx, stats.maxy = self.bounds
+        for field, (low, high) in self.dates.items():
+            setattr(stats, "min_" + field, low)
+            setattr(stats, "max_" + field, high)
+        return stats
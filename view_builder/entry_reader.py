@@ -0,0 +1,37 @@
+import sqlite3
+
+from digital_land.model.entity import Entity
+from digital_land.repository.entry_repository import EntryRepository
+from view_builder.sqlite import connect_read_only
+
+
+class ReadOnlyEntryRepository(EntryRepository):
+    """
+    An EntryRepository over an immutable, memory-mapped connection to the input,
+    which the view builder only ever reads. EntryRepository's constructor
+    isn't called, as it would open the input for writing first.
+    """
+
+    def __init__(self, input_path):
+        self.conn = connect_read_only(input_path)
+        self.conn.row_factory = sqlite3.Row
+
+
+def open_entry_repository(input_path):
+    return ReadOnlyEntryRepository(input_path)
+
+
+def list_entities(input_path):
+    return open_entry_repository(input_path).list_entities()
+
+
+def read_entities(input_path, entities):
+    """
+    Yield a snapshot of each entity in the input repository.
+
+    The repository is opened on first use, so the connection belongs to the
+    thread consuming the generator, e.g. the reader stage of a pipelined build.
+    """
+    entry_repo = open_entry_repository(input_path)
+    for entity in entities:
+        yield Entity(entry_repo.find_by_entity(entity)).snapshot()
@@ -0,0 +1,224 @@
+import json
+import logging
+import os
+import shutil
+import subprocess
+import tempfile
+
+from view_builder.precision import round_geometry
+from view_builder.sqlite import connect_read_only
+
+logger = logging.getLogger("export")
+
+# the R*Tree indexes SpatiaLite's CreateSpatialIndex makes in the post-process,
+# under the names of the views the post-process gives them for geography_geom,
+# keyed by its rowid
+SPATIAL_INDEXES = ["idx_geography_geom_geom", "idx_geography_geom_geom_point"]
+
+FORMATS = ["ndjson", "geojson", "flatgeobuf"]
+
+
+class ExportError(Exception):
+    pass
+
+
+def feature_query(
+    types=None,
+    bbox=None,
+    organisation=None,
+    entry_date_from=None,
+    entry_date_to=None,
+    simplified=False,
+):
+    """
+    The SQL and parameters selecting the GeoJSON of the matching geography_geom
+    features, in the order they're stored, which is spatially clustered
+    """
+    column = "geojson_simple" if simplified else "geojson_full"
+    where = []
+    params = {}
+
+    if types:
+        names = []
+        for i, type in enumerate(types):
+            names.append(":type{}".format(i))
+            params["type{}".format(i)] = type
+        where.append("gg.type IN ({})".format(", ".join(names)))
+
+    if bbox:
+        # features whose bounding box intersects the one given
+        params.update(zip(["minx", "miny", "maxx", "maxy"], bbox))
+        candidates = [f"""
+            SELECT pkid FROM {index}
+            WHERE xmin <= :maxx AND xmax >= :minx AND ymin <= :maxy AND ymax >= :miny
+            """ for index in SPATIAL_INDEXES]
+        where.append("gg.rowid IN ({})".format(" UNION ALL ".join(candidates)))
+
+    if organisation:
+        params["organisation"] = organisation
+        where.append("""
+            gg.entity IN (
+                SELECT og.geography_id
+                FROM organisation_geography AS og
+                JOIN organisation AS o ON o.entity = og.organisation_id
+                WHERE o.organisation = :organisation
+            )
+            """)
+
+    if entry_date_from or entry_date_to:
+        # dates are stored as ISO strings, so compare as text
+        dates = []
+        if entry_date_from:
+            params["entry_date_from"] = entry_date_from.isoformat()
+            dates.append("g.entry_date >= :entry_date_from")
+        if entry_date_to:
+            params["entry_date_to"] = entry_date_to.isoformat()
+            dates.append("g.entry_date <= :entry_date_to")
+        where.append(
+            "gg.entity IN (SELECT g.entity FROM geography AS g WHERE {})".format(
+                " AND ".join(dates)
+            )
+        )
+
+    sql = "SELECT gg.{} FROM geography_geom AS gg".format(column)
+    if where:
+        sql += " WHERE " + " AND ".join(where)
+    sql += " ORDER BY gg.rowid"
+    return sql, params
+
+
+def export_features(conn, **filters):
+    """
+    Yields the GeoJSON text of each matching feature, straight from the cursor
+    so memory use doesn't grow with the size of the export
+    """
+    sql, params = feature_query(**filters)
+    for (feature,) in conn.execute(sql, params):
+        if feature is not None:
+            yield feature
+
+
+def round_features(features, precision):
+    for feature in features:
+        feature = json.loads(feature)
+        if feature.get("geometry"):
+            # the repeats rounding makes are dropped, as they are when built
+            round_geometry(feature["geometry"], precision, drop_repeated=True)
+        yield json.dumps(feature, separators=(",", ":"))
+
+
+def write_ndjson(features, f):
+    count = 0
+    for feature in features:
+        f.write(feature)
+        f.write("\n")
+        count += 1
+    return count
+
+
+def write_feature_collection(features, f):
+    count = 0
+    f.write('{"type":"FeatureCollection","features":[')
+    for feature in features:
+        if count:
+            f.write(",")
+        f.write("\n")
+        f.write(feature)
+        count += 1
+    f.write("\n]}\n")
+    return count
+
+
+def matching_features(conn, precision=None, **filters):
+    features = export_features(conn, **filters)
+    if precision is not None:
+        features = round_features(features, precision)
+    return features
+
+
+def export_view_model(path, f, format="ndjson", precision=None, **filters):
+    """
+    Write the features matching the filters to a file object as newline
+    delimited GeoJSON or a GeoJSON FeatureCollection, with their coordinates
+    rounded to precision decimal places if given. Returns the number written.
+    """
+    write = {"ndjson": write_ndjson, "geojson": write_feature_collection}[format]
+    conn = connect_read_only(path, immutable=False)
+    try:
+        count = write(matching_features(conn, precision, **filters), f)
+    finally:
+        conn.close()
+    logger.info("exported %d features", count)
+    return count
+
+
+def feature_types(conn):
+    return [
+        type
+        for (type,) in conn.execute(
+            "SELECT DISTINCT type FROM geography_geom ORDER BY type"
+        )
+    ]
+
+
+def write_flatgeobuf(features_path, output_path, layer, ogr2ogr="ogr2ogr"):
+    # GDAL's FlatGeobuf driver sorts the features along a Hilbert curve and
+    # writes the packed R-tree before them
+    command = [
+        ogr2ogr,
+        "-f",
+        "FlatGeobuf",
+        "-overwrite",
+        "-lco",
+        "SPATIAL_INDEX=YES",
+        "-nln",
+        layer,
+        output_path,
+        "GeoJSONSeq:" + features_path,
+    ]
+    try:
+        subprocess.run(command, check=True)
+    except subprocess.CalledProcessError as e:
+        raise ExportError("{} failed writing {}".format(ogr2ogr, output_path)) from e
+
+
+def export_flatgeobuf(
+    path, directory, types=None, precision=None, ogr2ogr="ogr2ogr", **filters
+):
+    """
+    Write the features matching the filters to a FlatGeobuf file for each type,
+    <directory>/<type>.fgb, with a spatial index clients can read a bounding
+    box's features with by range requests.
+
+    Each type's features are streamed from the view model to a temporary file
+    of newline delimited GeoJSON for GDAL's ogr2ogr to convert, so memory use
+    doesn't grow with the size of the export. A type with no matching features
+    has no file, and any left by an earlier export is removed. Returns the
+    number written of each type.
+    """
+    if shutil.which(ogr2ogr) is None:
+        raise ExportError("{} isn't installed, it's part of GDAL".format(ogr2ogr))
+    os.makedirs(directory, exist_ok=True)
+
+    counts = {}
+    conn = connect_read_only(path, immutable=False)
+    try:
+        for type in types or feature_types(conn):
+            with tempfile.NamedTemporaryFile(
+                "w", suffix=".geojsonl", dir=directory
+            ) as f:
+                count = write_ndjson(
+                    matching_features(conn, precision, types=[type], **filters), f
+                )
+                f.flush()
+                output_path = os.path.join(directory, "{}.fgb".format(type))
+                if count:
+                    write_flatgeobuf(f.name, output_path, type, ogr2ogr)
+                    counts[type] = count
+                elif os.path.exists(output_path):
+                    # an earlier export's features no longer match
+                    os.remove(output_path)
+    finally:
+        conn.close()
+    logger.info("exported %d features", sum(counts.values()))
+    return counts
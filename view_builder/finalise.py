@@ -0,0 +1,155 @@
+import logging
+import sqlite3
+
+from view_builder.hilbert import hilbert_key
+from view_builder.model.dataset import RelationshipError
+from view_builder.model.relationship import RELATIONS, TARGETS, relation_columns
+from view_builder.search import create_search_indexes
+
+logger = logging.getLogger("finalise")
+
+
+def clear_broken_organisations(conn):
+    """
+    Clear the organisation from the feature properties of the geographies
+    whose staged organisation couldn't be resolved, as mapping the entry only
+    leaves it out when the relationship is looked up there and then.
+
+    Returns the number of geographies cleared.
+    """
+    return conn.execute(f"""
+        UPDATE geography
+        SET properties = json_set(properties, '$.organisation', NULL)
+        WHERE properties IS NOT NULL
+        AND entity IN (
+            SELECT s.from_entity
+            FROM relationship_staging AS s
+            LEFT JOIN {TARGETS["organisation"]}
+            WHERE s.relation_type = 'organisation_geography' AND t.entity IS NULL
+        )
+        """).rowcount
+
+
+def resolve_relationships(conn, allow_broken=False):
+    """
+    Resolve the relationships staged by a deferred build into their join tables
+    with one INSERT ... SELECT per relation type, and summarise the references
+    that couldn't be resolved in broken_relationship.
+
+    Returns the number of broken references.
+    """
+    conn.execute("DELETE FROM broken_relationship")
+    broken_by_dataset = {}
+
+    for relation_type, relation in RELATIONS.items():
+        from_column, to_column = relation_columns(relation)
+        target = TARGETS[relation.target]
+
+        conn.execute(
+            f"""
+            INSERT OR IGNORE INTO {relation.join_class.__tablename__}
+                ({from_column}, {to_column})
+            SELECT DISTINCT s.from_entity, t.entity
+            FROM relationship_staging AS s
+            JOIN {target}
+            WHERE s.relation_type = ?
+            """,
+            (relation_type,),
+        )
+
+        conn.execute(
+            f"""
+            INSERT INTO broken_relationship
+                (relation_type, reference_type, reference, entity_count)
+            SELECT s.relation_type, s.reference_type, s.reference,
+                count(DISTINCT s.from_entity)
+            FROM relationship_staging AS s
+            LEFT JOIN {target}
+            WHERE s.relation_type = ? AND t.entity IS NULL
+            GROUP BY s.relation_type, s.reference_type, s.reference
+            """,
+            (relation_type,),
+        )
+
+        for dataset, count in conn.execute(
+            f"""
+            SELECT e.dataset, count(*)
+            FROM relationship_staging AS s
+            JOIN entity AS e ON e.entity = s.from_entity
+            LEFT JOIN {target}
+            WHERE s.relation_type = ? AND t.entity IS NULL
+            GROUP BY e.dataset
+            """,
+            (relation_type,),
+        ):
+            broken_by_dataset[dataset] = broken_by_dataset.get(dataset, 0) + count
+
+    clear_broken_organisations(conn)
+
+    # the datasets built with deferred relationships
+    conn.execute("""
+        UPDATE dataset_stats SET broken_relationship_count = 0
+        WHERE dataset IN (
+            SELECT DISTINCT e.dataset
+            FROM relationship_staging AS s
+            JOIN entity AS e ON e.entity = s.from_entity
+        )
+        """)
+    conn.executemany(
+        "UPDATE dataset_stats SET broken_relationship_count = ? WHERE dataset = ?",
+        [(count, dataset) for (dataset, count) in broken_by_dataset.items()],
+    )
+
+    broken = conn.execute("""
+        SELECT relation_type, count(*)
+        FROM broken_relationship
+        GROUP BY relation_type
+        ORDER BY relation_type
+        """).fetchall()
+    for relation_type, count in broken:
+        logger.warning("%d %s references could not be resolved", count, relation_type)
+
+    total = sum(count for (_, count) in broken)
+    if total and not allow_broken:
+        raise RelationshipError(
+            "{} relationships could not be formed, see broken_relationship".format(
+                total
+            )
+        )
+    return total
+
+
+def cluster_geography(conn):
+    """
+    Give each geography the Hilbert curve key of its geometry, or failing that
+    its point, which the post-process writes geography_feature in, so features
+    close on the ground are close in the file.
+
+    Returns the number of geographies given a key.
+    """
+    conn.create_function("hilbert_key", 1, hilbert_key, deterministic=True)
+    conn.execute("""
+        UPDATE geography
+        SET hilbert = hilbert_key(coalesce(nullif(geometry, ''), point))
+        """)
+    (count,) = conn.execute(
+        "SELECT count(*) FROM geography WHERE hilbert IS NOT NULL"
+    ).fetchone()
+    logger.info("clustered %d geographies", count)
+    return count
+
+
+def finalise_view_model(
+    path, allow_broken_relationships=False, search=True, cluster=False
+):
+    conn = sqlite3.connect(path)
+    try:
+        resolve_relationships(conn, allow_broken_relationships)
+        # before the search indexes, so their triggers aren't fired on the way
+        if cluster:
+            cluster_geography(conn)
+        if search:
+            create_search_indexes(conn)
+        conn.commit()
+    finally:
+        conn.close()
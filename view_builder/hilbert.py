@@ -0,0 +1,43 @@
+from view_builder.wkt import wkt_bounds
+
+# the curve is laid over the whole lon/lat range with 2**ORDER cells a side,
+# 20 gives cells of around 40m by 20m across England
+HILBERT_ORDER = 20
+WORLD = (-180.0, -90.0, 180.0, 90.0)
+
+
+def hilbert_index(x, y, order=HILBERT_ORDER):
+    """
+    The distance along a Hilbert curve of the cell (x, y) in a 2**order grid
+    """
+    n = 1 << order
+    d = 0
+    s = n >> 1
+    while s:
+        rx = 1 if x & s else 0
+        ry = 1 if y & s else 0
+        d += s * s * ((3 * rx) ^ ry)
+        if not ry:
+            if rx:
+                x = n - 1 - x
+                y = n - 1 - y
+            x, y = y, x
+        s >>= 1
+    return d
+
+
+def hilbert_key(wkt, extent=WORLD, order=HILBERT_ORDER):
+    """
+    The Hilbert curve key of the centre of a WKT geometry's bounds, so nearby
+    features get nearby keys, or None for an empty geometry
+    """
+    bounds = wkt_bounds(wkt)
+    if bounds is None:
+        return None
+    minx, miny, maxx, maxy = extent
+    cells = (1 << order) - 1
+    x = ((bounds[0] + bounds[2]) / 2 - minx) / (maxx - minx)
+    y = ((bounds[1] + bounds[3]) / 2 - miny) / (maxy - miny)
+    x = min(max(int(x * cells), 0), cells)
+    y = min(max(int(y * cells), 0), cells)
+    return hilbert_index(x, y, order)
@@ -0,0 +1,112 @@
+import re
+import sqlite3
+
+from view_builder.queries import QUERIES
+from view_builder.spatialite import register_functions
+
+
+def list_indexes(conn):
+    """
+    Every index in the database as (name, table, origin, columns), including
+    those SQLite creates for primary keys ("pk") and unique constraints ("u")
+    """
+    indexes = []
+    tables = conn.execute(
+        "SELECT name FROM sqlite_master WHERE type = 'table' AND name NOT LIKE 'sqlite_%'"
+    ).fetchall()
+    for (table,) in tables:
+        for name, origin in conn.execute(
+            "SELECT name, origin FROM pragma_index_list(?)", (table,)
+        ).fetchall():
+            columns = [
+                column
+                for (column,) in conn.execute(
+                    "SELECT name FROM pragma_index_info(?) ORDER BY seqno", (name,)
+                )
+            ]
+            indexes.append((name, table, origin, columns))
+    return indexes
+
+
+def index_sizes(conn):
+    # dbstat is an optional SQLite extension, not every build has it
+    try:
+        return dict(conn.execute("SELECT name, sum(pgsize) FROM dbstat GROUP BY name"))
+    except sqlite3.OperationalError:
+        return {}
+
+
+def query_plan_indexes(conn, sql):
+    """
+    The indexes SQLite plans to use for a query, by name, or as "pk:<table>"
+    for the primary key of a WITHOUT ROWID table
+    """
+    aliases = {
+        alias: table for (table, alias) in re.findall(r"(\w+)\s+AS\s+(\w+)", sql)
+    }
+    used = set()
+    for row in conn.execute("EXPLAIN QUERY PLAN " + sql):
+        detail = row[-1]
+        match = re.search(r"USING (?:COVERING )?INDEX (\S+)", detail)
+        if match:
+            used.add(match.group(1))
+            continue
+        match = re.search(r"(?:SEARCH|SCAN) (\S+) USING PRIMARY KEY", detail)
+        if match:
+            used.add("pk:" + aliases.get(match.group(1), match.group(1)))
+    return used
+
+
+def audit_indexes(path, queries=QUERIES):
+    """
+    Report the size of each index, which of the given queries plan to use it
+    and whether it is redundant, i.e. its columns lead another index
+    """
+    conn = sqlite3.connect(path)
+    register_functions(conn)
+    try:
+        usage = {}
+        for query, sql in queries.items():
+            try:
+                used = query_plan_indexes(conn, sql)
+            except sqlite3.OperationalError:
+                # tables from a later stage, e.g. the post-process
+                continue
+            for name in used:
+                usage.setdefault(name, []).append(query)
+
+        indexes = list_indexes(conn)
+        sizes = index_sizes(conn)
+    finally:
+        conn.close()
+
+    def redundant(name, table, origin, columns):
+        # an index we created whose columns lead another index on the table,
+        # of exact duplicates only the first is kept
+        return origin == "c" and any(
+            other_table == table
+            and other_columns[: len(columns)] == columns
+            and (
+                len(other_columns) > len(columns) or other_origin != "c" or other < name
+            )
+            for (other, other_table, other_origin, other_columns) in indexes
+            if other != name
+        )
+
+    report = []
+    for name, table, origin, columns in indexes:
+        queries = usage.get(name, [])
+        if origin == "pk":
+            queries = queries + usage.get("pk:" + table, [])
+        report.append(
+            {
+                "index": name,
+                "table": table,
+                "origin": origin,
+                "columns": columns,
+                "size": sizes.get(name),
+                "queries": queries,
+                "redundant": redundant(name, table, origin, columns),
+            }
+        )
+    return report
@@ -0,0 +1,211 @@
+import hashlib
+import json
+import logging
+from datetime import datetime
+
+from view_builder.dataset_stats import ENTITY_CLASSES
+from view_builder.model.relationship import RELATIONS, relation_columns
+from view_builder.model.table import Base
+
+logger = logging.getLogger("manifest")
+
+# bump when the dataset models change what they write for the same input
+MODEL_VERSION = 1
+
+BLOCK_SIZE = 1024**2
+
+DATASET_ENTITY = "{} IN (SELECT entity FROM temp.dataset_entity)"
+
+# the rows a dataset owns in each table, given its entities in temp.dataset_entity
+# and its geographies' metrics in temp.dataset_metric
+OWNED_ROWS = {
+    "entity": DATASET_ENTITY.format("entity"),
+    **{cls.__tablename__: DATASET_ENTITY.format("entity") for cls in ENTITY_CLASSES},
+    # the relationships from its entities
+    **{
+        relation.join_class.__tablename__: DATASET_ENTITY.format(
+            relation_columns(relation)[0]
+        )
+        for relation in RELATIONS.values()
+    },
+    "metric": "id IN (SELECT metric_id FROM temp.dataset_metric)",
+    "geography_metric": DATASET_ENTITY.format("geography_id"),
+    "relationship_staging": DATASET_ENTITY.format("from_entity"),
+    "geography_part": DATASET_ENTITY.format("geography_id"),
+    # subdivide's R*Tree of the parts' bounds, only there once it has run
+    "geography_part_rtree": "id IN (SELECT id FROM geography_part WHERE {})".format(
+        DATASET_ENTITY.format("geography_id")
+    ),
+    "geography_containment": "{} OR {}".format(
+        DATASET_ENTITY.format("container_id"), DATASET_ENTITY.format("geography_id")
+    ),
+    "dataset_stats": "dataset = :dataset",
+    "build_state": "dataset = :dataset",
+    "build_manifest": "dataset = :dataset",
+}
+
+
+def model_version():
+    """
+    The version of the dataset models and of the view model's schema, a dataset
+    built with another version is rebuilt even if its input is unchanged
+    """
+    schema = [
+        (table.name, [(column.name, str(column.type)) for column in table.columns])
+        for table in Base.metadata.sorted_tables
+    ]
+    digest = hashlib.sha256(json.dumps(schema).encode()).hexdigest()
+    return "{}-{}".format(MODEL_VERSION, digest[:12])
+
+
+def file_checksum(path):
+    sha256 = hashlib.sha256()
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(BLOCK_SIZE), b""):
+            sha256.update(block)
+    return sha256.hexdigest()
+
+
+def select_dataset(conn, dataset):
+    """
+    Fill temporary tables with the dataset's entities and metrics, for OWNED_ROWS
+    """
+    conn.execute("DROP TABLE IF EXISTS temp.dataset_entity")
+    conn.execute("DROP TABLE IF EXISTS temp.dataset_metric")
+    conn.execute(
+        "CREATE TEMP TABLE dataset_entity AS "
+        "SELECT entity FROM entity WHERE dataset = ?",
+        (dataset,),
+    )
+    conn.execute("""
+        CREATE TEMP TABLE dataset_metric AS
+        SELECT metric_id FROM geography_metric
+        WHERE geography_id IN (SELECT entity FROM temp.dataset_entity)
+        """)
+
+
+def table_exists(conn, table):
+    return (
+        conn.execute(
+            "SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = ?", (table,)
+        ).fetchone()
+        is not None
+    )
+
+
+def row_counts(conn, dataset):
+    """
+    The number of rows the dataset has in each table it's written to
+    """
+    select_dataset(conn, dataset)
+    counts = {}
+    for table, where in OWNED_ROWS.items():
+        if table in ("build_state", "build_manifest", "geography_part_rtree"):
+            continue
+        (count,) = conn.execute(
+            "SELECT count(*) FROM {} WHERE {}".format(table, where),
+            {"dataset": dataset},
+        ).fetchone()
+        if count:
+            counts[table] = count
+    return counts
+
+
+def is_unchanged(conn, dataset, checksum):
+    """
+    Whether the dataset was completely built from an input with this checksum
+    by this version of the view builder
+    """
+    return (
+        conn.execute(
+            """
+            SELECT 1 FROM build_manifest AS m
+            JOIN build_state AS s ON s.dataset = m.dataset
+            WHERE m.dataset = ? AND m.checksum = ? AND m.model_version = ?
+            AND s.complete
+            """,
+            (dataset, checksum, model_version()),
+        ).fetchone()
+        is not None
+    )
+
+
+def dependent_datasets(conn, dataset):
+    """
+    The other datasets with relationships to the dataset's entities
+    """
+    select_dataset(conn, dataset)
+    dependents = set()
+    for relation in RELATIONS.values():
+        from_column, to_column = relation_columns(relation)
+        dependents.update(
+            row[0]
+            for row in conn.execute(
+                f"""
+                SELECT DISTINCT e.dataset
+                FROM {relation.join_class.__tablename__} AS j
+                JOIN entity AS e ON e.entity = j.{from_column}
+                WHERE j.{to_column} IN (SELECT entity FROM temp.dataset_entity)
+                AND e.dataset != ?
+                """,
+                (dataset,),
+            )
+        )
+    return sorted(dependents)
+
+
+def remove_dataset(conn, dataset):
+    """
+    Delete everything built from the dataset, ready for it to be rebuilt.
+
+    Relationships other datasets have to its entities are left for them to be
+    rebuilt, as references are resolved when a dataset is built, so their
+    manifests are removed too. Returns the dependent datasets.
+    """
+    dependents = dependent_datasets(conn, dataset)
+    with conn:
+        if table_exists(conn, "geography_part_rtree"):
+            # before geography_part, which it finds the dataset's parts by
+            conn.execute(
+                "DELETE FROM geography_part_rtree WHERE {}".format(
+                    OWNED_ROWS["geography_part_rtree"]
+                )
+            )
+        for table in reversed(Base.metadata.sorted_tables):
+            if table.name in OWNED_ROWS:
+                conn.execute(
+                    "DELETE FROM {} WHERE {}".format(
+                        table.name, OWNED_ROWS[table.name]
+                    ),
+                    {"dataset": dataset},
+                )
+        conn.executemany(
+            "DELETE FROM build_manifest WHERE dataset = ?",
+            [(dependent,) for dependent in dependents],
+        )
+    if dependents:
+        logger.info("%s removed, %s to be rebuilt", dataset, ", ".join(dependents))
+    return dependents
+
+
+def record_manifest(conn, dataset, input_path, checksum):
+    counts = row_counts(conn, dataset)
+    with conn:
+        conn.execute(
+            """
+            INSERT OR REPLACE INTO build_manifest
+                (dataset, input_path, checksum, model_version, entity_count,
+                row_counts, built_at)
+            VALUES (?, ?, ?, ?, ?, ?, ?)
+            """,
+            (
+                dataset,
+                input_path,
+                checksum,
+                model_version(),
+                counts.get("entity", 0),
+                json.dumps(counts, sort_keys=True),
+                datetime.now().isoformat(sep=" "),
+            ),
+        )
+    return counts
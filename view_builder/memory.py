@@ -0,0 +1,95 @@
+import logging
+import os
+import re
+
+logger = logging.getLogger("memory")
+
+UNITS = {"": 1, "K": 1024, "M": 1024**2, "G": 1024**3, "T": 1024**4}
+
+
+def parse_memory_size(value):
+    """
+    A size in bytes from a string such as "512M" or "4G"
+    """
+    match = re.fullmatch(r"\s*(\d+(?:\.\d+)?)\s*([KMGT]?)I?B?\s*", value.upper())
+    if not match:
+        raise ValueError("invalid memory size {!r}".format(value))
+    return int(float(match.group(1)) * UNITS[match.group(2)])
+
+
+def rss_bytes():
+    """
+    The resident set size of this process, or None where /proc isn't available
+    """
+    try:
+        with open("/proc/self/statm") as f:
+            resident_pages = int(f.read().split()[1])
+    except (OSError, IndexError, ValueError):
+        return None
+    return resident_pages * os.sysconf("SC_PAGE_SIZE")
+
+
+class MemoryGovernor:
+    """
+    Adapts the number of items written between flushes to keep the resident
+    set size within a budget: halving it when memory use is high and still
+    growing, doubling it again when there's plenty of headroom
+    """
+
+    def __init__(
+        self,
+        max_memory,
+        batch_size=1000,
+        min_batch_size=10,
+        max_batch_size=100000,
+        high_water=0.8,
+        low_water=0.5,
+        rss=rss_bytes,
+    ):
+        self.max_memory = max_memory
+        self.batch_size = batch_size
+        self.min_batch_size = min_batch_size
+        self.max_batch_size = max_batch_size
+        self.high_water = high_water
+        self.low_water = low_water
+        self._rss = rss
+        self._last_rss = None
+        self.peak_rss = 0
+
+    def adjust(self):
+        """
+        Check memory use after a flush, returns the batch size to use next
+        """
+        rss = self._rss()
+        if rss is None:
+            return self.batch_size
+        self.peak_rss = max(self.peak_rss, rss)
+
+        # freed memory isn't always returned to the OS, so only shrink while
+        # use is still climbing
+        growing = self._last_rss is None or rss > self._last_rss
+        self._last_rss = rss
+
+        if rss > self.max_memory * self.high_water and growing:
+            batch_size = max(self.min_batch_size, self.batch_size // 2)
+            if batch_size != self.batch_size:
+                logger.warning(
+                    "RSS %dMB of %dMB, batch size down to %d",
+                    rss // 1024**2,
+                    self.max_memory // 1024**2,
+                    batch_size,
+                )
+        elif rss < self.max_memory * self.low_water:
+            batch_size = min(self.max_batch_size, self.batch_size * 2)
+            if batch_size != self.batch_size:
+                logger.info(
+                    "RSS %dMB of %dMB, batch size up to %d",
+                    rss // 1024**2,
+                    self.max_memory // 1024**2,
+                    batch_size,
+                )
+        else:
+            batch_size = self.batch_size
+
+        self.batch_size = batch_size
+        return batch_size
@@ -1,25 +1,20 @@
+import json
 import logging
 from datetime import date
 from sqlalchemy.orm.exc import NoResultFound
+from view_builder.dataset_stats import count_broken_relationship
+from view_builder.model.projection import Projection, compile_projection
+from view_builder.model.record import ORM, RECORD
+from view_builder.model.relationship import RELATIONS
 from view_builder.model.table import (
     Entity,
     Category,
     Organisation,
     Geography,
-    GeographyCategory,
-    GeographyMetric,
-    OrganisationGeography,
     Policy,
-    PolicyGeography,
-    PolicyOrganisation,
-    PolicyCategory,
-    PolicyDocument,
     Document,
-    DocumentGeography,
-    DocumentOrganisation,
-    DocumentCategory,
-    Metric,
 )
+from view_builder.wkt import round_wkt
 
 logging.basicConfig(level=logging.WARNING)
 logger = logging.getLogger("dataset")
@@ -34,13 +29,18 @@ class DatasetModelFactory:
         self._dataset_models = {}
 
     def register_dataset_model(self, model_class):
+        if hasattr(model_class, "projection"):
+            model_class.projection()
         self._dataset_models[model_class.dataset_name] = model_class
 
-    def get_dataset_model(self, name, session, data: dict):
+    def get_dataset_model_class(self, name):
         model_class = self._dataset_models.get(name)
         if not model_class:
             raise ValueError("No matching dataset model found")
-        return model_class(session, data)
+        return model_class
+
+    def get_dataset_model(self, name, session, data: dict):
+        return self.get_dataset_model_class(name)(session, data)
 
 
 factory = DatasetModelFactory()
@@ -50,6 +50,14 @@ class DatasetModel:
     dataset_name = None
     typology = None
 
+    date_fields = ["entry-date", "start-date", "end-date"]
+    projections = {
+        "entity": Projection(
+            Entity, constants={"dataset": "{dataset_name}", "typology": "{typology}"}
+        ),
+    }
+    list_fields = {}
+
     def __init__(self, session, data: dict):
         self.data = data
         self.session = session
@@ -60,25 +68,32 @@ class DatasetModel:
         if not data.get("entry-date", None):
             raise ValueError("Entry missing entry-date")
 
-        self.data["entry_date"] = date.fromisoformat(self.data.pop("entry-date"))
-        if "start-date" in self.data:
-            self.data["start_date"] = date.fromisoformat(self.data.pop("start-date"))
-        if "end-date" in self.data:
-            self.data["end_date"] = date.fromisoformat(self.data.pop("end-date"))
+        for name, value in self.projection()(self.data).items():
+            setattr(self, name, value)
 
         if self.data["entry_date"] > date.today():
             raise ValueError("entry-date cannot be in the future")
 
-        self.entity = {
-            key: data[key]
-            for key in Entity.__table__.columns.keys()
-            if key in self.data
-        }
+    @classmethod
+    def projection(cls):
+        # compiled once per model class, normally when it is registered
+        if "_projection" not in cls.__dict__:
+            cls._projection = compile_projection(
+                cls.projections, cls.date_fields, cls.list_fields, cls
+            )
+        return cls._projection
 
-        self.entity["dataset"] = self.dataset_name
-        self.entity["typology"] = self.typology
+    def to_orm(self, allow_broken_relationships=False, defer_relationships=False):
+        return self.map_entry(ORM, allow_broken_relationships, defer_relationships)
 
-    def to_orm(self, allow_broken_relationships=False):
+    def to_records(self, allow_broken_relationships=False, defer_relationships=False):
+        """
+        The rows to write for the entry as lightweight records rather than ORM
+        instances, see view_builder.model.record
+        """
+        return self.map_entry(RECORD, allow_broken_relationships, defer_relationships)
+
+    def map_entry(self, target, allow_broken_relationships, defer_relationships):
         raise NotImplementedError()
 
     def get_organisation(self, organisation):
@@ -115,82 +130,151 @@ class DatasetModel:
             )
             if allow_broken:
                 logger.debug(message)
+                count_broken_relationship(self.session)
                 orm = None
             else:
                 raise RelationshipError(message)
 
         return orm
 
+    def lookup(self, target, reference, reference_type=None):
+        if target == "category":
+            return self.get_category(category=reference, type=reference_type)
+        if target == "organisation":
+            return self.get_organisation(reference)
+        if target == "geography":
+            return self.get_geography(reference)
+        if target == "policy":
+            return self.get_policy(reference)
+        if target == "entity":
+            entity = self.get_entity(reference)
+            return entity.geography[0] if entity.geography else None
+        raise ValueError("Unknown relationship target {}".format(target))
+
+    def relate(
+        self,
+        target,
+        relation_type,
+        from_item,
+        reference,
+        allow_broken,
+        defer=False,
+        reference_type=None,
+    ):
+        """
+        Form a relationship from from_item to the item with the given reference.
+
+        Returns the join object, None for an allowed broken relationship, or when
+        deferred a relationship_staging row for finalise to resolve in bulk.
+        """
+        if defer:
+            return target.staging(
+                from_entity=from_item.entity,
+                relation_type=relation_type,
+                reference_type=reference_type,
+                reference=reference,
+            )
 
-class CategoryDatasetModel(DatasetModel):
-
-    dataset_name = None
-    typology = "category"
+        relation = RELATIONS[relation_type]
+        to_item = self.find_relation(
+            lambda ref: self.lookup(relation.target, ref, reference_type),
+            from_item,
+            reference,
+            allow_broken,
+        )
+        if not to_item:
+            return None
 
-    def __init__(self, session, data: dict):
-        DatasetModel.__init__(self, session, data)
+        return target.join(relation, from_item, to_item)
 
-        self.category = {
-            key: data[key]
-            for key in Category.__table__.columns.keys()
-            if key in self.data
-        }
-        if "category" not in self.category and self.dataset_name in self.data:
-            self.category["category"] = self.data[self.dataset_name]
 
-        self.category["type"] = self.dataset_name
+class CategoryDatasetModel(DatasetModel):
 
-    def to_orm(self, allow_broken_relationships=False):
-        entity = Entity(**self.entity)
-        category = Category(**self.category, entity_rel=entity)
-        return [category]
+    dataset_name = None
+    typology = "category"
+    projections = dict(
+        DatasetModel.projections,
+        category=Projection(
+            Category,
+            sources={"category": ["category", "{dataset_name}"]},
+            constants={"type": "{dataset_name}"},
+        ),
+    )
+
+    def map_entry(self, target, allow_broken_relationships, defer_relationships):
+        category, orms = target.item(Category, self.category, self.entity)
+        return orms
 
 
 class GeographyDatasetModel(DatasetModel):
 
     dataset_name = None
     typology = "geography"
+    projections = dict(
+        DatasetModel.projections,
+        geography=Projection(Geography, constants={"type": "{dataset_name}"}),
+    )
+
+    # decimal places of the stored coordinates, 6 is about 10cm
+    coordinate_precision = 6
 
     def __init__(self, session, data: dict):
         DatasetModel.__init__(self, session, data)
+        self.metrics = []
 
-        self.geography = {
-            key: data[key]
-            for key in Geography.__table__.columns.keys()
-            if key in self.data
-        }
-        self.geography["type"] = self.dataset_name
+        if self.coordinate_precision is not None:
+            for field in ["geometry", "point"]:
+                if self.geography.get(field):
+                    self.geography[field] = round_wkt(
+                        self.geography[field], self.coordinate_precision
+                    )
 
-    def to_orm(self, allow_broken_relationships=False):
-        orms = []
-        entity = Entity(**self.entity)
-        geography = Geography(**self.geography, entity_rel=entity)
-        orms.append(geography)
+    def map_entry(self, target, allow_broken_relationships, defer_relationships):
+        geography, orms = target.item(Geography, self.geography, self.entity)
 
+        organisation = None
         if "organisation" in self.data and self.data["organisation"]:
-            organisation = self.find_relation(
-                self.get_organisation,
+            relationship = self.relate(
+                target,
+                "organisation_geography",
                 geography,
                 self.data["organisation"],
                 allow_broken_relationships,
+                defer_relationships,
             )
 
-            if organisation:
-                relationship = OrganisationGeography(
-                    organisation=organisation, geography=geography
-                )
+            if relationship:
                 orms.append(relationship)
+                # organisations are looked up by this code
+                organisation = self.data["organisation"]
+
+        orms[0] = target.update(
+            geography, properties=self.feature_properties(organisation)
+        )
 
         return orms
 
+    def feature_properties(self, organisation=None):
+        # Pre-bake the feature properties served from geography_geom so the
+        # post-process doesn't have to join back to organisation and metric
+        properties = {
+            "name": self.geography.get("name"),
+            "type": self.geography["type"],
+            "organisation": organisation,
+            "entity": self.geography.get("entity"),
+        }
+        for field in ["entry_date", "start_date", "end_date"]:
+            value = self.geography.get(field)
+            properties[field.replace("_", "-")] = value.isoformat() if value else None
+
+        properties.update(self.metrics)
+        return json.dumps(properties)
+
 
 class DeveloperAgreementTypeModel(CategoryDatasetModel):
 
     dataset_name = "developer-agreement-type"
 
-    def __init__(self, session, data: dict):
-        CategoryDatasetModel.__init__(self, session, data)
-
 
 factory.register_dataset_model(DeveloperAgreementTypeModel)
 
@@ -199,9 +283,6 @@ class DevelopmentPolicyCategoryModel(CategoryDatasetModel):
 
     dataset_name = "development-policy-category"
 
-    def __init__(self, session, data: dict):
-        CategoryDatasetModel.__init__(self, session, data)
-
 
 factory.register_dataset_model(DevelopmentPolicyCategoryModel)
 
@@ -210,9 +291,6 @@ class DevelopmentPlanTypeModel(CategoryDatasetModel):
 
     dataset_name = "development-plan-type"
 
-    def __init__(self, session, data: dict):
-        CategoryDatasetModel.__init__(self, session, data)
-
 
 factory.register_dataset_model(DevelopmentPlanTypeModel)
 
@@ -221,9 +299,6 @@ class DocumentTypeModel(CategoryDatasetModel):
 
     dataset_name = "document-type"
 
-    def __init__(self, session, data: dict):
-        CategoryDatasetModel.__init__(self, session, data)
-
 
 factory.register_dataset_model(DocumentTypeModel)
 
@@ -232,9 +307,6 @@ class OwnershipStatusModel(CategoryDatasetModel):
 
     dataset_name = "ownership-status"
 
-    def __init__(self, session, data: dict):
-        CategoryDatasetModel.__init__(self, session, data)
-
 
 factory.register_dataset_model(OwnershipStatusModel)
 
@@ -243,9 +315,6 @@ class SiteCategoryModel(CategoryDatasetModel):
 
     dataset_name = "site-category"
 
-    def __init__(self, session, data: dict):
-        CategoryDatasetModel.__init__(self, session, data)
-
 
 factory.register_dataset_model(SiteCategoryModel)
 
@@ -254,9 +323,6 @@ class PlanningPermissionStatusModel(CategoryDatasetModel):
 
     dataset_name = "planning-permission-status"
 
-    def __init__(self, session, data: dict):
-        CategoryDatasetModel.__init__(self, session, data)
-
 
 factory.register_dataset_model(PlanningPermissionStatusModel)
 
@@ -265,9 +331,6 @@ class PlanningPermissionTypeModel(CategoryDatasetModel):
 
     dataset_name = "planning-permission-type"
 
-    def __init__(self, session, data: dict):
-        CategoryDatasetModel.__init__(self, session, data)
-
 
 factory.register_dataset_model(PlanningPermissionTypeModel)
 
@@ -276,9 +339,6 @@ class LocalAuthorityDistrictModel(GeographyDatasetModel):
 
     dataset_name = "local-authority-district"
 
-    def __init__(self, session, data: dict):
-        GeographyDatasetModel.__init__(self, session, data)
-
 
 factory.register_dataset_model(LocalAuthorityDistrictModel)
 
@@ -287,9 +347,6 @@ class ConservationAreaModel(GeographyDatasetModel):
 
     dataset_name = "conservation-area"
 
-    def __init__(self, session, data: dict):
-        GeographyDatasetModel.__init__(self, session, data)
-
 
 factory.register_dataset_model(ConservationAreaModel)
 
@@ -298,68 +355,42 @@ class DevelopmentPolicyModel(DatasetModel):
 
     dataset_name = "development-policy"
     typology = "policy"
-
-    def __init__(self, session, data: dict):
-        DatasetModel.__init__(self, session, data)
-
-        self.policy = {
-            key: data[key]
-            for key in Policy.__table__.columns.keys()
-            if key in self.data
-        }
-
-        if "policy" not in self.policy and self.dataset_name in self.data:
-            self.policy["policy"] = self.data[self.dataset_name]
-
-        self.categories = (
-            self.data["development-policy-categories"].split(";")
-            if "development-policy-categories" in self.data
-            else []
+    projections = dict(
+        DatasetModel.projections,
+        policy=Projection(Policy, sources={"policy": ["policy", "{dataset_name}"]}),
+    )
+    list_fields = {
+        "categories": "development-policy-categories",
+        "organisations": "organisation",
+        "geographies": "geographies",
+    }
+
+    def map_entry(self, target, allow_broken_relationships, defer_relationships):
+        policy, orms = target.item(Policy, self.policy, self.entity)
+
+        relationships = (
+            [
+                ("policy_category", category, "development-policy-category")
+                for category in self.categories
+            ]
+            + [("policy_organisation", org, None) for org in self.organisations]
+            + [
+                ("policy_geography", "local-authority-district:" + geography, None)
+                for geography in self.geographies
+            ]
         )
-        self.organisations = (
-            self.data["organisation"].split(";") if "organisation" in self.data else []
-        )
-        self.geographies = (
-            self.data["geographies"].split(";") if "geographies" in self.data else []
-        )
-
-    def to_orm(self, allow_broken_relationships=False):
-        orms = []
-        entity = Entity(**self.entity)
-        policy = Policy(**self.policy, entity_rel=entity)
 
-        orms.append(policy)
-
-        def category_callback(category):
-            return self.get_category(
-                category=category, type="development-policy-category"
-            )
-
-        for category in self.categories:
-            category_orm = self.find_relation(
-                category_callback, policy, category, allow_broken_relationships
-            )
-            if category_orm:
-                relationship = PolicyCategory(category=category_orm, policy=policy)
-                orms.append(relationship)
-
-        for org in self.organisations:
-            org_orm = self.find_relation(
-                self.get_organisation, policy, org, allow_broken_relationships
-            )
-            if org_orm:
-                relationship = PolicyOrganisation(organisation=org_orm, policy=policy)
-                orms.append(relationship)
-
-        for geography in self.geographies:
-            geography_orm = self.find_relation(
-                self.get_geography,
+        for relation_type, reference, reference_type in relationships:
+            relationship = self.relate(
+                target,
+                relation_type,
                 policy,
-                "local-authority-district:" + geography,
+                reference,
                 allow_broken_relationships,
+                defer_relationships,
+                reference_type,
             )
-            if geography_orm:
-                relationship = PolicyGeography(geography=geography_orm, policy=policy)
+            if relationship:
                 orms.append(relationship)
 
         return orms
@@ -372,90 +403,50 @@ class DevelopmentPlanDocumentModel(DatasetModel):
 
     dataset_name = "development-plan-document"
     typology = "document"
-
-    def __init__(self, session, data: dict):
-        DatasetModel.__init__(self, session, data)
-
-        self.document = {
-            key: data[key]
-            for key in Document.__table__.columns.keys()
-            if key in self.data
-        }
-
-        if "document" not in self.document and self.dataset_name in self.data:
-            self.document["document"] = self.data[self.dataset_name]
-
-        if "document_url" not in self.document and "document-url" in self.data:
-            self.document["document_url"] = self.data["document-url"]
-
-        self.categories = (
-            self.data["development-plan-types"].split(";")
-            if "development-plan-types" in self.data
-            else []
-        )
-        self.policies = (
-            self.data["development-policies"].split(";")
-            if "development-policies" in self.data
-            else []
+    projections = dict(
+        DatasetModel.projections,
+        document=Projection(
+            Document,
+            sources={
+                "document": ["document", "{dataset_name}"],
+                "document_url": ["document_url", "document-url"],
+            },
+        ),
+    )
+    list_fields = {
+        "categories": "development-plan-types",
+        "policies": "development-policies",
+        "organisations": "organisations",
+        "geographies": "geographies",
+    }
+
+    def map_entry(self, target, allow_broken_relationships, defer_relationships):
+        document, orms = target.item(Document, self.document, self.entity)
+
+        relationships = (
+            [
+                ("document_category", category, "development-plan-type")
+                for category in self.categories
+            ]
+            + [("policy_document", policy, None) for policy in self.policies]
+            + [("document_organisation", org, None) for org in self.organisations]
+            + [
+                ("document_geography", "local-authority-district:" + geography, None)
+                for geography in self.geographies
+            ]
         )
-        self.organisations = (
-            self.data["organisations"].split(";")
-            if "organisations" in self.data
-            else []
-        )
-        self.geographies = (
-            self.data["geographies"].split(";") if "geographies" in self.data else []
-        )
-
-    def to_orm(self, allow_broken_relationships=False):
-        orms = []
-        entity = Entity(**self.entity)
-        document = Document(**self.document, entity_rel=entity)
-
-        orms.append(document)
-
-        def category_callback(category):
-            return self.get_category(category=category, type="development-plan-type")
-
-        for category in self.categories:
-            category_orm = self.find_relation(
-                category_callback, document, category, allow_broken_relationships
-            )
-            if category_orm:
-                relationship = DocumentCategory(
-                    document=document, category=category_orm
-                )
-                orms.append(relationship)
-
-        for policy in self.policies:
-            policy_orm = self.find_relation(
-                self.get_policy, document, policy, allow_broken_relationships
-            )
-            if policy_orm:
-                relationship = PolicyDocument(policy=policy_orm, document=document)
-                orms.append(relationship)
 
-        for org in self.organisations:
-            org_orm = self.find_relation(
-                self.get_organisation, document, org, allow_broken_relationships
-            )
-            if org_orm:
-                relationship = DocumentOrganisation(
-                    organisation=org_orm, document=document
-                )
-                orms.append(relationship)
-
-        for geography in self.geographies:
-            geography_orm = self.find_relation(
-                self.get_geography,
+        for relation_type, reference, reference_type in relationships:
+            relationship = self.relate(
+                target,
+                relation_type,
                 document,
-                "local-authority-district:" + geography,
+                reference,
                 allow_broken_relationships,
+                defer_relationships,
+                reference_type,
             )
-            if geography_orm:
-                relationship = DocumentGeography(
-                    geography=geography_orm, document=document
-                )
+            if relationship:
                 orms.append(relationship)
 
         return orms
@@ -468,89 +459,47 @@ class DocumentModel(DatasetModel):
 
     dataset_name = "document"
     typology = "document"
+    projections = dict(
+        DatasetModel.projections,
+        document=Projection(
+            Document, sources={"document_url": ["document_url", "document-url"]}
+        ),
+    )
+    list_fields = {
+        "categories": "document-types",
+        "policies": "development-policies",
+        "organisations": "organisations",
+        "geographies": "geographies",
+    }
+
+    def map_entry(self, target, allow_broken_relationships, defer_relationships):
+        document, orms = target.item(Document, self.document, self.entity)
 
-    def __init__(self, session, data: dict):
-        DatasetModel.__init__(self, session, data)
-
-        self.document = {
-            key: data[key]
-            for key in Document.__table__.columns.keys()
-            if key in self.data
-        }
-
-        if "document_url" not in self.document and "document-url" in self.data:
-            self.document["document_url"] = self.data["document-url"]
-
-        self.categories = (
-            self.data["document-types"].split(";")
-            if "document-types" in self.data
-            else []
-        )
-        self.policies = (
-            self.data["development-policies"].split(";")
-            if "development-policies" in self.data
-            else []
-        )
-        self.organisations = (
-            self.data["organisations"].split(";")
-            if "organisations" in self.data
-            else []
-        )
-        self.geographies = (
-            self.data["geographies"].split(";") if "geographies" in self.data else []
+        # Geographies in Document are referenced by entity, not by code
+        relationships = (
+            [
+                ("document_category", category, "document-type")
+                for category in self.categories
+            ]
+            + [("policy_document", policy, None) for policy in self.policies]
+            + [("document_organisation", org, None) for org in self.organisations]
+            + [
+                ("document_geography_entity", geography, None)
+                for geography in self.geographies
+            ]
         )
 
-    def to_orm(self, allow_broken_relationships=False):
-        orms = []
-        entity = Entity(**self.entity)
-        document = Document(**self.document, entity_rel=entity)
-
-        orms.append(document)
-
-        def category_callback(category):
-            return self.get_category(category=category, type="document-type")
-
-        for category in self.categories:
-            category_orm = self.find_relation(
-                category_callback, document, category, allow_broken_relationships
-            )
-            if category_orm:
-                relationship = DocumentCategory(
-                    document=document, category=category_orm
-                )
-                orms.append(relationship)
-
-        for policy in self.policies:
-            policy_orm = self.find_relation(
-                self.get_policy, document, policy, allow_broken_relationships
-            )
-            if policy_orm:
-                relationship = PolicyDocument(policy=policy_orm, document=document)
-                orms.append(relationship)
-
-        for org in self.organisations:
-            org_orm = self.find_relation(
-                self.get_organisation, document, org, allow_broken_relationships
-            )
-            if org_orm:
-                relationship = DocumentOrganisation(
-                    organisation=org_orm, document=document
-                )
-                orms.append(relationship)
-
-        # Geographies in Document are referenced by entity, not by code
-        for geography in self.geographies:
-            geography_entity = self.find_relation(
-                self.get_entity,
+        for relation_type, reference, reference_type in relationships:
+            relationship = self.relate(
+                target,
+                relation_type,
                 document,
-                geography,
+                reference,
                 allow_broken_relationships,
+                defer_relationships,
+                reference_type,
             )
-
-            if geography_entity and geography_entity.geography:
-                relationship = DocumentGeography(
-                    geography=geography_entity.geography[0], document=document
-                )
+            if relationship:
                 orms.append(relationship)
 
         return orms
@@ -575,13 +524,20 @@ class BrownfieldLandModel(GeographyDatasetModel):
         "hectares",
         "site-address",
     ]
+    projections = dict(
+        GeographyDatasetModel.projections,
+        geography=Projection(
+            Geography,
+            sources={
+                "geography": ["site"],
+                "documentation_url": ["documentation_url", "site-plan-url"],
+            },
+            constants={"type": "{dataset_name}"},
+        ),
+    )
 
     def __init__(self, session, data: dict):
         GeographyDatasetModel.__init__(self, session, data)
-        self.geography["geography"] = data["site"]
-
-        if "documentation_url" not in self.geography and "site-plan-url" in self.data:
-            self.geography["documentation_url"] = self.data["site-plan-url"]
 
         self.categories = []
 
@@ -598,35 +554,35 @@ class BrownfieldLandModel(GeographyDatasetModel):
             if site_category in self.data
         )
 
-        self.metrics = (
+        self.metrics = [
             (metric_field, self.data[metric_field])
             for metric_field in self.metric_fields
             if metric_field in self.data and self.data[metric_field]
-        )
+        ]
 
         # TODO site-address
 
-    def to_orm(self, allow_broken_relationships=False):
-        orms = super().to_orm(allow_broken_relationships)
+    def map_entry(self, target, allow_broken_relationships, defer_relationships):
+        orms = super().map_entry(
+            target, allow_broken_relationships, defer_relationships
+        )
         geography = orms[0]
 
-        for (category_type, category) in self.categories:
-            category_orm = self.find_relation(
-                lambda cat: self.get_category(category=cat, type=category_type),
+        for category_type, category in self.categories:
+            relationship = self.relate(
+                target,
+                "geography_category",
                 geography,
                 category,
                 allow_broken_relationships,
+                defer_relationships,
+                category_type,
             )
-            if category_orm:
-                relationship = GeographyCategory(
-                    geography=geography, category=category_orm
-                )
+            if relationship:
                 orms.append(relationship)
 
-        for (metric, value) in self.metrics:
-            metric_orm = Metric(field=metric, value=value)
-            relationship = GeographyMetric(geography=geography, metric=metric_orm)
-            orms.append(relationship)
+        for metric, value in self.metrics:
+            orms.extend(target.metric(geography, metric, value))
 
         return orms
 
@@ -636,9 +592,8 @@ factory.register_dataset_model(BrownfieldLandModel)
 
 class HeritageCoastModel(GeographyDatasetModel):
     dataset_name = "heritage-coast"
-
-    def __init__(self, session, data: dict):
-        GeographyDatasetModel.__init__(self, session, data)
+    # vast boundaries, digitised to no better than a metre or so
+    coordinate_precision = 5
 
 
 factory.register_dataset_model(HeritageCoastModel)
@@ -646,9 +601,8 @@ factory.register_dataset_model(HeritageCoastModel)
 
 class AreaOfOutstandingNaturalBeautyModel(GeographyDatasetModel):
     dataset_name = "area-of-outstanding-natural-beauty"
-
-    def __init__(self, session, data: dict):
-        GeographyDatasetModel.__init__(self, session, data)
+    # vast boundaries, digitised to no better than a metre or so
+    coordinate_precision = 5
 
 
 factory.register_dataset_model(AreaOfOutstandingNaturalBeautyModel)
@@ -657,9 +611,6 @@ factory.register_dataset_model(AreaOfOutstandingNaturalBeautyModel)
 class AncientWoodlandModel(GeographyDatasetModel):
     dataset_name = "ancient-woodland"
 
-    def __init__(self, session, data: dict):
-        GeographyDatasetModel.__init__(self, session, data)
-
 
 factory.register_dataset_model(AncientWoodlandModel)
 
@@ -667,9 +618,6 @@ factory.register_dataset_model(AncientWoodlandModel)
 class ParishModel(GeographyDatasetModel):
     dataset_name = "parish"
 
-    def __init__(self, session, data: dict):
-        GeographyDatasetModel.__init__(self, session, data)
-
 
 factory.register_dataset_model(ParishModel)
 
@@ -677,9 +625,6 @@ factory.register_dataset_model(ParishModel)
 class BattlefieldModel(GeographyDatasetModel):
     dataset_name = "battlefield"
 
-    def __init__(self, session, data: dict):
-        GeographyDatasetModel.__init__(self, session, data)
-
 
 factory.register_dataset_model(BattlefieldModel)
 
@@ -687,9 +632,6 @@ factory.register_dataset_model(BattlefieldModel)
 class HeritageAtRiskModel(GeographyDatasetModel):
     dataset_name = "heritage-at-risk"
 
-    def __init__(self, session, data: dict):
-        GeographyDatasetModel.__init__(self, session, data)
-
 
 factory.register_dataset_model(HeritageAtRiskModel)
 
@@ -697,9 +639,6 @@ factory.register_dataset_model(HeritageAtRiskModel)
 class BuildingPreservationNoticeModel(GeographyDatasetModel):
     dataset_name = "building-preservation-notice"
 
-    def __init__(self, session, data: dict):
-        GeographyDatasetModel.__init__(self, session, data)
-
 
 factory.register_dataset_model(BuildingPreservationNoticeModel)
 
@@ -707,9 +646,6 @@ factory.register_dataset_model(BuildingPreservationNoticeModel)
 class ParkAndGardenModel(GeographyDatasetModel):
     dataset_name = "park-and-garden"
 
-    def __init__(self, session, data: dict):
-        GeographyDatasetModel.__init__(self, session, data)
-
 
 factory.register_dataset_model(ParkAndGardenModel)
 
@@ -717,9 +653,6 @@ factory.register_dataset_model(ParkAndGardenModel)
 class HeritateAtRiskModel(GeographyDatasetModel):
     dataset_name = "heritate-at-risk"
 
-    def __init__(self, session, data: dict):
-        GeographyDatasetModel.__init__(self, session, data)
-
 
 factory.register_dataset_model(HeritateAtRiskModel)
 
@@ -727,9 +660,6 @@ factory.register_dataset_model(HeritateAtRiskModel)
 class ScheduledMonumentModel(GeographyDatasetModel):
     dataset_name = "scheduled-monument"
 
-    def __init__(self, session, data: dict):
-        GeographyDatasetModel.__init__(self, session, data)
-
 
 factory.register_dataset_model(ScheduledMonumentModel)
 
@@ -737,9 +667,6 @@ factory.register_dataset_model(ScheduledMonumentModel)
 class WorldHeritageSiteModel(GeographyDatasetModel):
     dataset_name = "world-heritage-site"
 
-    def __init__(self, session, data: dict):
-        GeographyDatasetModel.__init__(self, session, data)
-
 
 factory.register_dataset_model(WorldHeritageSiteModel)
 
@@ -747,9 +674,6 @@ factory.register_dataset_model(WorldHeritageSiteModel)
 class ProtectedWreckSiteModel(GeographyDatasetModel):
     dataset_name = "protected-wreck-site"
 
-    def __init__(self, session, data: dict):
-        GeographyDatasetModel.__init__(self, session, data)
-
 
 factory.register_dataset_model(ProtectedWreckSiteModel)
 
@@ -757,9 +681,6 @@ factory.register_dataset_model(ProtectedWreckSiteModel)
 class BuildingPreservationNoticeModel(GeographyDatasetModel):
     dataset_name = "building-preservation-notice"
 
-    def __init__(self, session, data: dict):
-        GeographyDatasetModel.__init__(self, session, data)
-
 
 factory.register_dataset_model(BuildingPreservationNoticeModel)
 
@@ -767,9 +688,6 @@ factory.register_dataset_model(BuildingPreservationNoticeModel)
 class CertificateOfImmunityModel(GeographyDatasetModel):
     dataset_name = "certificate-of-immunity"
 
-    def __init__(self, session, data: dict):
-        GeographyDatasetModel.__init__(self, session, data)
-
 
 factory.register_dataset_model(CertificateOfImmunityModel)
 
@@ -777,9 +695,6 @@ factory.register_dataset_model(CertificateOfImmunityModel)
 class ListedBuildingModel(GeographyDatasetModel):
     dataset_name = "listed-building"
 
-    def __init__(self, session, data: dict):
-        GeographyDatasetModel.__init__(self, session, data)
-
 
 factory.register_dataset_model(ListedBuildingModel)
 
@@ -787,18 +702,14 @@ factory.register_dataset_model(ListedBuildingModel)
 class SpecialAreaOfConservationModel(GeographyDatasetModel):
     dataset_name = "special-area-of-conservation"
 
-    def __init__(self, session, data: dict):
-        GeographyDatasetModel.__init__(self, session, data)
-
 
 factory.register_dataset_model(SpecialAreaOfConservationModel)
 
 
 class GreenBeltModel(GeographyDatasetModel):
     dataset_name = "green-belt"
-
-    def __init__(self, session, data: dict):
-        GeographyDatasetModel.__init__(self, session, data)
+    # vast boundaries, digitised to no better than a metre or so
+    coordinate_precision = 5
 
 
 factory.register_dataset_model(GreenBeltModel)
@@ -807,9 +718,6 @@ factory.register_dataset_model(GreenBeltModel)
 class RamsarModel(GeographyDatasetModel):
     dataset_name = "ramsar"
 
-    def __init__(self, session, data: dict):
-        GeographyDatasetModel.__init__(self, session, data)
-
 
 factory.register_dataset_model(RamsarModel)
 
@@ -817,9 +725,6 @@ factory.register_dataset_model(RamsarModel)
 class SiteOfSpecialScientificInterestModel(GeographyDatasetModel):
     dataset_name = "site-of-special-scientific-interest"
 
-    def __init__(self, session, data: dict):
-        GeographyDatasetModel.__init__(self, session, data)
-
 
 factory.register_dataset_model(SiteOfSpecialScientificInterestModel)
 
@@ -827,17 +732,12 @@ factory.register_dataset_model(SiteOfSpecialScientificInterestModel)
 class OpenSpaceModel(GeographyDatasetModel):
     dataset_name = "open-space"
 
-    def __init__(self, session, data: dict):
-        GeographyDatasetModel.__init__(self, session, data)
-
 
 factory.register_dataset_model(OpenSpaceModel)
 
+
 class BrownfieldSiteModel(GeographyDatasetModel):
     dataset_name = "brownfield-site"
 
-    def __init__(self, session, data: dict):
-        GeographyDatasetModel.__init__(self, session, data)
-
 
 factory.register_dataset_model(BrownfieldSiteModel)
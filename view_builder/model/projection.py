@@ -0,0 +1,72 @@
+from collections import namedtuple
+from datetime import date
+
+# A table the model maps each entry onto. By default every column is read from
+# the entry key of the same name; `sources` overrides that with an ordered list
+# of keys to try, and `constants` are set on every row. Values of the form
+# "{attribute}" are replaced with that attribute of the model class when the
+# projection is compiled, e.g. "{dataset_name}".
+Projection = namedtuple(
+    "Projection", ["table", "sources", "constants"], defaults=[{}, {}]
+)
+
+
+def _resolve(value, context):
+    if isinstance(value, str) and value.startswith("{") and value.endswith("}"):
+        return getattr(context, value[1:-1])
+    return value
+
+
+def compile_projection(projections, date_fields=(), list_fields=None, context=None):
+    """
+    Compile a field mapping spec into a single function which maps an entry
+    onto the attributes a dataset model needs: a dict of column values for each
+    projection plus a list for each `;` separated list field.
+
+    Date fields are parsed in place, replacing `entry-date` with `entry_date`.
+    """
+    dates = tuple((field, field.replace("-", "_")) for field in date_fields)
+
+    plans = []
+    for name, projection in projections.items():
+        columns = tuple(
+            (
+                column,
+                tuple(
+                    _resolve(source, context)
+                    for source in projection.sources.get(column, (column,))
+                ),
+            )
+            for column in projection.table.__table__.columns.keys()
+        )
+        constants = {
+            column: _resolve(value, context)
+            for column, value in projection.constants.items()
+        }
+        plans.append((name, columns, constants))
+    plans = tuple(plans)
+
+    lists = tuple((list_fields or {}).items())
+
+    def project(data):
+        for field, key in dates:
+            if field in data:
+                data[key] = date.fromisoformat(data.pop(field))
+
+        attributes = {}
+        for name, columns, constants in plans:
+            row = {}
+            for column, sources in columns:
+                for source in sources:
+                    if source in data:
+                        row[column] = data[source]
+                        break
+            row.update(constants)
+            attributes[name] = row
+
+        for name, field in lists:
+            attributes[name] = data[field].split(";") if field in data else []
+
+        return attributes
+
+    return project
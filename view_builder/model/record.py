@@ -0,0 +1,113 @@
+from collections import namedtuple
+
+from view_builder.model.relationship import relation_columns
+from view_builder.model.table import (
+    Base,
+    Entity,
+    GeographyMetric,
+    Metric,
+    RelationshipStaging,
+)
+
+
+class Record:
+    """
+    A row for one of the view model's tables as a plain named tuple, without
+    the instrumentation and relationship state of an ORM instance, for builds
+    that only insert. Records are picklable, so can be passed between processes.
+    """
+
+    __slots__ = ()
+
+    def to_orm(self):
+        return self.orm_class(**self._asdict())
+
+
+def record_class(orm_class):
+    columns = orm_class.__table__.columns.keys()
+    name = orm_class.__name__ + "Record"
+    row = namedtuple(name, columns, defaults=(None,) * len(columns), module=__name__)
+    return type(
+        name,
+        (row, Record),
+        {"__slots__": (), "__module__": __name__, "orm_class": orm_class},
+    )
+
+
+RECORDS = {
+    mapper.class_: record_class(mapper.class_) for mapper in Base.registry.mappers
+}
+
+# pickle finds record classes by name in this module, e.g. GeographyRecord
+globals().update({cls.__name__: cls for cls in RECORDS.values()})
+
+
+class OrmTarget:
+    """
+    Builds the rows a dataset model maps an entry onto as linked ORM instances
+    """
+
+    def item(self, orm_class, values, entity_values):
+        """
+        The entity's row in its typology's table, and the objects to write,
+        starting with that row
+        """
+        item = orm_class(**values, entity_rel=Entity(**entity_values))
+        return item, [item]
+
+    def join(self, relation, from_item, to_item):
+        return relation.join_class(
+            **{relation.from_attr: from_item, relation.to_attr: to_item}
+        )
+
+    def staging(self, **values):
+        return RelationshipStaging(**values)
+
+    def update(self, item, **values):
+        for name, value in values.items():
+            setattr(item, name, value)
+        return item
+
+    def metric(self, geography, field, value):
+        return [
+            GeographyMetric(
+                geography=geography, metric=Metric(field=field, value=value)
+            )
+        ]
+
+
+class RecordTarget:
+    """
+    Builds the rows a dataset model maps an entry onto as records, related by
+    key rather than by reference.
+
+    A metric's id is only known once written, so its geography_metric record
+    is left without a metric_id, for the writer to fill in with the id of the
+    metric written before it.
+    """
+
+    def item(self, orm_class, values, entity_values):
+        item = RECORDS[orm_class](**values)
+        return item, [item, RECORDS[Entity](**entity_values)]
+
+    def join(self, relation, from_item, to_item):
+        from_column, to_column = relation_columns(relation)
+        return RECORDS[relation.join_class](
+            **{from_column: from_item.entity, to_column: to_item.entity}
+        )
+
+    def staging(self, **values):
+        return RECORDS[RelationshipStaging](**values)
+
+    def update(self, item, **values):
+        return item._replace(**values)
+
+    def metric(self, geography, field, value):
+        return [
+            RECORDS[Metric](field=field, value=value),
+            RECORDS[GeographyMetric](geography_id=geography.entity),
+        ]
+
+
+ORM = OrmTarget()
+RECORD = RecordTarget()
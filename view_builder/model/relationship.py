@@ -0,0 +1,62 @@
+from collections import namedtuple
+from view_builder.model.table import (
+    DocumentCategory,
+    DocumentGeography,
+    DocumentOrganisation,
+    GeographyCategory,
+    OrganisationGeography,
+    PolicyCategory,
+    PolicyDocument,
+    PolicyGeography,
+    PolicyOrganisation,
+)
+
+# A relationship a dataset model forms from the entity it is mapping
+# (`from_attr` of the join class) to an item found by reference (`to_attr`).
+# `target` names how the reference is looked up, see TARGETS.
+Relation = namedtuple("Relation", ["join_class", "from_attr", "to_attr", "target"])
+
+RELATIONS = {
+    "policy_category": Relation(PolicyCategory, "policy", "category", "category"),
+    "policy_organisation": Relation(
+        PolicyOrganisation, "policy", "organisation", "organisation"
+    ),
+    "policy_geography": Relation(PolicyGeography, "policy", "geography", "geography"),
+    "document_category": Relation(DocumentCategory, "document", "category", "category"),
+    "policy_document": Relation(PolicyDocument, "document", "policy", "policy"),
+    "document_organisation": Relation(
+        DocumentOrganisation, "document", "organisation", "organisation"
+    ),
+    "document_geography": Relation(
+        DocumentGeography, "document", "geography", "geography"
+    ),
+    # geographies referenced by entity number rather than by code
+    "document_geography_entity": Relation(
+        DocumentGeography, "document", "geography", "entity"
+    ),
+    "geography_category": Relation(
+        GeographyCategory, "geography", "category", "category"
+    ),
+    "organisation_geography": Relation(
+        OrganisationGeography, "geography", "organisation", "organisation"
+    ),
+}
+
+# SQL join from a relationship_staging row (s) to the entity it references (t)
+TARGETS = {
+    "category": "category AS t ON t.category = s.reference AND t.type = s.reference_type",
+    "organisation": "organisation AS t ON t.organisation = s.reference",
+    "geography": "geography AS t ON t.geography = s.reference",
+    "policy": "policy AS t ON t.policy = s.reference",
+    "entity": "geography AS t ON t.entity = CAST(s.reference AS INTEGER)",
+}
+
+
+def relation_columns(relation):
+    """
+    The (from, to) foreign key columns of a relation's join table
+    """
+    relationships = relation.join_class.__mapper__.relationships
+    (from_column,) = relationships[relation.from_attr].local_columns
+    (to_column,) = relationships[relation.to_attr].local_columns
+    return from_column.name, to_column.name
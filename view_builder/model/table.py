@@ -1,21 +1,29 @@
 from sqlalchemy.orm import declarative_base, relationship
 from sqlalchemy import (
+    Boolean,
     ForeignKey,
     Column,
     Integer,
     String,
     Date,
+    DateTime,
+    Float,
+    Index,
     UniqueConstraint,
 )
 
 Base = declarative_base()
 
+# Primary keys aren't given their own index: single column integer keys are the
+# rowid, and the join tables are stored WITHOUT ROWID clustered on their
+# composite key, with a second index for looking them up from the other side.
+
 
 class Entity(Base):
     __tablename__ = "entity"
     dl_type = None
-    entity = Column(Integer, primary_key=True, index=True)
-    dataset = Column(String)
+    entity = Column(Integer, primary_key=True)
+    dataset = Column(String, index=True)
     typology = Column(String)
     prefix = Column(String)
 
@@ -34,12 +42,12 @@ class Entity(Base):
 class PolicyCategory(Base):
     __tablename__ = "policy_category"
     dl_type = "join"
-    policy_id = Column(
-        Integer, ForeignKey("policy.entity"), primary_key=True, index=True
-    )
-    category_id = Column(
-        Integer, ForeignKey("category.entity"), primary_key=True, index=True
+    __table_args__ = (
+        Index("ix_policy_category_category_id", "category_id", "policy_id"),
+        {"sqlite_with_rowid": False},
     )
+    policy_id = Column(Integer, ForeignKey("policy.entity"), primary_key=True)
+    category_id = Column(Integer, ForeignKey("category.entity"), primary_key=True)
     category = relationship("Category", back_populates="policies")
     policy = relationship("Policy", back_populates="categories")
 
@@ -47,12 +55,12 @@ class PolicyCategory(Base):
 class DocumentCategory(Base):
     __tablename__ = "document_category"
     dl_type = "join"
-    document_id = Column(
-        Integer, ForeignKey("document.entity"), primary_key=True, index=True
-    )
-    category_id = Column(
-        Integer, ForeignKey("category.entity"), primary_key=True, index=True
+    __table_args__ = (
+        Index("ix_document_category_category_id", "category_id", "document_id"),
+        {"sqlite_with_rowid": False},
     )
+    document_id = Column(Integer, ForeignKey("document.entity"), primary_key=True)
+    category_id = Column(Integer, ForeignKey("category.entity"), primary_key=True)
     document = relationship("Document", back_populates="categories")
     category = relationship("Category", back_populates="documents")
 
@@ -60,8 +68,8 @@ class DocumentCategory(Base):
 class Category(Base):
     __tablename__ = "category"
     dl_type = "schema"
-    entity = Column(Integer, ForeignKey("entity.entity"), primary_key=True, index=True)
-    category = Column(String, index=True)
+    entity = Column(Integer, ForeignKey("entity.entity"), primary_key=True)
+    category = Column(String)
     type = Column(String, index=True)
     reference = Column(String)
     name = Column(String)
@@ -85,7 +93,7 @@ class Category(Base):
 class Organisation(Base):
     __tablename__ = "organisation"
     dl_type = "schema"
-    entity = Column(Integer, ForeignKey("entity.entity"), primary_key=True, index=True)
+    entity = Column(Integer, ForeignKey("entity.entity"), primary_key=True)
     prefix = Column(String)
     organisation = Column(String, index=True, unique=True)
     reference = Column(String)
@@ -118,7 +126,7 @@ class Metric(Base):
 class Geography(Base):
     __tablename__ = "geography"
     dl_type = "schema"
-    entity = Column(Integer, ForeignKey("entity.entity"), primary_key=True, index=True)
+    entity = Column(Integer, ForeignKey("entity.entity"), primary_key=True)
     geography = Column(String, index=True)
     geometry = Column(String)
     point = Column(String)
@@ -126,6 +134,9 @@ class Geography(Base):
     notes = Column(String)
     documentation_url = Column(String)
     type = Column(String, index=True)
+    properties = Column(String)
+    # Hilbert curve key of the feature's centre, set by finalise --cluster
+    hilbert = Column(Integer)
     entry_date = Column(Date)
     start_date = Column(Date)
     end_date = Column(Date)
@@ -146,12 +157,16 @@ class Geography(Base):
 class OrganisationGeography(Base):
     __tablename__ = "organisation_geography"
     dl_type = "join"
-    organisation_id = Column(
-        Integer, ForeignKey("organisation.entity"), primary_key=True, index=True
+    __table_args__ = (
+        Index(
+            "ix_organisation_geography_geography_id", "geography_id", "organisation_id"
+        ),
+        {"sqlite_with_rowid": False},
     )
-    geography_id = Column(
-        Integer, ForeignKey("geography.entity"), primary_key=True, index=True
+    organisation_id = Column(
+        Integer, ForeignKey("organisation.entity"), primary_key=True
     )
+    geography_id = Column(Integer, ForeignKey("geography.entity"), primary_key=True)
     entry_date = Column(Date)
     start_date = Column(Date)
     end_date = Column(Date)
@@ -162,12 +177,12 @@ class OrganisationGeography(Base):
 class GeographyCategory(Base):
     __tablename__ = "geography_category"
     dl_type = "join"
-    category_id = Column(
-        Integer, ForeignKey("category.entity"), primary_key=True, index=True
-    )
-    geography_id = Column(
-        Integer, ForeignKey("geography.entity"), primary_key=True, index=True
+    __table_args__ = (
+        Index("ix_geography_category_geography_id", "geography_id", "category_id"),
+        {"sqlite_with_rowid": False},
     )
+    category_id = Column(Integer, ForeignKey("category.entity"), primary_key=True)
+    geography_id = Column(Integer, ForeignKey("geography.entity"), primary_key=True)
     geography = relationship("Geography", back_populates="categories")
     category = relationship("Category", back_populates="geographies")
 
@@ -175,10 +190,12 @@ class GeographyCategory(Base):
 class GeographyMetric(Base):
     __tablename__ = "geography_metric"
     dl_type = "join"
-    metric_id = Column(Integer, ForeignKey("metric.id"), primary_key=True, index=True)
-    geography_id = Column(
-        Integer, ForeignKey("geography.entity"), primary_key=True, index=True
+    __table_args__ = (
+        Index("ix_geography_metric_geography_id", "geography_id", "metric_id"),
+        {"sqlite_with_rowid": False},
     )
+    metric_id = Column(Integer, ForeignKey("metric.id"), primary_key=True)
+    geography_id = Column(Integer, ForeignKey("geography.entity"), primary_key=True)
     geography = relationship("Geography", back_populates="metrics")
     metric = relationship("Metric", back_populates="geography")
 
@@ -186,12 +203,12 @@ class GeographyMetric(Base):
 class PolicyDocument(Base):
     __tablename__ = "policy_document"
     dl_type = "join"
-    policy_id = Column(
-        Integer, ForeignKey("policy.entity"), primary_key=True, index=True
-    )
-    document_id = Column(
-        Integer, ForeignKey("document.entity"), primary_key=True, index=True
+    __table_args__ = (
+        Index("ix_policy_document_document_id", "document_id", "policy_id"),
+        {"sqlite_with_rowid": False},
     )
+    policy_id = Column(Integer, ForeignKey("policy.entity"), primary_key=True)
+    document_id = Column(Integer, ForeignKey("document.entity"), primary_key=True)
     document = relationship("Document", back_populates="policies")
     policy = relationship("Policy", back_populates="documents")
 
@@ -199,7 +216,7 @@ class PolicyDocument(Base):
 class Policy(Base):
     __tablename__ = "policy"
     dl_type = "schema"
-    entity = Column(Integer, ForeignKey("entity.entity"), primary_key=True, index=True)
+    entity = Column(Integer, ForeignKey("entity.entity"), primary_key=True)
     policy = Column(String, index=True, unique=True)
     reference = Column(String)
     name = Column(String)
@@ -224,12 +241,12 @@ class Policy(Base):
 class PolicyGeography(Base):
     __tablename__ = "policy_geography"
     dl_type = "join"
-    policy_id = Column(
-        Integer, ForeignKey("policy.entity"), primary_key=True, index=True
-    )
-    geography_id = Column(
-        Integer, ForeignKey("geography.entity"), primary_key=True, index=True
+    __table_args__ = (
+        Index("ix_policy_geography_geography_id", "geography_id", "policy_id"),
+        {"sqlite_with_rowid": False},
     )
+    policy_id = Column(Integer, ForeignKey("policy.entity"), primary_key=True)
+    geography_id = Column(Integer, ForeignKey("geography.entity"), primary_key=True)
     entry_date = Column(Date)
     start_date = Column(Date)
     end_date = Column(Date)
@@ -240,11 +257,13 @@ class PolicyGeography(Base):
 class PolicyOrganisation(Base):
     __tablename__ = "policy_organisation"
     dl_type = "join"
-    policy_id = Column(
-        Integer, ForeignKey("policy.entity"), primary_key=True, index=True
+    __table_args__ = (
+        Index("ix_policy_organisation_organisation_id", "organisation_id", "policy_id"),
+        {"sqlite_with_rowid": False},
     )
+    policy_id = Column(Integer, ForeignKey("policy.entity"), primary_key=True)
     organisation_id = Column(
-        Integer, ForeignKey("organisation.entity"), primary_key=True, index=True
+        Integer, ForeignKey("organisation.entity"), primary_key=True
     )
     entry_date = Column(Date)
     start_date = Column(Date)
@@ -256,7 +275,7 @@ class PolicyOrganisation(Base):
 class Document(Base):
     __tablename__ = "document"
     dl_type = "schema"
-    entity = Column(Integer, ForeignKey("entity.entity"), primary_key=True, index=True)
+    entity = Column(Integer, ForeignKey("entity.entity"), primary_key=True)
     prefix = Column(String)
     document = Column(String, index=True)
     reference = Column(String)
@@ -283,12 +302,12 @@ class Document(Base):
 class DocumentGeography(Base):
     __tablename__ = "document_geography"
     dl_type = "join"
-    document_id = Column(
-        Integer, ForeignKey("document.entity"), primary_key=True, index=True
-    )
-    geography_id = Column(
-        Integer, ForeignKey("geography.entity"), primary_key=True, index=True
+    __table_args__ = (
+        Index("ix_document_geography_geography_id", "geography_id", "document_id"),
+        {"sqlite_with_rowid": False},
     )
+    document_id = Column(Integer, ForeignKey("document.entity"), primary_key=True)
+    geography_id = Column(Integer, ForeignKey("geography.entity"), primary_key=True)
     entry_date = Column(Date)
     start_date = Column(Date)
     end_date = Column(Date)
@@ -299,14 +318,129 @@ class DocumentGeography(Base):
 class DocumentOrganisation(Base):
     __tablename__ = "document_organisation"
     dl_type = "join"
-    document_id = Column(
-        Integer, ForeignKey("document.entity"), primary_key=True, index=True
+    __table_args__ = (
+        Index(
+            "ix_document_organisation_organisation_id", "organisation_id", "document_id"
+        ),
+        {"sqlite_with_rowid": False},
     )
+    document_id = Column(Integer, ForeignKey("document.entity"), primary_key=True)
     organisation_id = Column(
-        Integer, ForeignKey("organisation.entity"), primary_key=True, index=True
+        Integer, ForeignKey("organisation.entity"), primary_key=True
     )
     entry_date = Column(Date)
     start_date = Column(Date)
     end_date = Column(Date)
     organisation = relationship("Organisation", back_populates="documents")
     document = relationship("Document", back_populates="organisations")
+
+
+class RelationshipStaging(Base):
+    __tablename__ = "relationship_staging"
+    dl_type = None
+    id = Column(Integer, primary_key=True)
+    from_entity = Column(Integer, index=True)
+    relation_type = Column(String, index=True)
+    reference_type = Column(String)
+    reference = Column(String)
+
+    def __repr__(self):
+        return "RelationshipStaging({})".format(
+            {key: getattr(self, key) for key in self.__table__.columns.keys()}
+        )
+
+
+class BrokenRelationship(Base):
+    __tablename__ = "broken_relationship"
+    dl_type = None
+    id = Column(Integer, primary_key=True)
+    relation_type = Column(String, index=True)
+    reference_type = Column(String)
+    reference = Column(String)
+    entity_count = Column(Integer)
+
+
+class GeographyContainment(Base):
+    __tablename__ = "geography_containment"
+    dl_type = "join"
+    __table_args__ = (
+        Index("ix_geography_containment_geography_id", "geography_id", "container_id"),
+        {"sqlite_with_rowid": False},
+    )
+    container_id = Column(Integer, ForeignKey("geography.entity"), primary_key=True)
+    geography_id = Column(Integer, ForeignKey("geography.entity"), primary_key=True)
+    # "within" the container, or only "intersects" it
+    relation = Column(String)
+
+
+class GeographyPart(Base):
+    __tablename__ = "geography_part"
+    dl_type = None
+    # also the id of the part's bounds in the geography_part_rtree R*Tree
+    id = Column(Integer, primary_key=True)
+    geography_id = Column(Integer, ForeignKey("geography.entity"), index=True)
+    geometry = Column(String)
+    vertex_count = Column(Integer)
+
+
+class DatasetStats(Base):
+    __tablename__ = "dataset_stats"
+    dl_type = None
+    dataset = Column(String, primary_key=True)
+    typology = Column(String)
+    entity_count = Column(Integer)
+    # None until finalise resolves relationships staged by a deferred build
+    broken_relationship_count = Column(Integer)
+    minx = Column(Float)
+    miny = Column(Float)
+    maxx = Column(Float)
+    maxy = Column(Float)
+    vertex_count = Column(Integer)
+    # decimal places of the dataset's coordinates, see GeographyDatasetModel
+    coordinate_precision = Column(Integer)
+    min_entry_date = Column(Date)
+    max_entry_date = Column(Date)
+    min_start_date = Column(Date)
+    max_start_date = Column(Date)
+    min_end_date = Column(Date)
+    max_end_date = Column(Date)
+    build_duration = Column(Float)
+
+    def __repr__(self):
+        return "DatasetStats({})".format(
+            {key: getattr(self, key) for key in self.__table__.columns.keys()}
+        )
+
+
+class BuildState(Base):
+    __tablename__ = "build_state"
+    dl_type = None
+    dataset = Column(String, primary_key=True)
+    # entities are built in order, so all up to and including this one are written
+    last_entity = Column(Integer)
+    entity_count = Column(Integer)
+    complete = Column(Boolean, default=False)
+
+    def __repr__(self):
+        return "BuildState({})".format(
+            {key: getattr(self, key) for key in self.__table__.columns.keys()}
+        )
+
+
+class BuildManifest(Base):
+    __tablename__ = "build_manifest"
+    dl_type = None
+    dataset = Column(String, primary_key=True)
+    input_path = Column(String)
+    # SHA-256 of the input file the dataset was last built from
+    checksum = Column(String)
+    model_version = Column(String)
+    entity_count = Column(Integer)
+    # JSON object of the number of rows written to each table
+    row_counts = Column(String)
+    built_at = Column(DateTime)
+
+    def __repr__(self):
+        return "BuildManifest({})".format(
+            {key: getattr(self, key) for key in self.__table__.columns.keys()}
+        )
@@ -0,0 +1,74 @@
+import logging
+import os
+import sqlite3
+import time
+
+from view_builder.queries import QUERIES
+from view_builder.spatialite import register_functions
+
+logger = logging.getLogger("optimise")
+
+DEFAULT_PAGE_SIZE = 8192
+
+
+def time_queries(conn, queries, repeat=3):
+    """
+    The best of `repeat` timings for each query, in seconds, or None where the
+    query can't run against this database, e.g. before the post-process
+    """
+    timings = {}
+    for name, sql in queries.items():
+        try:
+            best = None
+            for _ in range(repeat):
+                start = time.perf_counter()
+                conn.execute(sql).fetchall()
+                elapsed = time.perf_counter() - start
+                best = elapsed if best is None else min(best, elapsed)
+            timings[name] = best
+        except sqlite3.OperationalError as e:
+            logger.info("skipping query %s: %s", name, e)
+            timings[name] = None
+    return timings
+
+
+def optimise_view_model(path, page_size=DEFAULT_PAGE_SIZE, queries=QUERIES):
+    """
+    Rewrite the view model for reading: compact it with the given page size,
+    gather query planner statistics and check its integrity.
+
+    Returns a report of the file size and sample query timings before and after.
+    """
+    size_before = os.path.getsize(path)
+    conn = sqlite3.connect(path, isolation_level=None)
+    register_functions(conn)
+    try:
+        timings_before = time_queries(conn, queries)
+
+        # the page size can only change in rollback journal mode, which is also
+        # what a published, read-only copy should be in
+        conn.execute("PRAGMA journal_mode = DELETE")
+        conn.execute("PRAGMA page_size = {:d}".format(page_size))
+        conn.execute("VACUUM")
+        conn.execute("ANALYZE")
+        conn.execute("PRAGMA optimize")
+
+        problems = [row[0] for row in conn.execute("PRAGMA integrity_check")]
+        if problems != ["ok"]:
+            raise ValueError("Integrity check failed: {}".format("; ".join(problems)))
+
+        timings_after = time_queries(conn, queries)
+        page_size = conn.execute("PRAGMA page_size").fetchone()[0]
+    finally:
+        conn.close()
+
+    return {
+        "path": path,
+        "page_size": page_size,
+        "size_before": size_before,
+        "size_after": os.path.getsize(path),
+        "queries": {
+            name: {"before": timings_before[name], "after": timings_after[name]}
+            for name in queries
+        },
+    }
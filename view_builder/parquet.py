@@ -0,0 +1,388 @@
+import json
+import logging
+import os
+import shutil
+from itertools import groupby
+from operator import itemgetter
+
+import numpy as np
+import pyarrow as pa
+import pyarrow.parquet as pq
+import shapely
+from sqlalchemy import Boolean, Date, Float, Integer
+
+from view_builder.model.table import Base
+from view_builder.pool import chunks
+from view_builder.sqlite import connect_read_only
+
+logger = logging.getLogger("parquet")
+
+ROW_GROUP_SIZE = 10000
+
+# written whole, for the relationships to join to
+REFERENCE_TABLES = ["organisation", "category", "metric"]
+
+# written in a partition for each type of geography they relate
+GEOGRAPHY_TABLES = [
+    "organisation_geography",
+    "geography_category",
+    "geography_metric",
+    "geography_containment",
+    "document_geography",
+    "policy_geography",
+]
+
+# the geography columns written as they are, alongside the WKB geometry, its
+# bounds and the flattened properties
+GEOGRAPHY_COLUMNS = [
+    "entity",
+    "geography",
+    "name",
+    "notes",
+    "documentation_url",
+    "entry_date",
+    "start_date",
+    "end_date",
+]
+
+ARROW_TYPES = [
+    (Boolean, pa.bool_()),
+    (Integer, pa.int64()),
+    (Float, pa.float64()),
+    (Date, pa.date32()),
+]
+
+BBOX_FIELDS = ["xmin", "ymin", "xmax", "ymax"]
+
+BBOX_TYPE = pa.struct([(name, pa.float64()) for name in BBOX_FIELDS])
+
+# GeoParquet's names for shapely's geometry type ids
+GEOMETRY_TYPES = {
+    0: "Point",
+    1: "LineString",
+    3: "Polygon",
+    4: "MultiPoint",
+    5: "MultiLineString",
+    6: "MultiPolygon",
+    7: "GeometryCollection",
+}
+
+
+def arrow_type(column):
+    for sql_type, type in ARROW_TYPES:
+        if isinstance(column.type, sql_type):
+            return type
+    return pa.string()
+
+
+def column_array(values, type):
+    if type == pa.date32():
+        # SQLite holds dates as ISO strings
+        return pa.array(values, pa.string()).cast(type)
+    if type == pa.bool_():
+        values = [None if value is None else bool(value) for value in values]
+    return pa.array(values, type)
+
+
+def table_path(directory, table, type=None):
+    # partitioned Hive style, so readers can skip the types they don't want
+    if type is None:
+        return os.path.join(directory, table, "part-0.parquet")
+    return os.path.join(directory, table, "type={}".format(type), "part-0.parquet")
+
+
+def write_batches(path, schema, batches, metadata=None):
+    """
+    Write each record batch as a row group of a Parquet file, returns the
+    number of rows. metadata is called once the batches are written for any
+    key value metadata that depends on them.
+    """
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    count = 0
+    with pq.ParquetWriter(path, schema) as writer:
+        for batch in batches:
+            writer.write_batch(batch)
+            count += batch.num_rows
+        if metadata:
+            writer.add_key_value_metadata(metadata())
+    return count
+
+
+def table_batches(schema, rows, row_group_size):
+    for chunk in chunks(rows, row_group_size):
+        columns = zip(*chunk)
+        yield pa.record_batch(
+            [
+                column_array(values, field.type)
+                for values, field in zip(columns, schema)
+            ],
+            schema=schema,
+        )
+
+
+def write_reference_table(conn, directory, name, row_group_size=ROW_GROUP_SIZE):
+    table = Base.metadata.tables[name]
+    schema = pa.schema([(column.name, arrow_type(column)) for column in table.columns])
+    sql = "SELECT {} FROM {} ORDER BY rowid".format(", ".join(schema.names), name)
+    return write_batches(
+        table_path(directory, name),
+        schema,
+        table_batches(schema, conn.execute(sql), row_group_size),
+    )
+
+
+def write_geography_table(
+    conn, directory, name, types=None, row_group_size=ROW_GROUP_SIZE
+):
+    """
+    Write a table relating geographies in a partition for each type of
+    geography, returns the number of rows written of each type
+    """
+    table = Base.metadata.tables[name]
+    schema = pa.schema([(column.name, arrow_type(column)) for column in table.columns])
+    sql = """
+        SELECT g.type, {}
+        FROM {} AS r
+        JOIN geography AS g ON g.entity = r.geography_id
+        """.format(", ".join("r." + column for column in schema.names), name)
+    sql, params = where_types(sql, "g.type", types)
+    counts = {}
+    cursor = conn.execute(sql + " ORDER BY g.type", params)
+    for type, rows in groupby(cursor, itemgetter(0)):
+        counts[type] = write_batches(
+            table_path(directory, name, type),
+            schema,
+            table_batches(schema, (row[1:] for row in rows), row_group_size),
+        )
+    return counts
+
+
+def where_types(sql, column, types):
+    if not types:
+        return sql + " WHERE {} IS NOT NULL".format(column), []
+    return (
+        sql + " WHERE {} IN ({})".format(column, ", ".join("?" for _ in types)),
+        list(types),
+    )
+
+
+def property_type(value_types):
+    """
+    The Arrow type of a property from the JSON types of its values
+    """
+    value_types = set(value_types) - {"null"}
+    if value_types and value_types <= {"integer"}:
+        return pa.int64()
+    if value_types and value_types <= {"integer", "real"}:
+        return pa.float64()
+    if value_types and value_types <= {"true", "false"}:
+        return pa.bool_()
+    return pa.string()
+
+
+def property_fields(conn, type):
+    """
+    The columns the properties of a type of geography flatten into, named after
+    the property, leaving out those already columns of geography. A property
+    whose name is taken by another, such as flood-zone by flood_zone, is given
+    a numbered suffix.
+    """
+    sql = """
+        SELECT p.key, group_concat(DISTINCT p.type)
+        FROM geography AS g, json_each(g.properties) AS p
+        WHERE g.type = ?
+        GROUP BY p.key
+        ORDER BY p.key
+        """
+    reserved = set(GEOGRAPHY_COLUMNS) | {"type", "geometry", "bbox"}
+    properties = [
+        (key, key.replace("-", "_"), value_types)
+        for key, value_types in conn.execute(sql, (type,))
+    ]
+    properties = [row for row in properties if row[1] not in reserved]
+
+    # properties already named as columns keep their names
+    names = {key: name for key, name, _ in properties if key == name}
+    taken = set(names.values()) | reserved
+    for key, name, _ in properties:
+        if key in names:
+            continue
+        suffix = 1
+        while name in taken:
+            suffix += 1
+            name = "{}_{:d}".format(key.replace("-", "_"), suffix)
+        names[key] = name
+        taken.add(name)
+
+    return [
+        (key, pa.field(names[key], property_type(value_types.split(","))))
+        for key, _, value_types in properties
+    ]
+
+
+def property_value(value, type):
+    if value is None or type != pa.string():
+        return value
+    if isinstance(value, (dict, list)):
+        return json.dumps(value)
+    return str(value)
+
+
+class Extent:
+    """
+    The bounds and geometry types of the geometries written, for the GeoParquet
+    metadata
+    """
+
+    def __init__(self):
+        self.bbox = None
+        self.geometry_types = set()
+
+    def add(self, geometries, bounds):
+        present = ~np.isnan(bounds[:, 0])
+        if not present.any():
+            return
+        bounds = bounds[present]
+        bbox = [
+            *bounds[:, :2].min(axis=0).tolist(),
+            *bounds[:, 2:].max(axis=0).tolist(),
+        ]
+        if self.bbox:
+            bbox = [
+                min(self.bbox[0], bbox[0]),
+                min(self.bbox[1], bbox[1]),
+                max(self.bbox[2], bbox[2]),
+                max(self.bbox[3], bbox[3]),
+            ]
+        self.bbox = bbox
+        for type_id in np.unique(shapely.get_type_id(geometries[present])):
+            if int(type_id) in GEOMETRY_TYPES:
+                self.geometry_types.add(GEOMETRY_TYPES[int(type_id)])
+
+    def geo_metadata(self):
+        # see https://geoparquet.org/releases/v1.1.0/, coordinates are
+        # longitude and latitude, GeoParquet's default CRS
+        column = {
+            "encoding": "WKB",
+            "geometry_types": sorted(self.geometry_types),
+            "covering": {
+                "bbox": {name: ["bbox", name] for name in BBOX_FIELDS},
+            },
+        }
+        if self.bbox:
+            column["bbox"] = self.bbox
+        metadata = {
+            "version": "1.1.0",
+            "primary_column": "geometry",
+            "columns": {"geometry": column},
+        }
+        return {"geo": json.dumps(metadata)}
+
+
+def geography_schema(fields):
+    table = Base.metadata.tables["geography"]
+    return pa.schema(
+        [(name, arrow_type(table.c[name])) for name in GEOGRAPHY_COLUMNS]
+        + [("geometry", pa.binary()), ("bbox", BBOX_TYPE)]
+        + [field for _, field in fields]
+    )
+
+
+def geography_batches(schema, fields, rows, extent, row_group_size):
+    """
+    Record batches of geographies, each converting a row group's geometries
+    from WKT to WKB and finding their bounds in a single call
+    """
+    for chunk in chunks(rows, row_group_size):
+        columns = list(zip(*chunk))
+        geometries = shapely.from_wkt(
+            np.array(columns[-2], dtype=object), on_invalid="ignore"
+        )
+        bounds = shapely.bounds(geometries)
+        missing = np.isnan(bounds[:, 0])
+        extent.add(geometries, bounds)
+
+        arrays = [
+            column_array(values, schema.field(name).type)
+            for values, name in zip(columns, GEOGRAPHY_COLUMNS)
+        ]
+        arrays.append(pa.array(shapely.to_wkb(geometries), pa.binary()))
+        arrays.append(
+            pa.StructArray.from_arrays(
+                [pa.array(bounds[:, i], mask=missing) for i in range(4)],
+                fields=list(BBOX_TYPE),
+                mask=pa.array(missing),
+            )
+        )
+
+        properties = [json.loads(value) if value else {} for value in columns[-1]]
+        for key, field in fields:
+            arrays.append(
+                column_array(
+                    [property_value(p.get(key), field.type) for p in properties],
+                    field.type,
+                )
+            )
+        yield pa.record_batch(arrays, schema=schema)
+
+
+def write_geographies(conn, directory, types=None, row_group_size=ROW_GROUP_SIZE):
+    """
+    Write the geographies in a GeoParquet partition for each type, returns the
+    number written of each type
+    """
+    sql = """
+        SELECT type, {}, coalesce(nullif(geometry, ''), point), properties
+        FROM geography
+        """.format(", ".join(GEOGRAPHY_COLUMNS))
+    sql, params = where_types(sql, "type", types)
+    counts = {}
+    # in the order of geography's type index, so without a sort
+    cursor = conn.execute(sql + " ORDER BY type, entity", params)
+    for type, rows in groupby(cursor, itemgetter(0)):
+        fields = property_fields(conn, type)
+        schema = geography_schema(fields)
+        extent = Extent()
+        counts[type] = write_batches(
+            table_path(directory, "geography", type),
+            schema,
+            geography_batches(
+                schema, fields, (row[1:] for row in rows), extent, row_group_size
+            ),
+            extent.geo_metadata,
+        )
+    return counts
+
+
+def export_parquet(path, directory, types=None, row_group_size=ROW_GROUP_SIZE):
+    """
+    Write the geographies, their relationships and the organisations,
+    categories and metrics they relate to as Parquet files in directory, a
+    subdirectory for each table, with those of geographies partitioned by type.
+
+    Rows are streamed from the view model a row group at a time, so memory use
+    doesn't grow with the size of the view model. Returns the number of rows
+    written to each table.
+    """
+    counts = {}
+    conn = connect_read_only(path, immutable=False)
+    try:
+        for name in ["geography"] + GEOGRAPHY_TABLES + REFERENCE_TABLES:
+            # the export owns these, so a type no longer there doesn't linger
+            shutil.rmtree(os.path.join(directory, name), ignore_errors=True)
+
+        counts["geography"] = sum(
+            write_geographies(conn, directory, types, row_group_size).values()
+        )
+        for name in GEOGRAPHY_TABLES:
+            counts[name] = sum(
+                write_geography_table(
+                    conn, directory, name, types, row_group_size
+                ).values()
+            )
+        for name in REFERENCE_TABLES:
+            counts[name] = write_reference_table(conn, directory, name, row_group_size)
+    finally:
+        conn.close()
+    logger.info("exported %d geographies", counts["geography"])
+    return counts
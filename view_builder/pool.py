@@ -0,0 +1,62 @@
+from concurrent.futures import ProcessPoolExecutor
+from itertools import islice
+
+from view_builder.sqlite import connect_read_only
+
+_worker_conn = None
+
+
+def chunks(items, size):
+    """
+    Yield lists of up to size items, reading no more of items than that at a
+    time
+    """
+    items = iter(items)
+    while True:
+        chunk = list(islice(items, size))
+        if not chunk:
+            return
+        yield chunk
+
+
+def _init_worker(path):
+    global _worker_conn
+    _worker_conn = connect_read_only(path, immutable=False)
+
+
+def _close_worker():
+    global _worker_conn
+    _worker_conn.close()
+    _worker_conn = None
+
+
+def worker_connection():
+    """
+    The read-only connection to the view model of the worker a task is running
+    in, see map_in_workers
+    """
+    return _worker_conn
+
+
+def map_in_workers(function, path, tasks, workers=None):
+    """
+    Yield function's result for each task, in order, run in a pool of worker
+    processes, or in this one if there's a single worker. Each worker has its
+    own read-only connection to the view model at path, from
+    worker_connection.
+
+    Results are best collected in a temporary table rather than the view
+    model, so it isn't locked while the workers are reading it.
+    """
+    if workers == 1:
+        _init_worker(path)
+        try:
+            yield from map(function, tasks)
+        finally:
+            _close_worker()
+        return
+
+    with ProcessPoolExecutor(
+        workers, initializer=_init_worker, initargs=(path,)
+    ) as executor:
+        yield from executor.map(function, tasks)
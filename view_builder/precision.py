@@ -0,0 +1,44 @@
+def round_positions(positions, precision, drop_repeated=False):
+    """
+    A list of positions, each a list of numbers, rounded to precision decimal
+    places. With drop_repeated, any position that then repeats the one before
+    it is left out, unless that would leave too few for a ring.
+    """
+    rounded = [
+        [round(value, precision) for value in position] for position in positions
+    ]
+    if not drop_repeated:
+        return rounded
+    kept = [
+        position
+        for i, position in enumerate(rounded)
+        if i == 0 or position != rounded[i - 1]
+    ]
+    return kept if len(kept) >= min(len(rounded), 4) else rounded
+
+
+def round_coordinates(coordinates, precision, drop_repeated=False):
+    """
+    The coordinates of a GeoJSON geometry, a position or nested lists of them,
+    rounded as round_positions does
+    """
+    if coordinates and isinstance(coordinates[0], (int, float)):
+        return [round(value, precision) for value in coordinates]
+    if coordinates and coordinates[0] and isinstance(coordinates[0][0], (int, float)):
+        return round_positions(coordinates, precision, drop_repeated)
+    return [round_coordinates(part, precision, drop_repeated) for part in coordinates]
+
+
+def round_geometry(geometry, precision, drop_repeated=False):
+    """
+    Round the coordinates of a GeoJSON geometry, as a dict, in place, see
+    round_positions. Returns the geometry.
+    """
+    if "geometries" in geometry:
+        for part in geometry["geometries"]:
+            round_geometry(part, precision, drop_repeated)
+    elif "coordinates" in geometry:
+        geometry["coordinates"] = round_coordinates(
+            geometry["coordinates"], precision, drop_repeated
+        )
+    return geometry
@@ -0,0 +1,59 @@
+# Representative read queries against the view model, the lookups the
+# post-process, tile build and datasette pages make. Used to time the effect of
+# optimise and to check which indexes are in use.
+QUERIES = {
+    "geography-by-entity": """
+        SELECT * FROM geography
+        WHERE entity = (SELECT max(entity) FROM geography)
+    """,
+    "geography-by-reference": """
+        SELECT * FROM geography
+        WHERE geography = (SELECT max(geography) FROM geography)
+    """,
+    "geography-by-type": """
+        SELECT entity, name FROM geography
+        WHERE type = (SELECT max(type) FROM geography)
+    """,
+    "geography-organisation": """
+        SELECT o.organisation
+        FROM organisation_geography AS og
+        JOIN organisation AS o ON o.entity = og.organisation_id
+        WHERE og.geography_id = (SELECT max(entity) FROM geography)
+    """,
+    "organisation-geographies": """
+        SELECT g.entity, g.name
+        FROM organisation_geography AS og
+        JOIN geography AS g ON g.entity = og.geography_id
+        WHERE og.organisation_id = (SELECT max(organisation_id) FROM organisation_geography)
+    """,
+    "category-by-type": """
+        SELECT * FROM category
+        WHERE type = (SELECT max(type) FROM category)
+    """,
+    "policy-documents": """
+        SELECT d.entity, d.name
+        FROM policy_document AS pd
+        JOIN document AS d ON d.entity = pd.document_id
+        WHERE pd.policy_id = (SELECT max(policy_id) FROM policy_document)
+    """,
+    "document-geographies": """
+        SELECT g.entity, g.name
+        FROM document_geography AS dg
+        JOIN geography AS g ON g.entity = dg.geography_id
+        WHERE dg.document_id = (SELECT max(document_id) FROM document_geography)
+    """,
+    "geography-documents": """
+        SELECT dg.document_id
+        FROM document_geography AS dg
+        WHERE dg.geography_id = (SELECT max(geography_id) FROM document_geography)
+    """,
+    "geographies-in-container": """
+        SELECT gc.geography_id
+        FROM geography_containment AS gc
+        WHERE gc.container_id = (SELECT max(container_id) FROM geography_containment)
+    """,
+    "geography-geom-by-type": """
+        SELECT geojson_full FROM geography_geom
+        WHERE type = (SELECT max(type) FROM geography_geom)
+    """,
+}
@@ -0,0 +1,84 @@
+import logging
+
+logger = logging.getLogger("search")
+
+# The text columns of each table indexed for full-text search, the reference
+# columns first so an exact code still ranks highest
+SEARCH_COLUMNS = {
+    "geography": ["geography", "name", "notes"],
+    "document": ["document", "reference", "name", "description", "notes"],
+    "policy": ["policy", "reference", "name", "description", "notes"],
+    "category": ["category", "reference", "name"],
+    "organisation": ["organisation", "reference", "name"],
+}
+
+
+def search_table(table):
+    return "{}_fts".format(table)
+
+
+def create_search_index(conn, table, columns):
+    """
+    Create an external content FTS5 index over a table, so the text is stored
+    once, with triggers keeping it in sync with later writes to the table
+    """
+    fts = search_table(table)
+    column_list = ", ".join(columns)
+    new_values = ", ".join("new.{}".format(column) for column in columns)
+    old_values = ", ".join("old.{}".format(column) for column in columns)
+
+    for trigger in ["insert", "delete", "update"]:
+        conn.execute("DROP TRIGGER IF EXISTS {}_{}".format(fts, trigger))
+    conn.execute("DROP TABLE IF EXISTS {}".format(fts))
+
+    conn.execute(f"""
+        CREATE VIRTUAL TABLE {fts} USING fts5(
+            {column_list}, content='{table}', content_rowid='entity'
+        )
+        """)
+    conn.execute(f"""
+        CREATE TRIGGER {fts}_insert AFTER INSERT ON {table} BEGIN
+            INSERT INTO {fts} (rowid, {column_list})
+            VALUES (new.entity, {new_values});
+        END
+        """)
+    conn.execute(f"""
+        CREATE TRIGGER {fts}_delete AFTER DELETE ON {table} BEGIN
+            INSERT INTO {fts} ({fts}, rowid, {column_list})
+            VALUES ('delete', old.entity, {old_values});
+        END
+        """)
+    conn.execute(f"""
+        CREATE TRIGGER {fts}_update AFTER UPDATE OF {column_list} ON {table} BEGIN
+            INSERT INTO {fts} ({fts}, rowid, {column_list})
+            VALUES ('delete', old.entity, {old_values});
+            INSERT INTO {fts} (rowid, {column_list})
+            VALUES (new.entity, {new_values});
+        END
+        """)
+    conn.execute("INSERT INTO {0} ({0}) VALUES ('rebuild')".format(fts))
+    conn.execute("INSERT INTO {0} ({0}) VALUES ('optimize')".format(fts))
+
+
+def create_search_indexes(conn, search_columns=SEARCH_COLUMNS):
+    for table, columns in search_columns.items():
+        create_search_index(conn, table, columns)
+        logger.info("created full-text search index %s", search_table(table))
+
+
+def search(conn, text, tables=SEARCH_COLUMNS, limit=20):
+    """
+    The best matches for an FTS5 query across the given tables, as
+    (table, entity, name) tuples, best first
+    """
+    union = " UNION ALL ".join(f"""
+        SELECT '{table}' AS tbl, t.entity, t.name, rank
+        FROM {search_table(table)} AS f
+        JOIN {table} AS t ON t.entity = f.rowid
+        WHERE {search_table(table)} MATCH :text
+        """ for table in tables)
+    rows = conn.execute(
+        f"SELECT tbl, entity, name FROM ({union}) ORDER BY rank LIMIT :limit",
+        {"text": text, "limit": limit},
+    )
+    return rows.fetchall()
@@ -0,0 +1,282 @@
+import logging
+import os
+import sqlite3
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+from sqlalchemy import create_engine
+
+from view_builder.dataset_stats import ENTITY_CLASSES
+from view_builder.model.table import Base, Category, Organisation
+
+logger = logging.getLogger("shard")
+
+# copied into each shard before it's built, so the relationships to categories
+# and organisations resolve as they would in the view model
+REFERENCE_CLASSES = (Organisation, Category)
+
+# a seeded row matches the view model's when these columns do
+REFERENCE_KEYS = {
+    "organisation": ["entity", "organisation"],
+    "category": ["entity", "category", "type"],
+}
+
+# the rows of these tables belonging to the shard's own datasets, rather than
+# those seeded into it, are merged
+ENTITY_TABLES = ["entity"] + [cls.__tablename__ for cls in ENTITY_CLASSES]
+DATASET_TABLES = ["dataset_stats", "build_state", "build_manifest"]
+
+# surrogate keys, offset past those already in the view model when merged
+OFFSET_KEYS = {"metric": "id", "geography_metric": "metric_id"}
+
+# renumbered as they're merged, nothing refers to them
+RENUMBERED_KEYS = {"relationship_staging": "id"}
+
+# rebuilt by finalise, and by subdivide once the shards are merged
+SKIPPED_TABLES = ["broken_relationship", "geography_part"]
+
+# the least memory a shard's build is given when a memory budget is split
+# between the workers, fewer workers are run rather than go below it
+MIN_SHARD_MEMORY = 256 * 1024**2
+
+
+class MergeError(Exception):
+    pass
+
+
+def shard_path(shard_dir, dataset_name):
+    return os.path.join(shard_dir, dataset_name + ".sqlite3")
+
+
+def create_shard(base_path, path):
+    """
+    Create an empty view model for a dataset to be built into, seeded with the
+    organisations and categories from the view model at base_path
+    """
+    if os.path.exists(path):
+        os.remove(path)
+    engine = create_engine("sqlite+pysqlite:///{}".format(path))
+    Base.metadata.create_all(engine)
+    engine.dispose()
+
+    conn = sqlite3.connect(path)
+    try:
+        conn.execute("ATTACH DATABASE ? AS base", (base_path,))
+        entity_columns = ", ".join(Base.metadata.tables["entity"].columns.keys())
+        with conn:
+            for orm_class in REFERENCE_CLASSES:
+                table = orm_class.__tablename__
+                columns = ", ".join(orm_class.__table__.columns.keys())
+                conn.execute(f"""
+                    INSERT INTO entity ({entity_columns})
+                    SELECT {entity_columns} FROM base.entity
+                    WHERE entity IN (SELECT entity FROM base.{table})
+                    """)
+                conn.execute(f"""
+                    INSERT INTO {table} ({columns})
+                    SELECT {columns} FROM base.{table}
+                    """)
+        conn.execute("DETACH DATABASE base")
+    finally:
+        conn.close()
+
+
+def shard_workers(workers=None, max_memory=None):
+    """
+    The number of workers to build shards with, and the memory budget of each
+    shard's build: max_memory split between them, each build's MemoryGovernor
+    keeping it within its share. Returns (workers, None) without a budget.
+    """
+    if workers is None:
+        workers = os.cpu_count() or 1
+    if not max_memory:
+        return workers, None
+    workers = max(1, min(workers, max_memory // MIN_SHARD_MEMORY))
+    return workers, max_memory // workers
+
+
+def build_shard(task):
+    base_path, dataset_name, input_path, path, build = task
+    create_shard(base_path, path)
+    build(dataset_name, input_path, path)
+    return dataset_name, path
+
+
+def build_shards(base_path, shard_dir, inputs, build, workers=None):
+    """
+    Build each (dataset_name, input_path) of inputs into its own shard in
+    shard_dir, across a pool of worker processes, or in this one if there's a
+    single worker. build(dataset_name, input_path, path) builds a dataset, and
+    must be picklable.
+
+    Yields the (dataset_name, path) of each shard as it's built.
+    """
+    os.makedirs(shard_dir, exist_ok=True)
+    tasks = [
+        (
+            base_path,
+            dataset_name,
+            input_path,
+            shard_path(shard_dir, dataset_name),
+            build,
+        )
+        for dataset_name, input_path in inputs
+    ]
+    if workers == 1:
+        yield from map(build_shard, tasks)
+        return
+
+    with ProcessPoolExecutor(workers) as executor:
+        futures = [executor.submit(build_shard, task) for task in tasks]
+        for future in as_completed(futures):
+            yield future.result()
+
+
+def check_shard(conn, path):
+    """
+    Check the shard attached to conn can be merged into the view model,
+    returns the datasets built into it
+    """
+    (result,) = conn.execute("PRAGMA shard.quick_check").fetchone()
+    if result != "ok":
+        raise MergeError("{} is corrupt: {}".format(path, result))
+
+    states = conn.execute("SELECT dataset, complete FROM shard.build_state").fetchall()
+    if not states:
+        raise MergeError("{} has no datasets built into it".format(path))
+    incomplete = [dataset for dataset, complete in states if not complete]
+    if incomplete:
+        raise MergeError(
+            "{} has incomplete builds of {}".format(path, ", ".join(incomplete))
+        )
+    datasets = [dataset for dataset, complete in states]
+
+    placeholders = ", ".join("?" for _ in datasets)
+    merged = conn.execute(
+        f"SELECT dataset FROM main.dataset_stats WHERE dataset IN ({placeholders})",
+        datasets,
+    ).fetchall()
+    if merged:
+        raise MergeError(
+            "{} are already in the view model".format(
+                ", ".join(dataset for (dataset,) in merged)
+            )
+        )
+
+    for table, keys in REFERENCE_KEYS.items():
+        (missing,) = conn.execute(f"""
+            SELECT count(*) FROM shard.{table} AS s
+            WHERE NOT EXISTS (
+                SELECT 1 FROM main.{table} AS m
+                WHERE {" AND ".join(f"m.{key} IS s.{key}" for key in keys)}
+            )
+            """).fetchone()
+        if missing:
+            raise MergeError(
+                "{} was seeded with {} {} rows not in the view model".format(
+                    path, missing, table
+                )
+            )
+
+    conflicts, example = conn.execute(
+        f"""
+        SELECT count(*), min(s.entity)
+        FROM shard.entity AS s
+        JOIN main.entity AS m ON m.entity = s.entity
+        WHERE s.dataset IN ({placeholders})
+        """,
+        datasets,
+    ).fetchone()
+    if conflicts:
+        raise MergeError(
+            "{} has {} entities already in the view model, e.g. {}".format(
+                path, conflicts, example
+            )
+        )
+
+    return datasets
+
+
+def merge_queries(table, offset):
+    """
+    The INSERT merging a table's rows from the shard, and the SELECT counting
+    the rows it should merge
+    """
+    columns = table.columns.keys()
+    values = list(columns)
+    where = ""
+    if table.name in ENTITY_TABLES:
+        where = "WHERE entity IN (SELECT entity FROM temp.shard_entity)"
+    elif table.name in DATASET_TABLES:
+        where = "WHERE dataset IN (SELECT dataset FROM shard.build_state)"
+    if table.name in OFFSET_KEYS:
+        key = OFFSET_KEYS[table.name]
+        values[columns.index(key)] = "{} + {:d}".format(key, offset)
+    if table.name in RENUMBERED_KEYS:
+        key = RENUMBERED_KEYS[table.name]
+        del values[columns.index(key)]
+        columns.remove(key)
+
+    insert = "INSERT INTO main.{} ({}) SELECT {} FROM shard.{} {}".format(
+        table.name, ", ".join(columns), ", ".join(values), table.name, where
+    )
+    count = "SELECT count(*) FROM shard.{} {}".format(table.name, where)
+    return insert, count
+
+
+def merge_shard(conn, path):
+    """
+    Copy the datasets built into a shard into the view model, in a single
+    transaction. Returns the datasets merged.
+    """
+    conn.execute("ATTACH DATABASE ? AS shard", (path,))
+    try:
+        datasets = check_shard(conn, path)
+        with conn:
+            conn.execute("DROP TABLE IF EXISTS temp.shard_entity")
+            conn.execute("CREATE TEMP TABLE shard_entity (entity INTEGER PRIMARY KEY)")
+            conn.execute(
+                f"""
+                INSERT INTO temp.shard_entity
+                SELECT entity FROM shard.entity
+                WHERE dataset IN ({", ".join("?" for _ in datasets)})
+                """,
+                datasets,
+            )
+            (offset,) = conn.execute(
+                "SELECT coalesce(max(id), 0) FROM main.metric"
+            ).fetchone()
+
+            for table in Base.metadata.sorted_tables:
+                if table.name in SKIPPED_TABLES:
+                    continue
+                insert, count = merge_queries(table, offset)
+                (expected,) = conn.execute(count).fetchone()
+                merged = conn.execute(insert).rowcount
+                if merged != expected:
+                    raise MergeError(
+                        "merged {} of {} {} rows from {}".format(
+                            merged, expected, table.name, path
+                        )
+                    )
+            conn.execute("DROP TABLE temp.shard_entity")
+    finally:
+        conn.execute("DETACH DATABASE shard")
+    return datasets
+
+
+def merge_shards(path, shard_paths):
+    """
+    Merge the shards at shard_paths into the view model at path, checking
+    each is complete and doesn't clash with what's already there.
+
+    Returns the datasets merged from each shard.
+    """
+    conn = sqlite3.connect(path)
+    try:
+        merged = {}
+        for shard in shard_paths:
+            merged[shard] = merge_shard(conn, shard)
+            logger.info("merged %s from %s", ", ".join(merged[shard]), shard)
+        return merged
+    finally:
+        conn.close()
@@ -0,0 +1,110 @@
+import json
+import struct
+
+from view_builder.precision import round_geometry
+
+# the geometry class types of SpatiaLite's BLOB format, plus 1000 for XYZ, 2000
+# for XYM and 3000 for XYZM
+GEOMETRY_TYPES = {
+    1: "Point",
+    2: "LineString",
+    3: "Polygon",
+    4: "MultiPoint",
+    5: "MultiLineString",
+    6: "MultiPolygon",
+    7: "GeometryCollection",
+}
+
+# the (values stored, values kept) of each position, GeoJSON has no M
+DIMENSIONS = {0: (2, 2), 1: (3, 3), 2: (3, 2), 3: (4, 3)}
+
+# the bytes before a geometry's class type: start, endian, SRID, MBR and MBR end
+HEADER_SIZE = 39
+
+ENTITY_MARKER = 0x69
+
+
+def read_positions(blob, endian, offset, size, keep, count):
+    values = struct.unpack_from("{}{:d}d".format(endian, count * size), blob, offset)
+    positions = [list(values[i : i + keep]) for i in range(0, len(values), size)]
+    return positions, offset + 8 * count * size
+
+
+def read_count(blob, endian, offset):
+    (count,) = struct.unpack_from(endian + "i", blob, offset)
+    return count, offset + 4
+
+
+def read_geometry(blob, endian, offset):
+    class_type, offset = read_count(blob, endian, offset)
+    dimension, kind = divmod(class_type, 1000)
+    if kind not in GEOMETRY_TYPES or dimension not in DIMENSIONS:
+        # including the compressed classes, which GeomFromText never makes
+        raise ValueError("unsupported geometry class {}".format(class_type))
+    geometry_type = GEOMETRY_TYPES[kind]
+    size, keep = DIMENSIONS[dimension]
+
+    if geometry_type == "Point":
+        (position,), offset = read_positions(blob, endian, offset, size, keep, 1)
+        return {"type": geometry_type, "coordinates": position}, offset
+
+    count, offset = read_count(blob, endian, offset)
+    if geometry_type == "LineString":
+        positions, offset = read_positions(blob, endian, offset, size, keep, count)
+        return {"type": geometry_type, "coordinates": positions}, offset
+
+    if geometry_type == "Polygon":
+        rings = []
+        for _ in range(count):
+            points, offset = read_count(blob, endian, offset)
+            ring, offset = read_positions(blob, endian, offset, size, keep, points)
+            rings.append(ring)
+        return {"type": geometry_type, "coordinates": rings}, offset
+
+    parts = []
+    for _ in range(count):
+        if blob[offset] != ENTITY_MARKER:
+            raise ValueError("missing collection entity marker")
+        part, offset = read_geometry(blob, endian, offset + 1)
+        parts.append(part)
+    if geometry_type == "GeometryCollection":
+        return {"type": geometry_type, "geometries": parts}, offset
+    return {
+        "type": geometry_type,
+        "coordinates": [part["coordinates"] for part in parts],
+    }, offset
+
+
+def blob_geometry(blob):
+    """
+    The GeoJSON geometry, as a dict, of a geometry in SpatiaLite's BLOB format
+    """
+    if len(blob) < HEADER_SIZE + 5 or blob[0] != 0x00 or blob[38] != 0x7C:
+        raise ValueError("not a SpatiaLite geometry")
+    if blob[-1] != 0xFE:
+        raise ValueError("truncated SpatiaLite geometry")
+    endian = "<" if blob[1] == 0x01 else ">"
+    geometry, _ = read_geometry(blob, endian, HEADER_SIZE)
+    return geometry
+
+
+def as_geojson(blob, precision=15, options=0):
+    """
+    SpatiaLite's AsGeoJSON, without the bounding box and CRS options: the
+    GeoJSON text of a geometry blob, or NULL if it isn't one
+    """
+    if not isinstance(blob, bytes):
+        return None
+    try:
+        geometry = blob_geometry(blob)
+    except (ValueError, IndexError, struct.error):
+        return None
+    return json.dumps(round_geometry(geometry, precision), separators=(",", ":"))
+
+
+def register_functions(conn):
+    """
+    Register the SpatiaLite functions the view model's views call, for reading
+    them on connections without the SpatiaLite extension loaded
+    """
+    conn.create_function("AsGeoJSON", -1, as_geojson, deterministic=True)
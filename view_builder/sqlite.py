@@ -0,0 +1,38 @@
+import os
+import sqlite3
+from urllib.request import pathname2url
+
+from view_builder.spatialite import register_functions
+
+# the inputs are read once, front to back, so let SQLite map as much of the
+# file as it likes and keep a generous page cache for the indexes
+MMAP_SIZE = 1024**4
+CACHE_SIZE = 256 * 1024**2
+
+
+def connect_read_only(
+    path,
+    immutable=True,
+    mmap_size=MMAP_SIZE,
+    cache_size=CACHE_SIZE,
+    check_same_thread=True,
+):
+    """
+    Open a SQLite database for reading only.
+
+    An immutable connection skips file locking and journal checks entirely, so
+    is only safe for files nothing else writes to while they're open, such as
+    the dataset inputs to a build. Pages are read through a memory map, so are
+    served from the OS page cache without being copied. The SpatiaLite
+    functions the view model's views call are registered, see spatialite.
+    """
+    uri = "file:{}?{}".format(
+        pathname2url(os.path.abspath(path)), "immutable=1" if immutable else "mode=ro"
+    )
+    conn = sqlite3.connect(uri, uri=True, check_same_thread=check_same_thread)
+    conn.execute("PRAGMA query_only = ON")
+    conn.execute("PRAGMA mmap_size = {:d}".format(mmap_size))
+    # a negative cache_size is in KiB rather than pages
+    conn.execute("PRAGMA cache_size = -{:d}".format(cache_size // 1024))
+    register_functions(conn)
+    return conn
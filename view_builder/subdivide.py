@@ -0,0 +1,198 @@
+import logging
+import sqlite3
+
+import shapely
+from shapely import wkt
+from shapely.errors import GEOSException
+from shapely.geometry import MultiPolygon, Polygon, box
+
+from view_builder.containment import geometries
+from view_builder.pool import chunks, map_in_workers, worker_connection
+
+logger = logging.getLogger("subdivide")
+
+MAX_VERTICES = 2000
+
+CHUNK_SIZE = 20
+
+# the recursion stops here, whatever's left of the geometry
+MAX_DEPTH = 16
+
+# the number of vertices in a WKT geometry, give or take one for each ring
+VERTEX_COUNT_SQL = "length(geometry) - length(replace(geometry, ',', '')) + 1"
+
+
+def polygons(geometry):
+    """
+    The polygons of a clipped geometry, leaving out the lines and points where
+    it only touched the edges of the clip
+    """
+    if isinstance(geometry, Polygon):
+        return [geometry] if not geometry.is_empty else []
+    if isinstance(geometry, MultiPolygon):
+        return list(geometry.geoms)
+    return [
+        polygon for part in getattr(geometry, "geoms", []) for polygon in polygons(part)
+    ]
+
+
+def subdivide(geometry, max_vertices=MAX_VERTICES, depth=0):
+    """
+    Split a polygonal geometry into parts of no more than max_vertices each by
+    clipping it to the quadrants of its bounds, recursively, as PostGIS's
+    ST_Subdivide does
+    """
+    if shapely.get_num_coordinates(geometry) <= max_vertices or depth >= MAX_DEPTH:
+        return [geometry]
+
+    minx, miny, maxx, maxy = geometry.bounds
+    midx, midy = (minx + maxx) / 2, (miny + maxy) / 2
+    quadrants = [
+        box(minx, miny, midx, midy),
+        box(midx, miny, maxx, midy),
+        box(minx, midy, midx, maxy),
+        box(midx, midy, maxx, maxy),
+    ]
+    parts = []
+    for quadrant in quadrants:
+        clipped = polygons(geometry.intersection(quadrant))
+        if not clipped:
+            continue
+        part = clipped[0] if len(clipped) == 1 else MultiPolygon(clipped)
+        parts.extend(subdivide(part, max_vertices, depth + 1))
+    return parts
+
+
+def subdivide_geographies(task):
+    """
+    The parts of each geography, as (geography, wkt, vertex count, bounds)
+    tuples
+    """
+    entities, max_vertices = task
+    parts = []
+    for entity, geometry_wkt in geometries(worker_connection(), "entity", entities):
+        try:
+            geometry = wkt.loads(geometry_wkt)
+            for part in subdivide(geometry, max_vertices):
+                parts.append(
+                    (
+                        entity,
+                        part.wkt,
+                        shapely.get_num_coordinates(part),
+                        part.bounds,
+                    )
+                )
+        except GEOSException as e:
+            logger.warning("skipping geography %d: %s", entity, e)
+    return parts
+
+
+def oversized_geographies(conn, max_vertices, types=None):
+    sql = "SELECT entity FROM geography WHERE {} > ?".format(VERTEX_COUNT_SQL)
+    params = [max_vertices]
+    if types:
+        sql += " AND type IN ({})".format(", ".join("?" for _ in types))
+        params += list(types)
+    return [entity for (entity,) in conn.execute(sql + " ORDER BY entity", params)]
+
+
+def subdivide_tasks(entities, max_vertices, chunk_size=CHUNK_SIZE):
+    for chunk in chunks(entities, chunk_size):
+        yield chunk, max_vertices
+
+
+def build_parts(path, max_vertices=MAX_VERTICES, types=None, workers=None):
+    """
+    Split the geographies with more than max_vertices vertices into parts
+    clipped to a grid, in geography_part, with the bounds of each part in the
+    geography_part_rtree R*Tree, so spatial queries only test the parts in the
+    area they're interested in.
+
+    Returns the number of geographies subdivided and the number of parts.
+    """
+    conn = sqlite3.connect(path)
+    try:
+        entities = oversized_geographies(conn, max_vertices, types)
+        logger.info("%d geographies over %d vertices", len(entities), max_vertices)
+
+        conn.execute(
+            "CREATE TEMP TABLE part "
+            "(geography_id, geometry, vertex_count, minx, maxx, miny, maxy)"
+        )
+        for parts in map_in_workers(
+            subdivide_geographies,
+            path,
+            subdivide_tasks(entities, max_vertices),
+            workers,
+        ):
+            conn.executemany(
+                "INSERT INTO temp.part VALUES (?, ?, ?, ?, ?, ?, ?)",
+                [
+                    (entity, part, vertex_count, minx, maxx, miny, maxy)
+                    for entity, part, vertex_count, (minx, miny, maxx, maxy) in parts
+                ],
+            )
+
+        with conn:
+            conn.execute(
+                "CREATE VIRTUAL TABLE IF NOT EXISTS geography_part_rtree "
+                "USING rtree(id, minx, maxx, miny, maxy)"
+            )
+            # only the parts of the types subdivided, the R*Tree's first as
+            # they're found through geography_part
+            where, params = "", []
+            if types:
+                where = (
+                    " WHERE geography_id IN "
+                    "(SELECT entity FROM geography WHERE type IN ({}))".format(
+                        ", ".join("?" for _ in types)
+                    )
+                )
+                params = list(types)
+            conn.execute(
+                "DELETE FROM geography_part_rtree "
+                "WHERE id IN (SELECT id FROM geography_part{})".format(where),
+                params,
+            )
+            conn.execute("DELETE FROM geography_part" + where, params)
+
+            # numbered after the parts of other types left in place
+            (offset,) = conn.execute(
+                "SELECT coalesce(max(id), 0) FROM geography_part"
+            ).fetchone()
+            conn.execute(
+                """
+                INSERT INTO geography_part (id, geography_id, geometry, vertex_count)
+                SELECT rowid + ?, geography_id, geometry, vertex_count FROM temp.part
+                """,
+                (offset,),
+            )
+            conn.execute(
+                """
+                INSERT INTO geography_part_rtree (id, minx, maxx, miny, maxy)
+                SELECT rowid + ?, minx, maxx, miny, maxy FROM temp.part
+                """,
+                (offset,),
+            )
+        (count,) = conn.execute("SELECT count(*) FROM temp.part").fetchone()
+        conn.execute("DROP TABLE temp.part")
+        return len(entities), count
+    finally:
+        conn.close()
+
+
+def parts_intersecting(conn, minx, miny, maxx, maxy):
+    """
+    The (geography, wkt) of the parts whose bounds intersect the box, for
+    testing exactly in place of the whole geographies
+    """
+    return conn.execute(
+        """
+        SELECT p.geography_id, p.geometry
+        FROM geography_part_rtree AS r
+        JOIN geography_part AS p ON p.id = r.id
+        WHERE r.minx <= ? AND r.maxx >= ? AND r.miny <= ? AND r.maxy >= ?
+        ORDER BY p.geography_id, p.id
+        """,
+        (maxx, minx, maxy, miny),
+    ).fetchall()
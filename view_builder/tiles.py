@@ -1,6 +1,8 @@
-import sqlite3
 from datasette_builder.build import run
 
+from view_builder.index import lib as spatialite_lib
+from view_builder.sqlite import connect_read_only
+
 
 def build_tiles_for_datasets(view_model_path, output_path):
     datasets = get_geography_datasets(view_model_path)
@@ -11,7 +13,8 @@ def build_tiles_for_datasets(view_model_path, output_path):
 
 
 def get_geography_datasets(view_model_path):
-    conn = sqlite3.connect(view_model_path)
+    # geography_geom's columns call AsGeoJSON, which connect_read_only registers
+    conn = connect_read_only(view_model_path, immutable=False)
     cur = conn.cursor()
     cur.execute("select DISTINCT type from geography_geom")
     geography_datasets = list(cur.fetchall())
@@ -22,6 +25,9 @@ def get_geography_datasets(view_model_path):
 def dump_geometry_to_file(dataset, view_model_path, output_path):
     dump_geom_cmd = [
         "sqlite3",
+        # geography_geom's features are made with SpatiaLite's AsGeoJSON
+        "-cmd",
+        ".load {}".format(spatialite_lib),
         view_model_path,
         f".output {output_path}{dataset}.txt",
         f"SELECT json_patch(geojson_full, json_object('tippecanoe', json_object('layer', type))) from geography_geom WHERE type='{dataset}'",
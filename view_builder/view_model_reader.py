@@ -0,0 +1,207 @@
+import json
+import queue
+import threading
+from collections import OrderedDict
+from contextlib import contextmanager
+
+from view_builder.sqlite import connect_read_only
+
+DEFAULT_POOL_SIZE = 4
+DEFAULT_CACHE_SIZE = 64 * 1024**2
+
+# roughly what a cache entry's key and bookkeeping take, counted against the
+# cache size so misses, cached as None, are evicted like anything else
+ENTRY_SIZE = 100
+
+FEATURE_SQL = {
+    False: "SELECT geojson_full FROM geography_geom WHERE entity = ?",
+    True: "SELECT geojson_simple FROM geography_geom WHERE entity = ?",
+}
+
+GEOGRAPHY_SQL = """
+    SELECT entity, geography, name, type, notes, documentation_url,
+        entry_date, start_date, end_date
+    FROM geography
+    WHERE entity = ?
+"""
+
+GEOGRAPHY_ORGANISATIONS_SQL = """
+    SELECT o.entity, o.organisation, o.name
+    FROM organisation_geography AS og
+    JOIN organisation AS o ON o.entity = og.organisation_id
+    WHERE og.geography_id = ?
+    ORDER BY o.entity
+"""
+
+GEOGRAPHY_CATEGORIES_SQL = """
+    SELECT c.entity, c.category, c.type, c.name
+    FROM geography_category AS gc
+    JOIN category AS c ON c.entity = gc.category_id
+    WHERE gc.geography_id = ?
+    ORDER BY c.entity
+"""
+
+
+class CacheStats:
+    def __init__(self):
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    @property
+    def hit_rate(self):
+        lookups = self.hits + self.misses
+        return self.hits / lookups if lookups else 0.0
+
+    def __str__(self):
+        return "{} hits, {} misses ({:.0%} hit rate), {} evictions".format(
+            self.hits, self.misses, self.hit_rate, self.evictions
+        )
+
+
+class LRUCache:
+    """
+    A least recently used cache bounded by the total size in bytes of its
+    values, as given when they're added, each counting as at least
+    min_entry_size
+    """
+
+    def __init__(self, max_size, min_entry_size=1):
+        self.max_size = max_size
+        self.min_entry_size = min_entry_size
+        self.size = 0
+        self.stats = CacheStats()
+        self._items = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        """
+        Returns (True, value) for a cached key, otherwise (False, None)
+        """
+        with self._lock:
+            if key in self._items:
+                self._items.move_to_end(key)
+                self.stats.hits += 1
+                return True, self._items[key][0]
+            self.stats.misses += 1
+            return False, None
+
+    def put(self, key, value, size):
+        size = max(size, self.min_entry_size)
+        with self._lock:
+            if key in self._items:
+                self.size -= self._items.pop(key)[1]
+            if size > self.max_size:
+                return
+            self._items[key] = (value, size)
+            self.size += size
+            while self.size > self.max_size:
+                _, (_, evicted_size) = self._items.popitem(last=False)
+                self.size -= evicted_size
+                self.stats.evictions += 1
+
+    def clear(self):
+        with self._lock:
+            self._items.clear()
+            self.size = 0
+
+    def __len__(self):
+        return len(self._items)
+
+
+class ViewModelReader:
+    """
+    Serves geography features and records from a published view model.
+
+    Lookups share a pool of read-only connections, each of which keeps its own
+    prepared statements, and assembled results are held in an LRU cache so hot
+    entities are served without querying SQLite. Cached values are shared
+    between callers, so must not be modified.
+    """
+
+    def __init__(
+        self,
+        path,
+        pool_size=DEFAULT_POOL_SIZE,
+        cache_size=DEFAULT_CACHE_SIZE,
+        immutable=True,
+    ):
+        self.cache = LRUCache(cache_size, ENTRY_SIZE)
+        self._pool = queue.LifoQueue()
+        for _ in range(pool_size):
+            self._pool.put(
+                connect_read_only(path, immutable=immutable, check_same_thread=False)
+            )
+        self._pool_size = pool_size
+
+    @property
+    def stats(self):
+        return self.cache.stats
+
+    @contextmanager
+    def _connection(self):
+        conn = self._pool.get()
+        try:
+            yield conn
+        finally:
+            self._pool.put(conn)
+
+    def _cached(self, key, load):
+        found, value = self.cache.get(key)
+        if not found:
+            value, size = load()
+            self.cache.put(key, value, size)
+        return value
+
+    def feature(self, entity, simplified=False):
+        """
+        The GeoJSON feature for an entity from geography_geom, or None
+        """
+
+        def load():
+            with self._connection() as conn:
+                row = conn.execute(FEATURE_SQL[simplified], (entity,)).fetchone()
+            if row is None or row[0] is None:
+                return None, 0
+            return json.loads(row[0]), len(row[0])
+
+        return self._cached(("feature", entity, simplified), load)
+
+    def geography(self, entity):
+        """
+        The geography record for an entity, with its organisations and
+        categories, or None
+        """
+
+        def load():
+            with self._connection() as conn:
+                conn.row_factory = dict_factory
+                try:
+                    record = conn.execute(GEOGRAPHY_SQL, (entity,)).fetchone()
+                    if record is None:
+                        return None, 0
+                    record["organisations"] = conn.execute(
+                        GEOGRAPHY_ORGANISATIONS_SQL, (entity,)
+                    ).fetchall()
+                    record["categories"] = conn.execute(
+                        GEOGRAPHY_CATEGORIES_SQL, (entity,)
+                    ).fetchall()
+                finally:
+                    conn.row_factory = None
+            return record, len(json.dumps(record))
+
+        return self._cached(("geography", entity), load)
+
+    def close(self):
+        for _ in range(self._pool_size):
+            self._pool.get().close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        self.close()
+
+
+def dict_factory(cursor, row):
+    return {column[0]: value for column, value in zip(cursor.description, row)}
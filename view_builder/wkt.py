@@ -0,0 +1,62 @@
+import re
+
+from view_builder.precision import round_positions
+
+_number = re.compile(r"-?\d+(?:\.\d*)?(?:[eE][-+]?\d+)?")
+
+
+def wkt_coordinates(wkt):
+    """
+    The x and y coordinates of a 2D WKT geometry, as two lists, without
+    parsing it into a geometry
+    """
+    if not wkt:
+        return [], []
+    numbers = [float(n) for n in _number.findall(wkt)]
+    return numbers[0::2], numbers[1::2]
+
+
+def wkt_bounds(wkt):
+    """
+    The (minx, miny, maxx, maxy) bounds of a 2D WKT geometry, or None if it has
+    no coordinates
+    """
+    xs, ys = wkt_coordinates(wkt)
+    if not xs or not ys:
+        return None
+    return min(xs), min(ys), max(xs), max(ys)
+
+
+# the innermost parentheses of a WKT geometry hold its lists of coordinates
+_coordinate_list = re.compile(r"\(([^()]*)\)")
+
+
+def format_coordinate(value, precision):
+    text = "{:.{}f}".format(value, precision)
+    if "." in text:
+        text = text.rstrip("0").rstrip(".")
+    return "0" if text == "-0" else text
+
+
+def round_wkt(wkt, precision):
+    """
+    A WKT geometry with its coordinates rounded to precision decimal places,
+    leaving out any vertex that then repeats the one before it, unless that
+    would leave too few for a ring, see round_positions
+    """
+    if not wkt:
+        return wkt
+
+    def round_coordinates(match):
+        positions = [
+            [float(n) for n in vertex.split()] for vertex in match.group(1).split(",")
+        ]
+        vertices = round_positions(positions, precision, drop_repeated=True)
+        return "({})".format(
+            ", ".join(
+                " ".join(format_coordinate(value, precision) for value in vertex)
+                for vertex in vertices
+            )
+        )
+
+    return _coordinate_list.sub(round_coordinates, wkt)